@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 from pathlib import Path
+import json
 import os
 from dotenv import load_dotenv
 
@@ -48,12 +49,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'exams.middleware.MetricsMiddleware',
+    'exams.middleware.PerformanceMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'exams.middleware.SessionRefreshMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'exams.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -142,6 +147,59 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Test inputs larger than this many bytes are kept in a content-addressed
+# blob store on local disk instead of the database
+TEST_DATA_ROOT = Path(os.getenv('TEST_DATA_ROOT', BASE_DIR / 'testdata'))
+TEST_DATA_INLINE_LIMIT = int(os.getenv('TEST_DATA_INLINE_LIMIT', 64 * 1024))
+
+# Segments written by archive_submissions (cold storage for old submissions)
+SUBMISSION_ARCHIVE_ROOT = Path(os.getenv('SUBMISSION_ARCHIVE_ROOT', BASE_DIR / 'archive'))
+
+# Decompressed submission sources kept in memory, by content digest
+CODE_CACHE_SIZE = int(os.getenv('CODE_CACHE_SIZE', '2048'))
+
+# Bytes a judge child may write to stdout, stderr or its result channel
+# before it is killed with an output limit exceeded verdict
+JUDGE_OUTPUT_LIMIT = int(os.getenv('JUDGE_OUTPUT_LIMIT', 1024 * 1024))
+
+# Build artifacts of the judge (e.g. the Node harness snapshot), reused
+# across processes
+JUDGE_CACHE_DIR = Path(os.getenv('JUDGE_CACHE_DIR', BASE_DIR / 'judge_cache'))
+
+# Start JavaScript children from a V8 startup snapshot of the harness;
+# compare with `bench_judge --startup` before enabling
+JUDGE_NODE_SNAPSHOT = os.getenv('JUDGE_NODE_SNAPSHOT', 'False').lower() == 'true'
+
+# Fork Python judge children from a zygote that has the harness preloaded
+# instead of starting an interpreter per test; JUDGE_PYTHON_ISOLATED runs
+# the interpreter with -I -S (no site-packages, no PYTHON* variables)
+JUDGE_PYTHON_ZYGOTE = os.getenv('JUDGE_PYTHON_ZYGOTE', 'True').lower() == 'true'
+JUDGE_PYTHON_ISOLATED = os.getenv('JUDGE_PYTHON_ISOLATED', 'False').lower() == 'true'
+
+# Address space limit (bytes) of every judge child, scaled per language; 0 disables it
+JUDGE_MEMORY_LIMIT = int(os.getenv('JUDGE_MEMORY_LIMIT', 512 * 1024 * 1024))
+
+# Size budget (bytes) of the compiled C/C++ submissions kept under JUDGE_CACHE_DIR
+JUDGE_COMPILE_CACHE_BYTES = int(os.getenv('JUDGE_COMPILE_CACHE_BYTES', 256 * 1024 * 1024))
+
+# Threads grading queued submissions (session auto-submission), per language
+JUDGE_WORKERS = int(os.getenv('JUDGE_WORKERS', '4'))
+
+# Base time limit (seconds) of a test run; language backends scale it and
+# JUDGE_MEMORY_LIMIT by their multipliers. JUDGE_LANGUAGES overrides backend
+# defaults per language, e.g. {"python": {"workers": 2, "time_multiplier": 2}}
+JUDGE_TIME_LIMIT = float(os.getenv('JUDGE_TIME_LIMIT', '10'))
+JUDGE_LANGUAGES = json.loads(os.getenv('JUDGE_LANGUAGES', '{}'))
+
+# Code draft autosave: buffered edits are written every FLUSH_INTERVAL
+# seconds, with a full snapshot every SNAPSHOT_EVERY rows per session
+DRAFT_AUTOSAVE = {
+    'FLUSH_INTERVAL': float(os.getenv('DRAFT_FLUSH_INTERVAL', '5')),
+    'SNAPSHOT_EVERY': int(os.getenv('DRAFT_SNAPSHOT_EVERY', '20')),
+    # Seconds after which an idle, fully flushed draft is dropped from memory
+    'EVICT_AFTER': 600,
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -149,13 +207,19 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # REST Framework settings
 REST_FRAMEWORK = {
+    # Signed tokens (POST /api/auth/token/) replace BasicAuthentication,
+    # which ran a full password hash on every request
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'exams.authentication.SignedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Views declare filter_fields / ordering_fields; see exams/filters.py
+    'DEFAULT_FILTER_BACKENDS': [
+        'exams.filters.DeclarativeFilterBackend',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_RENDERER_CLASSES': [
@@ -164,6 +228,11 @@ REST_FRAMEWORK = {
     ],
 }
 
+# API tokens: lifetime in seconds
+AUTH_TOKEN = {
+    'TTL': int(os.getenv('AUTH_TOKEN_TTL', 12 * 3600)),
+}
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = DEBUG
 CORS_ALLOWED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS', 'http://127.0.0.1:8000,http://localhost:8000').split(',')
@@ -171,7 +240,10 @@ CORS_ALLOW_CREDENTIALS = True
 
 # Session settings
 SESSION_COOKIE_AGE = 3600 * 24 * 7  # 7 days
-SESSION_SAVE_EVERY_REQUEST = True
+# Saving on every request would write the session row on each API poll;
+# SessionRefreshMiddleware refreshes it on page views only
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_REFRESH_EXEMPT_PREFIXES = ['/api/', '/metrics', '/static/', '/media/']
 
 # Authentication settings
 LOGIN_URL = '/admin/login/'
@@ -182,7 +254,9 @@ LOGOUT_REDIRECT_URL = '/'
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 
-# Logging configuration
+# Logging configuration: request threads only enqueue records; the 'queue' handler's
+# listener thread writes them to the console and to a rotating JSON-lines
+# file. Handler names matter: 'queue' must sort after the handlers it feeds.
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -195,6 +269,24 @@ LOGGING = {
             'format': '{levelname} {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'exams.log.JsonFormatter',
+        },
+        # Trace records already are one JSON object
+        'raw': {
+            'format': '{message}',
+            'style': '{',
+        },
+    },
+    'filters': {
+        # Fraction of sub-WARNING records kept per logger
+        'sampling': {
+            '()': 'exams.log.SamplingFilter',
+            'rates': {
+                'exams.perf': float(os.getenv('LOG_SAMPLE_PERF', '1.0')),
+                'django.request': float(os.getenv('LOG_SAMPLE_REQUEST', '1.0')),
+            },
+        },
     },
     'handlers': {
         'console': {
@@ -202,29 +294,93 @@ LOGGING = {
             'formatter': 'verbose',
         },
         'file': {
-            'class': 'logging.FileHandler',
+            'class': 'exams.log.SizedTimedRotatingFileHandler',
             'filename': BASE_DIR / 'logs' / 'django.log',
-            'formatter': 'verbose',
+            'formatter': 'json',
+            'when': 'midnight',
+            'backupCount': 14,
+            'maxBytes': 50 * 1024 * 1024,
+            'delay': True,
+        },
+        'queue': {
+            'class': 'exams.log.QueueListenerHandler',
+            'handlers': ['cfg://handlers.console', 'cfg://handlers.file'],
+            'filters': ['sampling'],
+        },
+        'traces': {
+            'class': 'exams.log.SizedTimedRotatingFileHandler',
+            'filename': BASE_DIR / 'logs' / 'traces.jsonl',
+            'formatter': 'raw',
+            'when': 'midnight',
+            'backupCount': 7,
+            'maxBytes': 50 * 1024 * 1024,
+            'delay': True,
+        },
+        'traces_queue': {
+            'class': 'exams.log.QueueListenerHandler',
+            'handlers': ['cfg://handlers.traces'],
         },
     },
     'root': {
-        'handlers': ['console', 'file'],
+        'handlers': ['queue'],
         'level': 'INFO',
     },
     'loggers': {
         'django': {
-            'handlers': ['console', 'file'],
+            'handlers': ['queue'],
             'level': 'INFO',
             'propagate': False,
         },
         'exams': {
-            'handlers': ['console', 'file'],
-            'level': 'DEBUG',
+            'handlers': ['queue'],
+            'level': os.getenv('EXAMS_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+        # Finished traces (see TRACING)
+        'exams.traces': {
+            'handlers': ['traces_queue'],
+            'level': 'INFO',
             'propagate': False,
         },
     },
 }
 
+# Per-request performance instrumentation (Server-Timing header and
+# structured lines on the 'exams.perf' logger)
+PERF_INSTRUMENTATION = {
+    'ENABLED': os.getenv('PERF_INSTRUMENTATION', 'True').lower() == 'true',
+    # Fraction of requests to instrument
+    'SAMPLE_RATE': float(os.getenv('PERF_SAMPLE_RATE', '1.0')),
+    # Requests over either threshold are logged at WARNING and flagged slow
+    'SLOW_REQUEST_MS': int(os.getenv('PERF_SLOW_REQUEST_MS', '500')),
+    'MAX_QUERIES': int(os.getenv('PERF_MAX_QUERIES', '50')),
+}
+
+# Prometheus-style metrics served on /metrics; when disabled every metric
+# update is a single flag check
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+
+# Span tracing of the judge path, for a SAMPLE_RATE fraction of requests.
+# Finished traces go through the 'exams.traces' logger to the rotating
+# 'traces' handler's file, which ``manage.py export_traces`` reads
+TRACING = {
+    'ENABLED': os.getenv('TRACING_ENABLED', 'False').lower() == 'true',
+    'SAMPLE_RATE': float(os.getenv('TRACING_SAMPLE_RATE', '0.01')),
+    'FILE': LOGGING['handlers']['traces']['filename'],
+}
+
+# cProfile capture for slow requests; staff can force it with an X-Profile
+# header. Profiles are listed at /admin/profiles/
+PROFILING = {
+    'ENABLED': os.getenv('PROFILING_ENABLED', 'True').lower() == 'true',
+    # Fraction of all requests to profile
+    'SAMPLE_RATE': float(os.getenv('PROFILING_SAMPLE_RATE', '0.0')),
+    # Sampled profiles are kept only for requests slower than this
+    'THRESHOLD_MS': int(os.getenv('PROFILING_THRESHOLD_MS', '1000')),
+    'DIR': BASE_DIR / 'logs' / 'profiles',
+    'MAX_PROFILES': int(os.getenv('PROFILING_MAX_PROFILES', '200')),
+}
+
 # Create logs directory if it doesn't exist
 os.makedirs(BASE_DIR / 'logs', exist_ok=True)
 
@@ -6,10 +6,15 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from django.http import HttpResponse
+from exams.views import metrics_view, profiles_view
 
 urlpatterns = [
+    # Slow request profiles, listed inside the admin
+    path('admin/profiles/', admin.site.admin_view(profiles_view), name='admin_profiles'),
     path('admin/', admin.site.urls),
     path('api/', include('exams.urls')),
+    # Prometheus scrape endpoint
+    path('metrics', metrics_view, name='metrics'),
     path('', include('exams.frontend_urls')),
     # Add favicon route to prevent 404 errors
     path('favicon.ico', lambda request: HttpResponse(status=204, content_type='image/x-icon')),
@@ -1,9 +1,9 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from .models import (
-    Problem, TestCase, ExamSession, Submission, TestResult,
-    UserProfile, Contest, ContestParticipant, ProblemCategory,
-    Leaderboard, Discussion, DiscussionReply
+    Problem, TestCase, ExamSession, DraftRevision, CodeBlob, Submission, TestResult,
+    UserProblemProgress, UserProfile, Contest, ContestParticipant, ProblemCategory,
+    Leaderboard, Discussion, DiscussionReply, RevokedToken
 )
 
 
@@ -52,12 +52,13 @@ class TestCaseAdmin(admin.ModelAdmin):
     list_filter = ['is_hidden', 'is_sample', 'problem__category', 'problem']
     search_fields = ['name', 'problem__title']
     ordering = ['problem', 'order']
+    readonly_fields = ['input_blob']
 
 
 @admin.register(Contest)
 class ContestAdmin(admin.ModelAdmin):
     list_display = ['title', 'contest_type', 'status', 'start_time', 'end_time', 'duration', 'participants_count', 'max_participants']
-    list_filter = ['contest_type', 'status', 'is_public', 'registration_required']
+    list_filter = ['contest_type', 'status', 'is_public', 'registration_required', 'is_rated']
     search_fields = ['title', 'description']
     ordering = ['-start_time']
     readonly_fields = ['current_participants']
@@ -83,13 +84,30 @@ class ExamSessionAdmin(admin.ModelAdmin):
     ordering = ['-start_time']
 
 
+@admin.register(DraftRevision)
+class DraftRevisionAdmin(admin.ModelAdmin):
+    list_display = ['session', 'revision', 'base_revision', 'kind', 'language', 'created_at']
+    list_filter = ['kind', 'language']
+    search_fields = ['session__session_id']
+    raw_id_fields = ['session']
+
+
 @admin.register(Submission)
 class SubmissionAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'problem', 'contest', 'language', 'status', 'score', 'submitted_at']
     list_filter = ['status', 'language', 'submitted_at', 'contest']
-    search_fields = ['user__username', 'problem__title', 'code']
+    search_fields = ['user__username', 'problem__title', 'code_blob__digest']
+    raw_id_fields = ['code_blob']
     ordering = ['-submitted_at']
-    readonly_fields = ['execution_time', 'memory_used', 'score', 'points_earned']
+    readonly_fields = ['code', 'execution_time', 'memory_used', 'score', 'points_earned']
+
+
+@admin.register(CodeBlob)
+class CodeBlobAdmin(admin.ModelAdmin):
+    list_display = ['digest', 'size', 'created_at']
+    search_fields = ['digest']
+    readonly_fields = ['digest', 'size', 'created_at', 'text']
+    exclude = ['data']
 
 
 @admin.register(TestResult)
@@ -100,6 +118,14 @@ class TestResultAdmin(admin.ModelAdmin):
     ordering = ['submission', 'test_case__order']
 
 
+@admin.register(UserProblemProgress)
+class UserProblemProgressAdmin(admin.ModelAdmin):
+    list_display = ['user', 'problem', 'attempts', 'best_score', 'first_accepted_at', 'last_submitted_at']
+    list_filter = ['problem__category']
+    search_fields = ['user__username', 'problem__title']
+    raw_id_fields = ['user', 'problem']
+
+
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'rating', 'rank', 'problems_solved', 'contests_participated', 'total_submissions']
@@ -138,6 +164,14 @@ class DiscussionReplyAdmin(admin.ModelAdmin):
     ordering = ['discussion', 'created_at']
 
 
+
+@admin.register(RevokedToken)
+class RevokedTokenAdmin(admin.ModelAdmin):
+    list_display = ['token_id', 'revoked_at', 'expires_at']
+    search_fields = ['token_id']
+    ordering = ['-revoked_at']
+
+
 # Custom admin site configuration
 admin.site.site_header = "HackerRank-Style Coding Platform Admin"
 admin.site.site_title = "Coding Platform Admin"
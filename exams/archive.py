@@ -0,0 +1,191 @@
+"""
+Cold storage for old submissions.
+
+``archive_submissions`` moves finished submissions out of the hot tables
+into append-only segment files under ``settings.SUBMISSION_ARCHIVE_ROOT``.
+A segment (``submissions-<timestamp>.jsonl.gz``) is a series of gzip
+members, one per block of rows, so any block can be read by seeking to its
+offset and decompressing only that member; concatenated, the members are
+also one ordinary gzip file. Each row is a self-contained JSON object: the
+source code and the expanded test results are written out, since the code
+blob may be pruned and test cases may change later.
+
+Next to each segment, ``<segment>.idx`` holds one JSON line per block with
+its offset, length, time range and per-user and per-problem counts. Readers
+only use the index to find the blocks they need. A block's index line is
+written after its data is synced, and rows are deleted from the database
+after that, so a crash can at worst archive a row twice; readers skip
+duplicate ids.
+"""
+import gzip
+import json
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+
+SEGMENT_SUFFIX = '.jsonl.gz'
+INDEX_SUFFIX = '.idx'
+
+
+def archive_root():
+    return Path(getattr(settings, 'SUBMISSION_ARCHIVE_ROOT', settings.BASE_DIR / 'archive'))
+
+
+def serialize_submission(submission):
+    """One archive row; ``submission`` needs its code blob, problem and results loaded"""
+    return {
+        'id': submission.id,
+        'user': submission.user_id,
+        'problem': submission.problem_id,
+        'problem_title': submission.problem.title,
+        'contest': submission.contest_id,
+        'exam_session': submission.exam_session_id,
+        'code': submission.code,
+        'code_hash': submission.code_hash,
+        'language': submission.language,
+        'status': submission.status,
+        'test_results': submission.detailed_results,
+        'execution_time': submission.execution_time,
+        'memory_used': submission.memory_used,
+        'score': submission.score,
+        'points_earned': submission.points_earned,
+        'error_message': submission.error_message,
+        'submitted_at': submission.submitted_at,
+    }
+
+
+class SegmentWriter:
+    """Appends blocks of rows to a new segment and its index"""
+
+    def __init__(self, root=None):
+        root = Path(root or archive_root())
+        root.mkdir(parents=True, exist_ok=True)
+        name = f'submissions-{timezone.now():%Y%m%dT%H%M%S%f}'
+        self.path = root / f'{name}{SEGMENT_SUFFIX}'
+        self.index_path = root / f'{name}{INDEX_SUFFIX}'
+        self.rows = 0
+
+    def write_block(self, rows):
+        """Append one gzip member with ``rows`` and index it; returns its index entry"""
+        data = gzip.compress(
+            ''.join(json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in rows).encode('utf-8')
+        )
+        users = {}
+        problems = {}
+        for row in rows:
+            if row['user'] is not None:
+                users[row['user']] = users.get(row['user'], 0) + 1
+            totals = problems.setdefault(row['problem'], [0, 0])
+            totals[0] += 1
+            totals[1] += row['status'] == 'accepted'
+
+        with open(self.path, 'ab') as f:
+            offset = f.tell()
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+        entry = {
+            'offset': offset,
+            'length': len(data),
+            'rows': len(rows),
+            'first_id': min(row['id'] for row in rows),
+            'last_id': max(row['id'] for row in rows),
+            'first_submitted': min(row['submitted_at'] for row in rows),
+            'last_submitted': max(row['submitted_at'] for row in rows),
+            # JSON object keys are strings; readers convert back
+            'users': users,
+            'problems': problems,
+        }
+        with open(self.index_path, 'a') as f:
+            f.write(json.dumps(entry, cls=DjangoJSONEncoder) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.rows += len(rows)
+        return entry
+
+
+class ArchiveIndex:
+    """All block index entries, reloaded when an index file changes"""
+
+    def __init__(self, root=None):
+        self.root = root
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._blocks = []
+
+    def blocks(self):
+        root = Path(self.root or archive_root())
+        files = sorted(root.glob(f'*{INDEX_SUFFIX}')) if root.is_dir() else []
+        stamp = tuple((path.name, path.stat().st_size) for path in files)
+        with self._lock:
+            if stamp != self._stamp:
+                blocks = []
+                for path in files:
+                    segment = path.with_name(path.name[:-len(INDEX_SUFFIX)] + SEGMENT_SUFFIX)
+                    with open(path) as f:
+                        for line in f:
+                            if not line.strip():
+                                continue
+                            entry = json.loads(line)
+                            entry['segment'] = segment
+                            entry['users'] = {int(k): v for k, v in entry['users'].items()}
+                            entry['problems'] = {int(k): v for k, v in entry['problems'].items()}
+                            blocks.append(entry)
+                # Newest first, which is the order history is paged in
+                blocks.sort(key=lambda entry: (entry['last_submitted'], entry['last_id']), reverse=True)
+                self._blocks = blocks
+                self._stamp = stamp
+            return self._blocks
+
+    def problem_totals(self, problem_id):
+        """``(submissions, accepted)`` archived for a problem"""
+        total = accepted = 0
+        for entry in self.blocks():
+            counts = entry['problems'].get(problem_id)
+            if counts:
+                total += counts[0]
+                accepted += counts[1]
+        return total, accepted
+
+    def count_for_user(self, user_id):
+        return sum(entry['users'].get(user_id, 0) for entry in self.blocks())
+
+    def user_submissions(self, user_id, offset=0, limit=20):
+        """Archived rows of one user, newest first, reading only the blocks needed"""
+        rows = []
+        seen = set()
+        for entry in self.blocks():
+            count = entry['users'].get(user_id, 0)
+            if not count:
+                continue
+            if offset >= count:
+                offset -= count
+                continue
+            block = [row for row in read_block(entry) if row['user'] == user_id and row['id'] not in seen]
+            block.sort(key=lambda row: (row['submitted_at'], row['id']), reverse=True)
+            for row in block[offset:]:
+                seen.add(row['id'])
+                rows.append(row)
+                if len(rows) >= limit:
+                    return rows
+            offset = 0
+        return rows
+
+
+def read_block(entry):
+    with open(entry['segment'], 'rb') as f:
+        f.seek(entry['offset'])
+        data = f.read(entry['length'])
+    for line in gzip.decompress(data).decode('utf-8').splitlines():
+        row = json.loads(line)
+        row['archived'] = True
+        yield row
+
+
+archive_index = ArchiveIndex()
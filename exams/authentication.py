@@ -0,0 +1,93 @@
+"""
+Signed, expiring API tokens.
+
+A token is ``<user_id>:<token_id>`` signed with Django's ``TimestampSigner``,
+so verifying one is an HMAC check instead of the PBKDF2 hash
+``BasicAuthentication`` runs on every request. The user is then loaded in
+one indexed query that also checks ``is_active`` and whether the token id
+is in ``RevokedToken``, so deactivating a user or revoking a token takes
+effect on every worker at the next request. Clients send
+``Authorization: Token <token>``.
+"""
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.db.models import Exists
+from django.utils import timezone
+from rest_framework import authentication, exceptions
+
+from .models import RevokedToken
+
+
+_signer = signing.TimestampSigner(salt='exams.auth-token')
+
+KEYWORDS = (b'token', b'bearer')
+
+
+def _config():
+    return getattr(settings, 'AUTH_TOKEN', {})
+
+
+def token_ttl():
+    return timedelta(seconds=_config().get('TTL', 12 * 3600))
+
+
+def issue_token(user):
+    """Return ``(token, expires_at)`` for ``user``"""
+    token = _signer.sign(f'{user.pk}:{secrets.token_hex(16)}')
+    return token, timezone.now() + token_ttl()
+
+
+def parse_token(token):
+    """Verify the signature and age of a token; returns ``(user_id, token_id)``.
+
+    Raises ``signing.BadSignature`` (or its ``SignatureExpired`` subclass).
+    """
+    value = _signer.unsign(token, max_age=token_ttl())
+    user_id, token_id = value.split(':', 1)
+    return int(user_id), token_id
+
+
+def revoke_token(token_id, expires_at=None):
+    """Reject a token from now on, even before it expires"""
+    RevokedToken.objects.get_or_create(
+        token_id=token_id, defaults={'expires_at': expires_at or timezone.now() + token_ttl()}
+    )
+    # Revocations only matter until the token would have expired anyway
+    RevokedToken.objects.filter(expires_at__lt=timezone.now()).delete()
+
+
+class SignedTokenAuthentication(authentication.BaseAuthentication):
+    """DRF authentication backed by signed tokens from ``issue_token``.
+
+    ``request.auth`` is set to the token id so the token can be revoked.
+    """
+
+    def authenticate(self, request):
+        header = authentication.get_authorization_header(request).split()
+        # Compared as bytes: the header may hold anything, and a scheme that
+        # isn't ours is another authenticator's business
+        if not header or header[0].lower() not in KEYWORDS:
+            return None
+        if len(header) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        try:
+            user_id, token_id = parse_token(header[1].decode('ascii'))
+        except (UnicodeError, ValueError, signing.BadSignature):
+            # SignatureExpired is a BadSignature
+            raise exceptions.AuthenticationFailed('Invalid or expired token.')
+
+        user = User.objects.filter(pk=user_id).annotate(
+            token_revoked=Exists(RevokedToken.objects.filter(token_id=token_id))
+        ).first()
+        if user is None or not user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        if user.token_revoked:
+            raise exceptions.AuthenticationFailed('Token has been revoked.')
+        return user, token_id
+
+    def authenticate_header(self, request):
+        return 'Token'
@@ -0,0 +1,63 @@
+"""
+Content-addressed storage for large test case inputs.
+
+Inputs above ``settings.TEST_DATA_INLINE_LIMIT`` bytes are written once to
+``settings.TEST_DATA_ROOT`` under their SHA-256 digest and referenced from
+``TestCase.input_blob``. The judge hands the blob file to the child process
+as its stdin, so large inputs never pass through the database, the harness
+source or the web worker's memory on the way to the solution.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+
+
+def encode_json(value):
+    """Serialize a JSON value the way it is stored and streamed to children"""
+    return json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+
+DIGEST_RE = re.compile(r'[0-9a-f]{64}')
+
+
+def blob_path(digest):
+    """Return the on-disk path for a blob digest"""
+    # Digests become path components; anything else could escape TEST_DATA_ROOT
+    if not isinstance(digest, str) or not DIGEST_RE.fullmatch(digest):
+        raise ValueError(f'Invalid blob digest: {digest!r}')
+    return Path(settings.TEST_DATA_ROOT) / digest[:2] / digest
+
+
+def store_blob(data):
+    """Store raw bytes and return their digest; existing blobs are reused"""
+    digest = hashlib.sha256(data).hexdigest()
+    path = blob_path(digest)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so readers never see a partial blob
+        fd, temp_path = tempfile.mkstemp(dir=path.parent)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+    return digest
+
+
+def open_blob(digest):
+    """Open a blob for reading in binary mode"""
+    return open(blob_path(digest), 'rb')
+
+
+def load_json_blob(digest):
+    """Load a stored blob back into Python objects"""
+    with open_blob(digest) as f:
+        return json.loads(f.read())
@@ -0,0 +1,61 @@
+"""
+Deduplicated storage of submission source code.
+
+Most submissions are resubmissions of the same code or the problem's
+``initial_code``, so each distinct source is stored once as a zlib-compressed
+``CodeBlob`` keyed by its SHA-256 digest, and submissions reference the
+digest. Blobs are immutable, which makes the decompressed text safe to keep
+in a process-wide LRU cache (``settings.CODE_CACHE_SIZE`` entries). The
+digest doubles as a stable identity for identical code.
+"""
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+
+from django.conf import settings
+
+from . import metrics
+
+
+def code_digest(code):
+    return hashlib.sha256(code.encode('utf-8')).hexdigest()
+
+
+def compress(code):
+    return zlib.compress(code.encode('utf-8'), 6)
+
+
+def decompress(data):
+    return zlib.decompress(bytes(data)).decode('utf-8')
+
+
+class LRUCache:
+    """Thread-safe mapping that evicts its least recently used entry"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+        metrics.record_cache('code_blob', value is not None)
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+code_cache = LRUCache(getattr(settings, 'CODE_CACHE_SIZE', 2048))
@@ -0,0 +1,304 @@
+"""
+Autosave of exam session code as compact revision chains.
+
+Clients send edits as ops ``[start, end, text]`` (replace ``text[start:end]``
+with ``text``, applied in order) against the last revision the server
+acknowledged. ``DraftBuffer`` applies them in memory and acknowledges a new
+revision immediately; a background thread flushes the buffer every
+``DRAFT_AUTOSAVE['FLUSH_INTERVAL']`` seconds with one ``bulk_create``. All
+revisions a session made since the previous flush are written as a single
+``DraftRevision`` row holding their concatenated ops, and every
+``SNAPSHOT_EVERY``-th row (or any row whose ops would outweigh the code
+itself) is a full snapshot, so rebuilding a draft never replays more than
+that many rows.
+
+The buffer is per process: route a session's autosaves to one worker, or
+expect an occasional 409 that makes the client resend its full code. When
+another worker already wrote a revision this one flushes, the buffered text
+is kept, renumbered past the database head and written as a snapshot, and
+the client's next ops get the 409. A chain that doesn't link up (a delta
+whose ``base_revision`` is not the row before it, or whose ops don't apply)
+is read up to the break; the draft then starts from a new revision so the
+client resends its full code.
+"""
+import atexit
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Max
+
+from .models import DraftRevision
+
+
+logger = logging.getLogger(__name__)
+
+
+class DraftConflict(Exception):
+    """The client's base revision is not the current head"""
+
+    def __init__(self, revision):
+        super().__init__(f'Draft is at revision {revision}')
+        self.revision = revision
+
+
+def _config():
+    return getattr(settings, 'DRAFT_AUTOSAVE', {})
+
+
+def apply_ops(text, ops):
+    """Apply ``[start, end, replacement]`` ops in order; ValueError if malformed"""
+    if not isinstance(ops, list):
+        raise ValueError('ops must be a list')
+    for op in ops:
+        if not (isinstance(op, list) and len(op) == 3):
+            raise ValueError('each op must be [start, end, text]')
+        start, end, replacement = op
+        if not (isinstance(start, int) and isinstance(end, int) and isinstance(replacement, str)):
+            raise ValueError('each op must be [start, end, text]')
+        if not 0 <= start <= end <= len(text):
+            raise ValueError(f'op range {start}:{end} outside a {len(text)}-character draft')
+        text = text[:start] + replacement + text[end:]
+    return text
+
+
+def load_drafts(session_ids):
+    """Rebuild the latest flushed draft of each session from the database.
+
+    Returns ``{session_id: (revision, text, language, deltas_since_snapshot,
+    broken)}``. A ``broken`` chain yields the text as of the last revision
+    that links up, under revision ``head + 1``, which no client has seen.
+    """
+    rows = (
+        DraftRevision.objects
+        .filter(session_id__in=session_ids)
+        .order_by('session_id', '-revision')
+        .values_list('session_id', 'revision', 'base_revision', 'kind', 'code', 'ops', 'language')
+    )
+    # Newest first, down to each session's latest snapshot
+    chains = {}
+    complete = set()
+    for session_id, revision, base_revision, kind, code, ops, language in rows.iterator():
+        if session_id in complete:
+            continue
+        chains.setdefault(session_id, []).append((revision, base_revision, kind, code, ops, language))
+        if kind == 'snapshot':
+            complete.add(session_id)
+
+    drafts = {}
+    for session_id in complete:
+        chain = chains[session_id]
+        head_revision, _, _, _, _, language = chain[0]
+        revision, _, _, text, _, _ = chain[-1]
+        broken = False
+        for delta_revision, base_revision, _, _, ops, _ in reversed(chain[:-1]):
+            if base_revision != revision:
+                broken = True
+                break
+            try:
+                text = apply_ops(text, ops)
+            except ValueError:
+                broken = True
+                break
+            revision = delta_revision
+        if broken:
+            logger.warning(
+                'Draft of session %s breaks after revision %d, falling back to it', session_id, revision,
+                extra={'session_id': session_id, 'revision': revision, 'head_revision': head_revision},
+            )
+            drafts[session_id] = (head_revision + 1, text, language, 0, True)
+        else:
+            drafts[session_id] = (head_revision, text, language, len(chain) - 1, False)
+    return drafts
+
+
+class _DraftState:
+    __slots__ = ('revision', 'text', 'language', 'flushed_revision', 'pending_ops',
+                 'deltas_since_snapshot', 'force_snapshot', 'touched')
+
+    def __init__(self, revision=0, text='', language='javascript', deltas_since_snapshot=0, broken=False):
+        self.revision = revision
+        self.text = text
+        self.language = language
+        self.flushed_revision = revision
+        self.pending_ops = []
+        self.deltas_since_snapshot = deltas_since_snapshot
+        # A delta on top of a broken chain would not link up either
+        self.force_snapshot = broken
+        self.touched = time.monotonic()
+
+
+class DraftBuffer:
+    """In-memory heads of active drafts plus their unflushed ops"""
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def save(self, session_id, base_revision=None, ops=None, code=None, language=None):
+        """Apply an autosave and return the new revision.
+
+        Send either ``ops`` against ``base_revision`` or the full ``code``;
+        full code is accepted whatever the head is. Raises ``DraftConflict``
+        when ``ops`` are based on a stale revision and ``ValueError`` when they
+        don't fit the draft.
+        """
+        self._ensure_flusher()
+        state = self._state(session_id)
+        with self._lock:
+            if code is not None:
+                state.text = code
+                state.pending_ops = []
+                state.force_snapshot = True
+            else:
+                if base_revision != state.revision:
+                    raise DraftConflict(state.revision)
+                state.text = apply_ops(state.text, ops)
+                state.pending_ops.extend(ops)
+            if language:
+                state.language = language
+            state.revision += 1
+            state.touched = time.monotonic()
+            return state.revision
+
+    def latest(self, session_ids):
+        """``{session_id: (revision, text, language)}`` for sessions with a draft"""
+        with self._lock:
+            buffered = {
+                session_id: (state.revision, state.text, state.language)
+                for session_id in session_ids
+                for state in [self._states.get(session_id)]
+                if state is not None and state.revision
+            }
+        missing = [session_id for session_id in session_ids if session_id not in buffered]
+        if missing:
+            for session_id, (revision, text, language, _, _) in load_drafts(missing).items():
+                buffered[session_id] = (revision, text, language)
+        return buffered
+
+    def _state(self, session_id):
+        with self._lock:
+            state = self._states.get(session_id)
+        if state is not None:
+            return state
+        loaded = load_drafts([session_id]).get(session_id)
+        state = _DraftState(*loaded) if loaded else _DraftState()
+        with self._lock:
+            # Another request may have loaded it meanwhile
+            return self._states.setdefault(session_id, state)
+
+    def flush(self):
+        """Write every session's unflushed revisions as one row each"""
+        snapshot_every = _config().get('SNAPSHOT_EVERY', 20)
+        idle_after = _config().get('EVICT_AFTER', 600)
+        now = time.monotonic()
+        rows, flushed = [], []
+        with self._lock:
+            for session_id, state in list(self._states.items()):
+                if state.revision == state.flushed_revision:
+                    if now - state.touched > idle_after:
+                        del self._states[session_id]
+                    continue
+                ops_size = len(json.dumps(state.pending_ops))
+                if (state.force_snapshot or state.flushed_revision == 0
+                        or state.deltas_since_snapshot + 1 >= snapshot_every
+                        or ops_size >= len(state.text)):
+                    rows.append(DraftRevision(
+                        session_id=session_id, revision=state.revision, kind='snapshot',
+                        code=state.text, language=state.language,
+                    ))
+                    state.deltas_since_snapshot = 0
+                else:
+                    rows.append(DraftRevision(
+                        session_id=session_id, revision=state.revision, kind='delta',
+                        base_revision=state.flushed_revision, ops=state.pending_ops,
+                        language=state.language,
+                    ))
+                    state.deltas_since_snapshot += 1
+                flushed.append(state)
+                state.flushed_revision = state.revision
+                state.pending_ops = []
+                state.force_snapshot = False
+        if not rows:
+            return 0
+        try:
+            conflicts = self._write(rows)
+        except Exception:
+            logger.exception('Flushing %d draft revisions failed', len(rows))
+            with self._lock:
+                # The ops are gone; mark the drafts unflushed so the next
+                # flush writes full snapshots instead
+                for state in flushed:
+                    state.force_snapshot = True
+                    state.flushed_revision = None
+            return 0
+        if conflicts:
+            self._renumber([(row.session_id, state) for row, state in zip(rows, flushed) if row in conflicts])
+        return len(rows) - len(conflicts)
+
+    def _write(self, rows):
+        """Insert ``rows``; returns those whose revision another worker already wrote"""
+        try:
+            with transaction.atomic():
+                DraftRevision.objects.bulk_create(rows)
+            return []
+        except IntegrityError:
+            pass
+        conflicts = []
+        for row in rows:
+            try:
+                with transaction.atomic():
+                    row.save(force_insert=True)
+            except IntegrityError:
+                conflicts.append(row)
+        return conflicts
+
+    def _renumber(self, conflicted):
+        """Move conflicted drafts past the database head so their text is kept.
+
+        The buffered text becomes a snapshot at a revision no client holds, so
+        the next ops the client sends get ``DraftConflict`` (409) and it
+        resends its full code.
+        """
+        heads = dict(
+            DraftRevision.objects
+            .filter(session_id__in=[session_id for session_id, _ in conflicted])
+            .values_list('session_id')
+            .annotate(head=Max('revision'))
+        )
+        logger.warning('%d draft revisions were already written by another worker', len(conflicted), extra={
+            'sessions': sorted(heads),
+        })
+        with self._lock:
+            for session_id, state in conflicted:
+                state.revision = max(state.revision, heads.get(session_id, 0)) + 1
+                state.pending_ops = []
+                state.force_snapshot = True
+                state.flushed_revision = None
+
+    def _ensure_flusher(self):
+        if self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run_flusher, name='draft-flusher', daemon=True)
+                self._flusher.start()
+                atexit.register(self.flush)
+
+    def _run_flusher(self):
+        interval = _config().get('FLUSH_INTERVAL', 5)
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Draft flusher failed')
+            finally:
+                connection.close()
+
+
+draft_buffer = DraftBuffer()
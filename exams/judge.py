@@ -0,0 +1,221 @@
+"""
+Grading of exam submissions.
+
+``grade`` runs a submission against the problem's test cases and records
+the results synchronously. It only accepts a session that is still open:
+the session is claimed (marked completed) before judging, so a late
+submission or a second one raises ``SessionClosed``. ``enqueue`` schedules
+the same work on a bounded pool of judge threads and returns a Future; the
+session sweeper uses ``enqueue_many`` to auto-submit the sessions it just
+closed, which stores the code of the whole batch with one
+``CodeBlob.store_many``. Each language gets its own pool, sized by its
+backend's ``workers`` option (``settings.JUDGE_WORKERS`` by default) and
+warmed up by the backend before its first submission.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from . import languages, metrics
+from .models import CodeBlob, ExamSession, Submission, TestResult, UserProblemProgress
+from .results import compact as compact_results
+from .tracing import span, current_trace_id
+
+
+logger = logging.getLogger(__name__)
+
+_pools = {}
+_pool_lock = threading.Lock()
+
+
+class SessionClosed(Exception):
+    """The session takes no more submissions; ``reason`` is 'completed' or 'expired'"""
+
+    MESSAGES = {
+        'completed': 'Session has already been submitted',
+        'expired': 'Session has expired',
+    }
+
+    def __init__(self, reason):
+        super().__init__(self.MESSAGES[reason])
+        self.reason = reason
+
+
+def claim(exam_session, now=None):
+    """Mark an open session completed in the database, or raise ``SessionClosed``"""
+    if exam_session.is_completed:
+        raise SessionClosed('completed')
+    if exam_session.seconds_remaining(now or timezone.now()) == 0:
+        raise SessionClosed('expired')
+    # Conditional, so of two concurrent submits only one gets the session
+    if not ExamSession.objects.filter(pk=exam_session.pk, is_completed=False).update(is_completed=True):
+        raise SessionClosed('completed')
+
+
+def grade(exam_session, code, language, user=None, closed_ok=False, code_stored=False):
+    """Judge ``code`` for ``exam_session`` and return the saved Submission.
+
+    Raises ``SessionClosed`` unless the session is open; ``closed_ok`` skips
+    the check for the sweeper, which grades sessions it has just closed.
+    ``code_stored`` means the code's blob was already written in a batch.
+    """
+    if closed_ok:
+        return _grade(exam_session, code, language, user, code_stored)
+    claim(exam_session)
+    try:
+        return _grade(exam_session, code, language, user, code_stored)
+    except BaseException:
+        # Reopen it so the code can be submitted again
+        ExamSession.objects.filter(pk=exam_session.pk).update(is_completed=False)
+        raise
+
+
+def _grade(exam_session, code, language, user, code_stored):
+    # Create submission
+    with span('create_submission'):
+        submission = Submission(
+            user=user,
+            problem=exam_session.problem,
+            contest=exam_session.contest,
+            exam_session=exam_session,
+            code=code,
+            language=language
+        )
+        submission.save(force_insert=True, store_code=not code_stored)
+
+    # Execute code against test cases
+    with span('load_test_cases'):
+        test_cases = list(exam_session.problem.test_cases.all())
+        test_data = []
+
+        for test_case in test_cases:
+            test_data.append({
+                'name': test_case.name,
+                'input': test_case.input_data,
+                'input_blob': test_case.input_blob,
+                'expected': test_case.expected_output
+            })
+
+    # Execute code (imported here because views imports this module)
+    from .views import CodeExecutionView
+    code_executor = CodeExecutionView()
+    results = code_executor.execute_code(code, language, test_data)
+
+    # Calculate score and update submission
+    total_points = sum(test_case.points for test_case, result in zip(test_cases, results) if result['passed'])
+    passed_tests = sum(1 for result in results if result['passed'])
+    fields, failures = compact_results(results, test_cases)
+
+    with span('write_test_results'):
+        # Only failing tests get a row; passed ones are rebuilt from the test case
+        TestResult.objects.bulk_create([
+            TestResult(
+                submission=submission,
+                test_case=test_case,
+                actual_output=result['actual'],
+                is_passed=False,
+                execution_time=result.get('execution_time'),
+                error_message=result.get('error') or '',
+            )
+            for test_case, result in failures
+        ])
+
+    # Determine submission status
+    if passed_tests == len(test_cases):
+        submission.status = 'accepted'
+    elif any(result.get('verdict') == 'compilation_error' for result in results):
+        submission.status = 'compilation_error'
+    elif any(result.get('verdict') == 'output_limit_exceeded' for result in results):
+        submission.status = 'output_limit_exceeded'
+    else:
+        submission.status = 'wrong_answer'
+
+    # Update submission
+    submission.score = total_points
+    submission.points_earned = total_points
+    for field, value in fields.items():
+        setattr(submission, field, value)
+    # Serializing the response shouldn't rebuild what we already have
+    submission.detailed_results = results
+    with span('save_submission'):
+        submission.save()
+
+    metrics.submissions_total.inc(language=language, verdict=submission.status)
+
+    with span('update_progress'):
+        UserProblemProgress.record(submission)
+
+    # Update problem statistics
+    with span('update_statistics'):
+        exam_session.problem.update_statistics()
+
+    # Mark session as submitted
+    exam_session.is_submitted = True
+    exam_session.score = total_points
+    exam_session.finish()
+    with span('save_session'):
+        exam_session.save()
+
+    logger.info('Submission %s judged: %s', submission.id, submission.status, extra={
+        'submission_id': submission.id,
+        'session_id': exam_session.pk,
+        'problem_id': exam_session.problem_id,
+        'language': language,
+        'verdict': submission.status,
+        'passed': passed_tests,
+        'total': len(test_cases),
+        'score': total_points,
+        'trace_id': current_trace_id(),
+    })
+    return submission
+
+
+def _pool_executor(language):
+    backend = languages.get_backend(language)
+    # Unknown languages are judged (as unsupported) on one shared pool
+    key = backend.name if backend else None
+    with _pool_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            workers = backend.option('workers') if backend else None
+            pool = _pools[key] = ThreadPoolExecutor(
+                max_workers=workers or getattr(settings, 'JUDGE_WORKERS', 4),
+                thread_name_prefix=f'judge-{key or "other"}',
+            )
+            if backend:
+                pool.submit(languages.warm_up, [backend.name])
+        return pool
+
+
+def _grade_session(session_id, code, language, code_stored=False):
+    try:
+        exam_session = ExamSession.objects.select_related('problem', 'contest', 'user').get(pk=session_id)
+        return grade(exam_session, code, language, user=exam_session.user, closed_ok=True, code_stored=code_stored)
+    except Exception:
+        logger.exception('Judging session %s failed', session_id, extra={'session_id': session_id})
+        raise
+    finally:
+        # Judge threads are long-lived; don't leave a connection open per thread
+        connection.close()
+
+
+def enqueue(session_id, code, language):
+    """Grade a session's code on the judge pool; returns a Future of the Submission"""
+    return _pool_executor(language).submit(_grade_session, session_id, code, language)
+
+
+def enqueue_many(jobs):
+    """``enqueue`` for ``{session_id: (code, language)}``; returns ``{session_id: Future}``.
+
+    The code of every job is stored first, in one batch, so the judge
+    threads don't each look up and insert their blob.
+    """
+    CodeBlob.store_many({code for code, _ in jobs.values() if code is not None})
+    return {
+        session_id: _pool_executor(language).submit(_grade_session, session_id, code, language, True)
+        for session_id, (code, language) in jobs.items()
+    }
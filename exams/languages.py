@@ -0,0 +1,239 @@
+"""
+Language backends of the judge.
+
+Every language ``CodeExecutionView.execute_code`` accepts is a
+``LanguageBackend`` subclass registered with ``@register``. A backend
+declares how a submission is turned into test runs; the executor drives
+all of them the same way:
+
+- ``prepare(code)`` is the compile step, run once per submission. It
+  returns whatever the launches need and raises ``CompilationError`` for
+  code that doesn't compile.
+- ``launch(prepared, test_case)`` writes the harness for one test and
+  returns the ``Launch`` (command, temporary files, resource limits,
+  optional zygote job) that starts it.
+- ``report(...)`` builds the result report for backends whose programs
+  print their answer instead of writing the result channel
+  (``reports_result = False``).
+- ``warm_up()`` does the expensive one-time setup (snapshot, zygote,
+  compiler probe) before the first submission needs it.
+
+``time_multiplier`` and ``memory_multiplier`` scale ``JUDGE_TIME_LIMIT`` and
+``JUDGE_MEMORY_LIMIT``, and ``workers`` sizes the language's judge pool.
+Every launch applies the resulting limits as ``RLIMIT_CPU`` and
+``RLIMIT_AS``: plain launches from ``preexec_fn``, zygote children in the
+zygote's runner.
+``settings.JUDGE_LANGUAGES`` overrides any of them per language, e.g.
+``{"python": {"workers": 2, "time_multiplier": 2}}``.
+"""
+import json
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+
+try:
+    import resource
+except ImportError:  # no rlimits on this platform; the timeout still applies
+    resource = None
+
+from . import native, node_snapshot
+from .native import CompilationError  # noqa: F401 (raised by prepare)
+from .zygote import interpreter, plain_source, python_zygote
+
+
+logger = logging.getLogger(__name__)
+
+_backends = {}
+
+
+def register(cls):
+    """Class decorator adding a backend to the registry under ``cls.name``"""
+    _backends[cls.name] = cls()
+    return cls
+
+
+def get_backend(language):
+    """The backend for ``language``, or None if the judge can't run it"""
+    return _backends.get(language)
+
+
+def languages():
+    return tuple(_backends)
+
+
+def warm_up(names=None):
+    """Run the warm-up routine of the given backends (all by default)"""
+    for name in names or languages():
+        backend = _backends[name]
+        try:
+            backend.warm_up()
+        except Exception as e:
+            logger.warning('Warming up %s failed: %s', name, e, extra={'language': name, 'error': str(e)})
+
+
+class Launch:
+    """How to start one test run, its limits, and the files to remove afterwards"""
+
+    def __init__(self, command, files=(), zygote_job=None, timeout=10, memory_limit=0):
+        self.command = command
+        self.files = list(files)
+        self.zygote_job = zygote_job
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+
+    def apply_limits(self):
+        """``preexec_fn`` of a plain launch, the same limits the zygote runner sets.
+
+        Runs in the forked child before exec, so it only makes system calls.
+        """
+        if resource is None:
+            return
+        cpu = int(self.timeout) + 1
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+        if self.memory_limit:
+            resource.setrlimit(resource.RLIMIT_AS, (self.memory_limit, self.memory_limit))
+
+    def cleanup(self):
+        for path in self.files:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+
+def write_temp(text, suffix):
+    with tempfile.NamedTemporaryFile(mode='w', suffix=suffix, delete=False) as f:
+        f.write(text)
+        return f.name
+
+
+class LanguageBackend:
+    """Base class of the registered languages"""
+    name = None
+    # Resource limits relative to JUDGE_TIME_LIMIT / JUDGE_MEMORY_LIMIT
+    time_multiplier = 1.0
+    memory_multiplier = 1.0
+    # Judge pool threads for queued submissions; None uses JUDGE_WORKERS
+    workers = None
+    # False when the program prints its answer instead of using the result channel
+    reports_result = True
+
+    def option(self, key):
+        """A backend attribute, overridden by settings.JUDGE_LANGUAGES"""
+        overrides = getattr(settings, 'JUDGE_LANGUAGES', {}).get(self.name, {})
+        return overrides.get(key, getattr(self, key))
+
+    def timeout(self):
+        return getattr(settings, 'JUDGE_TIME_LIMIT', 10) * self.option('time_multiplier')
+
+    def memory_limit(self):
+        return int(getattr(settings, 'JUDGE_MEMORY_LIMIT', 0) * self.option('memory_multiplier'))
+
+    def limits(self):
+        """Keyword arguments of ``Launch`` (and keys of a zygote job) for the limits"""
+        return {'timeout': self.timeout(), 'memory_limit': self.memory_limit()}
+
+    def prepare(self, code):
+        return code
+
+    def launch(self, prepared, test_case):
+        raise NotImplementedError
+
+    def report(self, stdout, test_case, started_at, elapsed):
+        raise NotImplementedError
+
+    def cleanup(self, prepared):
+        pass
+
+    def warm_up(self):
+        pass
+
+
+@register
+class JavaScriptBackend(LanguageBackend):
+    """Node.js, from the harness snapshot when enabled (see node_snapshot)"""
+    name = 'javascript'
+    # V8 reserves over 1 GiB of address space before running any code
+    memory_multiplier = 4.0
+
+    def prepare(self, code):
+        blob = node_snapshot.snapshot_blob()
+        # The snapshot's main function loads the submission; write it once
+        return {'code': code, 'blob': blob, 'path': write_temp(code, '.js') if blob else None}
+
+    def launch(self, prepared, test_case):
+        expected = json.dumps(test_case.get('expected', None))
+        if prepared['blob']:
+            path = write_temp(expected, '.json')
+            return Launch(['node', '--snapshot-blob', str(prepared['blob']), prepared['path'], path], [path],
+                          **self.limits())
+        path = write_temp(node_snapshot.plain_source(prepared['code'], expected), '.js')
+        return Launch(['node', path], [path], **self.limits())
+
+    def cleanup(self, prepared):
+        if prepared['path']:
+            os.unlink(prepared['path'])
+
+    def warm_up(self):
+        node_snapshot.snapshot_blob()
+
+
+@register
+class PythonBackend(LanguageBackend):
+    """CPython, forked from the zygote when enabled (see zygote)"""
+    name = 'python'
+
+    def launch(self, prepared, test_case):
+        expected = test_case.get('expected', None)
+        # The zygote runs its preloaded copy of the harness instead of the file,
+        # which is only launched if the zygote is unavailable
+        path = write_temp(plain_source(prepared, json.dumps(expected)), '.py')
+        limits = self.limits()
+        job = {'code': prepared, 'expected': expected, **limits}
+        return Launch(interpreter() + [path], [path], zygote_job=job, **limits)
+
+    def warm_up(self):
+        python_zygote.warm_up()
+
+
+class NativeBackend(LanguageBackend):
+    """Compiled languages: the program's stdout is its answer (see native)"""
+    reports_result = False
+
+    def prepare(self, code):
+        return native.compile_submission(self.name, code)
+
+    def launch(self, prepared, test_case):
+        # Keeps the binary out of eviction while the submission's tests run
+        os.utime(prepared)
+        return Launch([str(prepared)], **self.limits())
+
+    def report(self, stdout, test_case, started_at, elapsed):
+        expected = test_case.get('expected', None)
+        try:
+            actual = json.loads(stdout)
+        except ValueError:
+            actual = stdout.strip()
+        return {
+            'success': True,
+            'result': actual,
+            'expected': expected,
+            'passed': actual == expected,
+            # Measured around the whole process, so it includes startup
+            'timing': {'start': started_at, 'elapsed': elapsed},
+        }
+
+    def warm_up(self):
+        native.compiler_version(native.COMPILERS[self.name]['compiler'])
+
+
+@register
+class CBackend(NativeBackend):
+    name = 'c'
+
+
+@register
+class CppBackend(NativeBackend):
+    name = 'cpp'
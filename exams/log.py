@@ -0,0 +1,172 @@
+"""
+Logging building blocks used by ``settings.LOGGING``.
+
+Request threads only put records on an in-memory queue
+(``QueueListenerHandler``); a background ``QueueListener`` thread formats
+them and does the console and file I/O. Records are rendered as one JSON
+object per line by ``JsonFormatter``, with any ``extra={...}`` fields as
+top-level keys, e.g.::
+
+    logger.info('Submission %s judged', 12, extra={'submission_id': 12, 'verdict': 'accepted'})
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+
+
+# Attributes every LogRecord has; anything else came in through ``extra``
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Render a record and its ``extra`` fields as a single JSON line"""
+
+    def format(self, record):
+        data = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'process': record.process,
+            'thread': record.threadName,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exc'] = record.exc_text
+        if record.stack_info:
+            data['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(data, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of low-level records from chatty loggers.
+
+    ``rates`` maps logger name prefixes to the fraction to keep; the longest
+    matching prefix wins. Records at ``always_level`` or above always pass.
+    """
+
+    def __init__(self, rates=None, always_level='WARNING'):
+        super().__init__()
+        self.rates = sorted((rates or {}).items(), key=lambda item: len(item[0]), reverse=True)
+        self.always_level = logging.getLevelName(always_level) if isinstance(always_level, str) else always_level
+
+    def filter(self, record):
+        if record.levelno >= self.always_level:
+            return True
+        for prefix, rate in self.rates:
+            if record.name == prefix or record.name.startswith(prefix + '.'):
+                return rate >= 1 or random.random() < rate
+        return True
+
+
+class QueueListenerHandler(QueueHandler):
+    """``QueueHandler`` that owns a listener thread feeding ``handlers``.
+
+    Usable straight from ``dictConfig``: ``handlers`` may be given as
+    ``cfg://handlers.<name>`` references, which resolve to the configured
+    handler objects as long as those names sort before this handler's. When
+    the bounded queue is full the record is dropped rather than blocking the
+    caller; ``dropped`` counts them.
+    """
+
+    def __init__(self, handlers, maxsize=10000, respect_handler_level=True):
+        super().__init__(queue.Queue(maxsize=maxsize))
+        # Indexing a dictConfig ConvertingList resolves its cfg:// entries;
+        # plain iteration would hand over the strings
+        handlers = [handlers[i] for i in range(len(handlers))]
+        self.dropped = 0
+        self.listener = QueueListener(self.queue, *handlers, respect_handler_level=respect_handler_level)
+        self.listener.start()
+        self._pid = os.getpid()
+        atexit.register(self.stop)
+
+    def enqueue(self, record):
+        if os.getpid() != self._pid:
+            # Forked worker: the parent's listener thread did not survive
+            self._pid = os.getpid()
+            self.listener._thread = None
+            self.listener.start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # Render the message and traceback now; the listener must not touch
+        # args or exception objects owned by the request thread
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def stop(self):
+        """Flush the queue and stop the listener thread"""
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+
+class SizedTimedRotatingFileHandler(TimedRotatingFileHandler):
+    """Rotate on a time schedule and whenever the file exceeds ``maxBytes``.
+
+    Rotated files are ``<name>.<time suffix>``, plus ``.1``, ``.2``... for
+    further size rollovers in the same interval; ``backupCount`` limits the
+    number of rotated files of either kind.
+    """
+
+    def __init__(self, filename, maxBytes=0, **kwargs):
+        super().__init__(filename, **kwargs)
+        self.maxBytes = maxBytes
+
+    def shouldRollover(self, record):
+        if super().shouldRollover(record):
+            return True
+        if self.maxBytes > 0:
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.seek(0, 2)
+            return self.stream.tell() + len(self.format(record)) + 1 >= self.maxBytes
+        return False
+
+    def rotation_filename(self, default_name):
+        # Several size rollovers can happen within one time interval; keep
+        # each instead of overwriting the previous one, numbered after the
+        # newest so names keep their age order once old ones are deleted
+        name = super().rotation_filename(default_name)
+        dir_name, base_name = os.path.split(name)
+        taken = [0] if os.path.exists(name) else []
+        for file_name in os.listdir(dir_name):
+            n = file_name[len(base_name) + 1:]
+            if file_name.startswith(base_name + '.') and n.isdigit():
+                taken.append(int(n))
+        return f'{name}.{max(taken) + 1}' if taken else name
+
+    def getFilesToDelete(self):
+        # The base class doesn't recognise the size rollover suffix on every
+        # Python version, and would sort ".10" before ".2"
+        dir_name, base_name = os.path.split(self.baseFilename)
+        prefix = base_name + '.'
+        rotated = []
+        for file_name in os.listdir(dir_name):
+            if not file_name.startswith(prefix):
+                continue
+            stamp, _, n = file_name[len(prefix):].partition('.')
+            if self.extMatch.fullmatch(stamp) and (not n or n.isdigit()):
+                rotated.append(((stamp, int(n or 0)), os.path.join(dir_name, file_name)))
+        rotated.sort()
+        if len(rotated) <= self.backupCount:
+            return []
+        return [path for _, path in rotated[:len(rotated) - self.backupCount]]
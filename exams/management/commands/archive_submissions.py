@@ -0,0 +1,76 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from exams.archive import SegmentWriter, archive_root, serialize_submission
+from exams.models import CodeBlob, Submission
+
+
+logger = logging.getLogger('exams.archive')
+
+
+class Command(BaseCommand):
+    help = ('Move finished submissions older than --older-than days, with their test results, '
+            'into compressed archive segments and delete them from the database')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, required=True, metavar='DAYS',
+                            help='Archive submissions made more than this many days ago')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows per archive block (and per delete)')
+        parser.add_argument('--segment-rows', type=int, default=100000,
+                            help='Start a new segment file after this many rows')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report how many submissions would be archived')
+
+    def handle(self, *args, **options):
+        if options['older_than'] < 1:
+            raise CommandError('--older-than must be at least 1 day')
+        cutoff = timezone.now() - timedelta(days=options['older_than'])
+        candidates = (
+            Submission.objects
+            .filter(submitted_at__lt=cutoff)
+            .exclude(status__in=['pending', 'running'])
+        )
+        if options['dry_run']:
+            self.stdout.write(f'{candidates.count()} submissions older than {cutoff:%Y-%m-%d %H:%M} would be archived')
+            return
+
+        started = time.monotonic()
+        archived = 0
+        writer = None
+        while True:
+            batch = list(
+                candidates
+                .select_related('code_blob', 'problem')
+                .prefetch_related('problem__test_cases', 'test_results_detail')
+                .order_by('submitted_at', 'id')[:options['batch_size']]
+            )
+            if not batch:
+                break
+            if writer is None or writer.rows >= options['segment_rows']:
+                writer = SegmentWriter()
+            writer.write_block([serialize_submission(submission) for submission in batch])
+
+            # Only delete once the block is safely on disk
+            ids = [submission.id for submission in batch]
+            digests = {submission.code_blob_id for submission in batch if submission.code_blob_id}
+            with transaction.atomic():
+                Submission.objects.filter(id__in=ids).delete()
+                CodeBlob.objects.filter(digest__in=digests, submissions__isnull=True).delete()
+            archived += len(batch)
+            self.stdout.write(f'Archived {archived} submissions')
+
+        elapsed = time.monotonic() - started
+        logger.info('Archived %d submissions older than %s in %.1fs', archived, cutoff.isoformat(), elapsed, extra={
+            'archived': archived,
+            'cutoff': cutoff.isoformat(),
+            'root': str(archive_root()),
+        })
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {archived} submissions to {archive_root()} in {elapsed:.1f}s'
+        ))
@@ -0,0 +1,392 @@
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from exams import node_snapshot
+from exams.models import Problem, TestCase, ExamSession
+from exams.views import CodeExecutionView, ExamSessionViewSet
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# Synthetic "sum the array" solutions for every outcome the judge must handle
+SOLUTIONS = {
+    'javascript': {
+        'correct': '''function solve(nums) {
+    let total = 0;
+    for (const x of nums) total += x;
+    return total;
+}''',
+        'wrong': '''function solve(nums) {
+    let total = 1;
+    for (const x of nums) total += x;
+    return total;
+}''',
+        'tle': '''function solve(nums) {
+    while (true) {}
+}''',
+        'crash': '''function solve(nums) {
+    throw new Error('synthetic crash');
+}''',
+    },
+    'python': {
+        'correct': '''def solve(nums):
+    return sum(nums)''',
+        'wrong': '''def solve(nums):
+    return sum(nums) + 1''',
+        'tle': '''def solve(nums):
+    while True:
+        pass''',
+        'crash': '''def solve(nums):
+    raise RuntimeError('synthetic crash')''',
+    },
+}
+
+# Whole programs: scan the integers of the JSON input and print their sum
+NATIVE_SUM = r'''#include <stdio.h>
+int main(void) {
+    long long total = %s, value = 0;
+    int c, sign = 1, in_number = 0;
+    while ((c = getchar()) != EOF) {
+        if (c == '-') sign = -1;
+        else if (c >= '0' && c <= '9') { value = value * 10 + (c - '0'); in_number = 1; }
+        else { if (in_number) total += sign * value; value = 0; sign = 1; in_number = 0; }
+    }
+    printf("%%lld\n", total);
+    return 0;
+}'''
+NATIVE_SOLUTIONS = {
+    'correct': NATIVE_SUM % '0',
+    'wrong': NATIVE_SUM % '1',
+    # volatile keeps the optimizer from removing the empty loop
+    'tle': '''int main(void) {
+    for (volatile int i = 0; ; i++) {}
+}''',
+    'crash': '''#include <stdlib.h>
+int main(void) {
+    abort();
+}''',
+}
+SOLUTIONS['c'] = SOLUTIONS['cpp'] = NATIVE_SOLUTIONS
+
+DEFAULT_MIX = 'correct=70,wrong=15,crash=10,tle=5'
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def usage_snapshot():
+    """CPU seconds and peak RSS (KB) for this process and its children"""
+    if resource is None:
+        return None
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {
+        'cpu': own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime,
+        'peak_rss_kb': own.ru_maxrss,
+        'peak_child_rss_kb': children.ru_maxrss,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Benchmark judge throughput with synthetic problems and solution mixes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', choices=['execute', 'submit'], default='execute',
+                            help='Benchmark CodeExecutionView.execute_code directly or the full submit endpoint')
+        parser.add_argument('--languages', default='javascript,python',
+                            help='Comma-separated languages to benchmark')
+        parser.add_argument('--sizes', default='10,1000,100000,1000000',
+                            help='Comma-separated input array lengths')
+        parser.add_argument('--mix', default=DEFAULT_MIX,
+                            help='Weighted solution mix, e.g. correct=70,wrong=15,crash=10,tle=5')
+        parser.add_argument('--submissions', type=int, default=20,
+                            help='Submissions per (language, size) cell')
+        parser.add_argument('--tests', type=int, default=2,
+                            help='Test cases per synthetic problem')
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Number of submissions judged in parallel')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Random seed for inputs and the solution mix')
+        parser.add_argument('--json', dest='json_path',
+                            help='Write machine-readable results to this file')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the synthetic problems created by --target submit')
+        parser.add_argument('--startup', action='store_true',
+                            help='Run JavaScript cells both from the Node harness snapshot and with plain launches')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.rng = random.Random(options['seed'])
+        languages = [lang.strip() for lang in options['languages'].split(',') if lang.strip()]
+        sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        mix = self.parse_mix(options['mix'])
+
+        unknown = [lang for lang in languages if lang not in SOLUTIONS]
+        if unknown:
+            raise CommandError(f'No synthetic solutions for: {", ".join(unknown)}')
+
+        self.stdout.write(
+            f'Benchmarking {options["target"]} with concurrency {options["concurrency"]}, '
+            f'{options["submissions"]} submissions per cell'
+        )
+
+        cells = []
+        created_problems = []
+        try:
+            for size in sizes:
+                test_cases = self.make_test_cases(size)
+                problem = None
+                if options['target'] == 'submit':
+                    problem = self.create_problem(size, test_cases)
+                    created_problems.append(problem)
+                for language in languages:
+                    for launch in self.launch_modes(language):
+                        if launch is None:
+                            cell = self.run_cell(language, size, mix, test_cases, problem)
+                        else:
+                            cell = self.run_launch_cell(launch, language, size, mix, test_cases, problem)
+                        cells.append(cell)
+                        self.report_cell(cell)
+        finally:
+            if created_problems and not options['keep']:
+                Problem.objects.filter(pk__in=[p.pk for p in created_problems]).delete()
+
+        report = {
+            'meta': self.environment(),
+            'config': {
+                'target': options['target'],
+                'languages': languages,
+                'sizes': sizes,
+                'mix': mix,
+                'submissions': options['submissions'],
+                'tests': options['tests'],
+                'concurrency': options['concurrency'],
+                'seed': options['seed'],
+                'startup': options['startup'],
+            },
+            'cells': cells,
+        }
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            self.stdout.write(f'Wrote results to {options["json_path"]}')
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
+
+    def launch_modes(self, language):
+        """Node launch modes to compare; only JavaScript has a startup snapshot"""
+        if self.options['startup'] and language == 'javascript':
+            return ['snapshot', 'plain']
+        return [None]
+
+    def run_launch_cell(self, launch, language, size, mix, test_cases, problem):
+        """Run a cell with the Node snapshot on or off; unsupported if it can't be built"""
+        with override_settings(JUDGE_NODE_SNAPSHOT=launch == 'snapshot'):
+            # Built here so the build is not timed; None means plain launches
+            if launch == 'snapshot' and node_snapshot.snapshot_blob() is None:
+                return {'language': language, 'size': size, 'launch': launch, 'unsupported': True}
+            cell = self.run_cell(language, size, mix, test_cases, problem)
+        cell['launch'] = launch
+        return cell
+
+    def parse_mix(self, value):
+        """Parse 'kind=weight,...' into a weight dict"""
+        mix = {}
+        for part in value.split(','):
+            if not part.strip():
+                continue
+            kind, _, weight = part.partition('=')
+            kind = kind.strip()
+            if kind not in SOLUTIONS['javascript']:
+                raise CommandError(f'Unknown solution kind: {kind}')
+            try:
+                mix[kind] = float(weight) if weight else 1.0
+            except ValueError:
+                raise CommandError(f'Invalid weight for {kind}: {weight}')
+        if not mix or sum(mix.values()) <= 0:
+            raise CommandError('The solution mix must have a positive total weight')
+        return mix
+
+    def make_test_cases(self, size):
+        """Generate 'sum the array' test cases with arrays of the given length"""
+        test_cases = []
+        for i in range(self.options['tests']):
+            nums = [self.rng.randint(-1000, 1000) for _ in range(size)]
+            test_cases.append({
+                'name': f'Synthetic {i + 1}',
+                'input': [nums],
+                'expected': sum(nums),
+            })
+        return test_cases
+
+    def create_problem(self, size, test_cases):
+        """Persist a synthetic problem so the submit endpoint can judge it"""
+        problem = Problem.objects.create(
+            title=f'[bench] Sum of {size} integers',
+            description='Synthetic benchmark problem',
+            initial_code=SOLUTIONS['javascript']['correct'],
+            is_active=False,
+        )
+        for order, test_case in enumerate(test_cases, start=1):
+            TestCase.objects.create(
+                problem=problem,
+                name=test_case['name'],
+                input_data=test_case['input'],
+                expected_output=test_case['expected'],
+                is_hidden=True,
+                order=order,
+            )
+        return problem
+
+    def run_cell(self, language, size, mix, test_cases, problem):
+        """Judge a batch of submissions for one (language, size) pair"""
+        kinds = list(mix)
+        weights = [mix[kind] for kind in kinds]
+        jobs = self.rng.choices(kinds, weights=weights, k=self.options['submissions'])
+
+        if problem is not None:
+            judge = lambda kind: self.judge_submit(problem, language, kind)
+        else:
+            judge = lambda kind: self.judge_execute(language, kind, test_cases)
+
+        before = usage_snapshot()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.options['concurrency']) as pool:
+            samples = list(pool.map(judge, jobs))
+        wall = time.perf_counter() - started
+        after = usage_snapshot()
+
+        latencies = sorted(sample['latency'] for sample in samples)
+        outcomes = {}
+        mismatches = 0
+        for kind, sample in zip(jobs, samples):
+            outcomes[sample['outcome']] = outcomes.get(sample['outcome'], 0) + 1
+            if sample['outcome'] != kind:
+                mismatches += 1
+
+        cell = {
+            'language': language,
+            'size': size,
+            'submissions': len(samples),
+            'wall_seconds': wall,
+            'submissions_per_second': len(samples) / wall if wall else None,
+            'latency': {
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+                'mean': sum(latencies) / len(latencies) if latencies else None,
+                'max': latencies[-1] if latencies else None,
+            },
+            'requested': {kind: jobs.count(kind) for kind in kinds},
+            'outcomes': outcomes,
+            'mismatches': mismatches,
+            # Every test case is a separate child, so this is mostly process startup
+            'mean_seconds_per_test': sum(latencies) / len(latencies) / len(test_cases) if latencies else None,
+        }
+        if before and after:
+            cell['cpu_seconds_per_submission'] = (after['cpu'] - before['cpu']) / len(samples)
+            cell['peak_rss_kb'] = after['peak_rss_kb']
+            cell['peak_child_rss_kb'] = after['peak_child_rss_kb']
+        return cell
+
+    def judge_execute(self, language, kind, test_cases):
+        """Run one submission through CodeExecutionView.execute_code"""
+        started = time.perf_counter()
+        results = CodeExecutionView().execute_code(SOLUTIONS[language][kind], language, test_cases)
+        latency = time.perf_counter() - started
+        return {'latency': latency, 'outcome': self.classify(results)}
+
+    def judge_submit(self, problem, language, kind):
+        """Run one submission through ExamSessionViewSet.submit"""
+        try:
+            session = ExamSession.objects.create(
+                session_id=str(uuid.uuid4()),
+                problem=problem,
+                time_remaining=problem.session_seconds(),
+            )
+            request = APIRequestFactory().post(
+                f'/api/sessions/{session.pk}/submit/',
+                {'code': SOLUTIONS[language][kind], 'language': language},
+                format='json',
+            )
+            view = ExamSessionViewSet.as_view({'post': 'submit'})
+            started = time.perf_counter()
+            response = view(request, pk=session.pk)
+            latency = time.perf_counter() - started
+            if response.status_code != 200:
+                return {'latency': latency, 'outcome': f'http_{response.status_code}'}
+            return {'latency': latency, 'outcome': self.classify(response.data['test_results'])}
+        finally:
+            # Worker threads open their own connections; don't leak them
+            connection.close()
+
+    def classify(self, results):
+        """Map judge results back onto the solution kinds"""
+        if results and all(result['passed'] for result in results):
+            return 'correct'
+        errors = [result.get('error') for result in results if result.get('error')]
+        if any(error == 'Execution timeout' for error in errors):
+            return 'tle'
+        if errors:
+            return 'crash'
+        return 'wrong'
+
+    def report_cell(self, cell):
+        """Print a one-line summary for a cell"""
+        language = cell['language'] + (f' ({cell["launch"]})' if 'launch' in cell else '')
+        if cell.get('unsupported'):
+            self.stdout.write(self.style.WARNING(
+                f'{language:<22} n={cell["size"]:<8} unsupported: the Node snapshot could not be built'
+            ))
+            return
+        latency = cell['latency']
+        line = (
+            f'{language:<22} n={cell["size"]:<8} '
+            f'{cell["submissions_per_second"]:.2f} sub/s  '
+            f'p50={latency["p50"]:.3f}s p95={latency["p95"]:.3f}s p99={latency["p99"]:.3f}s'
+            f'  per test={cell["mean_seconds_per_test"]:.3f}s'
+        )
+        if 'cpu_seconds_per_submission' in cell:
+            line += f'  cpu/sub={cell["cpu_seconds_per_submission"]:.3f}s'
+        self.stdout.write(line)
+        if cell['mismatches']:
+            self.stdout.write(self.style.WARNING(
+                f'  {cell["mismatches"]} submissions judged differently than expected: {cell["outcomes"]}'
+            ))
+
+    def environment(self):
+        """Describe the machine so results can be compared between releases"""
+        meta = {
+            'timestamp': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        }
+        try:
+            meta['node'] = subprocess.run(
+                ['node', '--version'], capture_output=True, text=True, timeout=10
+            ).stdout.strip()
+        except (OSError, subprocess.TimeoutExpired):
+            meta['node'] = None
+        return meta
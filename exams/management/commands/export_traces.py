@@ -0,0 +1,71 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Convert judge traces from the tracing JSONL file to Chrome trace-event JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--input', help='Trace JSONL file (defaults to TRACING["FILE"])')
+        parser.add_argument('-o', '--output', default='traces.json', help='File to write')
+        parser.add_argument('--trace-id', action='append', dest='trace_ids',
+                            help='Only export this trace (may be repeated)')
+        parser.add_argument('--last', type=int, help='Only export the last N traces')
+
+    def handle(self, *args, **options):
+        path = Path(options['input'] or settings.TRACING['FILE'])
+        if not path.exists():
+            raise CommandError(f'No trace file at {path}')
+
+        traces = []
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    trace = json.loads(line)
+                except ValueError:
+                    # A partially written last line from a crashed worker
+                    continue
+                if options['trace_ids'] and trace['trace_id'] not in options['trace_ids']:
+                    continue
+                traces.append(trace)
+        if options['last']:
+            traces = traces[-options['last']:]
+        if not traces:
+            raise CommandError('No matching traces')
+
+        events = []
+        for tid, trace in enumerate(traces, start=1):
+            events.extend(self.trace_events(trace, tid))
+
+        with open(options['output'], 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        self.stdout.write(f'Wrote {len(traces)} traces ({len(events)} events) to {options["output"]}')
+
+    def trace_events(self, trace, tid):
+        """Complete ('X') events for one trace, one thread row per trace"""
+        base_us = trace['started_at'] * 1e6
+        events = [{
+            'name': 'thread_name',
+            'ph': 'M',
+            'pid': 1,
+            'tid': tid,
+            'args': {'name': f'{trace["name"]} {trace["trace_id"][:8]}'},
+        }]
+        for record in trace['spans']:
+            events.append({
+                'name': record['name'],
+                'cat': trace['name'],
+                'ph': 'X',
+                'ts': base_us + record['start_us'],
+                'dur': record['dur_us'],
+                'pid': 1,
+                'tid': tid,
+                'args': dict(record['attrs'], trace_id=trace['trace_id'], span_id=record['id']),
+            })
+        return events
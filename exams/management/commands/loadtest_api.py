@@ -0,0 +1,310 @@
+import io
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from exams.models import Contest, ContestParticipant, Problem
+
+
+SCENARIO_DIR = Path(__file__).resolve().parents[2] / 'scenarios'
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+LOADTEST_USER_PREFIX = 'loadtest_'
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def client_host():
+    """A Host header the configured ALLOWED_HOSTS accepts"""
+    for host in settings.ALLOWED_HOSTS:
+        if host == '*':
+            return 'localhost'
+        # '.example.com' matches example.com and its subdomains
+        return host.lstrip('.')
+    return 'localhost'
+
+
+class Command(BaseCommand):
+    help = 'Replay contest-day traffic scenarios against the API in-process and report per-endpoint latency'
+
+    # Each action returns (endpoint label, HTTP method, path)
+    ACTIONS = {
+        'register': lambda ctx: ('contest_register', 'post', f'/api/contests/{ctx["contest"].pk}/register/'),
+        'leaderboard': lambda ctx: ('contest_leaderboard', 'get', f'/api/contests/{ctx["contest"].pk}/leaderboard/'),
+        'list_contests': lambda ctx: ('contest_list', 'get', '/api/contests/'),
+        'list_problems': lambda ctx: ('problem_list', 'get', '/api/problems/'),
+        'problem_detail': lambda ctx: ('problem_detail', 'get', f'/api/problems/{ctx["rng"].choice(ctx["problems"])}/'),
+        'start_exam': lambda ctx: ('problem_start_exam', 'post', f'/api/problems/{ctx["rng"].choice(ctx["problems"])}/start_exam/'),
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario',
+                            help='Scenario name from exams/scenarios/ or a path to a scenario JSON file')
+        parser.add_argument('--users', type=int, help='Override the number of virtual users')
+        parser.add_argument('--concurrency', type=int, help='Override the number of concurrent users')
+        parser.add_argument('--iterations', type=int, help='Override the actions per user after setup')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the user mix')
+        parser.add_argument('--skip-seed', action='store_true',
+                            help='Do not run populate_problems before the test')
+        parser.add_argument('--cleanup', action='store_true',
+                            help='Delete the load-test users afterwards')
+        parser.add_argument('--json', dest='json_path', help='Write the report to this file')
+
+    def handle(self, *args, **options):
+        scenario = self.load_scenario(options['scenario'])
+        for key in ('users', 'concurrency', 'iterations'):
+            if options[key] is not None:
+                scenario[key] = options[key]
+
+        unknown = [name for name in list(scenario.get('setup', [])) + list(scenario['mix'])
+                   if name not in self.ACTIONS]
+        if unknown:
+            raise CommandError(f'Unknown actions in scenario: {", ".join(unknown)}')
+
+        if not options['skip_seed']:
+            call_command('populate_problems', stdout=io.StringIO())
+
+        contest = Contest.objects.filter(title=scenario.get('contest')).first() or Contest.objects.first()
+        if contest is None:
+            raise CommandError('No contest to run against; run populate_problems first')
+        problems = list(Problem.objects.filter(is_active=True).values_list('pk', flat=True))
+        if not problems:
+            raise CommandError('No active problems to run against; run populate_problems first')
+
+        users = self.ensure_users(scenario['users'])
+        if 'register' in scenario['setup']:
+            self.reset_registrations(contest, users)
+        self.stdout.write(
+            f'Running scenario {scenario["name"]!r}: {len(users)} users, '
+            f'concurrency {scenario["concurrency"]}, {scenario["iterations"]} actions each'
+        )
+
+        rng = random.Random(options['seed'])
+        plans = [
+            (user, random.Random(rng.random()))
+            for user in users
+        ]
+
+        self.warm_up(users[0], scenario, contest, problems)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=scenario['concurrency']) as pool:
+            per_user = list(pool.map(
+                lambda plan: self.run_user(plan[0], plan[1], scenario, contest, problems),
+                plans,
+            ))
+        wall = time.perf_counter() - started
+
+        samples = [sample for user_samples in per_user for sample in user_samples]
+        report = {
+            'scenario': scenario,
+            'started_at': timezone.now().isoformat(),
+            'wall_seconds': wall,
+            'requests': len(samples),
+            'requests_per_second': len(samples) / wall if wall else None,
+            'endpoints': self.summarize(samples),
+        }
+        self.print_report(report)
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            self.stdout.write(f'Wrote report to {options["json_path"]}')
+
+        if options['cleanup']:
+            User.objects.filter(username__startswith=LOADTEST_USER_PREFIX).delete()
+
+    def load_scenario(self, name):
+        """Load a scenario by name or path and fill in defaults"""
+        path = Path(name)
+        if not path.exists():
+            path = SCENARIO_DIR / f'{name}.json'
+        if not path.exists():
+            raise CommandError(f'Scenario not found: {name}')
+        with open(path) as f:
+            scenario = json.load(f)
+        if not scenario.get('mix'):
+            raise CommandError('Scenario must define a non-empty "mix"')
+        scenario.setdefault('name', path.stem)
+        scenario.setdefault('users', 50)
+        scenario.setdefault('concurrency', 8)
+        scenario.setdefault('iterations', 10)
+        scenario.setdefault('think_time_ms', [0, 0])
+        scenario.setdefault('setup', [])
+        return scenario
+
+    def ensure_users(self, count):
+        """Create (or reuse) the virtual users in one batch"""
+        usernames = [f'{LOADTEST_USER_PREFIX}{i:06d}' for i in range(count)]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        missing = [User(username=username) for username in usernames if username not in existing]
+        for user in missing:
+            user.set_unusable_password()
+        User.objects.bulk_create(missing, batch_size=1000)
+        return list(User.objects.filter(username__in=usernames).order_by('username'))
+
+    def reset_registrations(self, contest, users):
+        """Unregister the virtual users so a rerun's register setup succeeds again"""
+        removed, _ = ContestParticipant.objects.filter(contest=contest, user__in=users).delete()
+        if removed:
+            Contest.objects.filter(pk=contest.pk).update(current_participants=F('current_participants') - removed)
+
+    def make_client(self, user):
+        client = Client(HTTP_HOST=client_host())
+        client.force_login(user)
+        return client
+
+    def warm_up(self, user, scenario, contest, problems):
+        """Issue each read action of the mix once, untimed, and stop if any of them fails"""
+        client = self.make_client(user)
+        ctx = {'contest': contest, 'problems': problems, 'rng': random.Random(0)}
+        try:
+            for name in scenario['mix']:
+                if self.ACTIONS[name](ctx)[1] == 'get':
+                    self.require_success(self.perform(client, name, ctx), 'Warm-up')
+        finally:
+            connection.close()
+
+    def require_success(self, sample, phase):
+        """Abort the run on a failed setup or warm-up request rather than report it"""
+        if sample['status'] is None or sample['status'] >= 400:
+            raise CommandError(
+                f'{phase} request to {sample["endpoint"]} failed with status {sample["status"]}: '
+                f'{sample["detail"]}'
+            )
+        return sample
+
+    def run_user(self, user, rng, scenario, contest, problems):
+        """Play one virtual user's session and return its request samples"""
+        client = self.make_client(user)
+        ctx = {'contest': contest, 'problems': problems, 'rng': rng}
+        names = list(scenario['mix'])
+        weights = [scenario['mix'][name] for name in names]
+        low, high = scenario['think_time_ms']
+
+        samples = []
+        try:
+            for name in scenario['setup']:
+                samples.append(self.require_success(self.perform(client, name, ctx), 'Setup'))
+            for name in rng.choices(names, weights=weights, k=scenario['iterations']):
+                samples.append(self.perform(client, name, ctx))
+                if high:
+                    time.sleep(rng.uniform(low, high) / 1000)
+        finally:
+            connection.close()
+        return samples
+
+    def perform(self, client, name, ctx):
+        """Issue one request and time it"""
+        endpoint, method, path = self.ACTIONS[name](ctx)
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            try:
+                response = getattr(client, method)(path, content_type='application/json')
+                status_code = response.status_code
+                # API errors are short JSON; anything else is a debug page, so keep its reason
+                if response.get('Content-Type', '').startswith('application/json'):
+                    detail = response.content[:200].decode('utf-8', 'replace')
+                else:
+                    detail = response.reason_phrase
+            except Exception as e:
+                status_code = None
+                detail = repr(e)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+        return {
+            'endpoint': endpoint,
+            'status': status_code,
+            'detail': detail,
+            'latency_ms': elapsed_ms,
+            'queries': len(queries.captured_queries),
+        }
+
+    def summarize(self, samples):
+        """Aggregate samples into per-endpoint statistics"""
+        grouped = {}
+        for sample in samples:
+            grouped.setdefault(sample['endpoint'], []).append(sample)
+
+        summary = {}
+        for endpoint, endpoint_samples in sorted(grouped.items()):
+            latencies = sorted(sample['latency_ms'] for sample in endpoint_samples)
+            queries = [sample['queries'] for sample in endpoint_samples]
+            server_errors = sum(1 for s in endpoint_samples if s['status'] is None or s['status'] >= 500)
+            client_errors = sum(1 for s in endpoint_samples if s['status'] is not None and 400 <= s['status'] < 500)
+
+            histogram = {f'le_{bound}': 0 for bound in HISTOGRAM_BUCKETS_MS}
+            histogram['le_inf'] = 0
+            for latency in latencies:
+                for bound in HISTOGRAM_BUCKETS_MS:
+                    if latency <= bound:
+                        histogram[f'le_{bound}'] += 1
+                        break
+                else:
+                    histogram['le_inf'] += 1
+
+            statuses = {}
+            for sample in endpoint_samples:
+                key = str(sample['status'])
+                statuses[key] = statuses.get(key, 0) + 1
+
+            summary[endpoint] = {
+                'requests': len(endpoint_samples),
+                'statuses': statuses,
+                'error_rate': server_errors / len(endpoint_samples),
+                'client_error_rate': client_errors / len(endpoint_samples),
+                'latency_ms': {
+                    'p50': percentile(latencies, 50),
+                    'p95': percentile(latencies, 95),
+                    'p99': percentile(latencies, 99),
+                    'mean': sum(latencies) / len(latencies),
+                    'max': latencies[-1],
+                },
+                'histogram_ms': histogram,
+                'queries_per_request': {
+                    'mean': sum(queries) / len(queries),
+                    'max': max(queries),
+                },
+            }
+        return summary
+
+    def print_report(self, report):
+        """Print a human-readable summary table"""
+        self.stdout.write(
+            f'{report["requests"]} requests in {report["wall_seconds"]:.2f}s '
+            f'({report["requests_per_second"]:.1f} req/s)'
+        )
+        self.stdout.write(
+            f'{"endpoint":<22}{"reqs":>7}{"err%":>7}{"4xx%":>7}'
+            f'{"p50ms":>9}{"p95ms":>9}{"p99ms":>9}{"q/req":>8}'
+        )
+        for endpoint, stats in report['endpoints'].items():
+            latency = stats['latency_ms']
+            line = (
+                f'{endpoint:<22}{stats["requests"]:>7}'
+                f'{stats["error_rate"] * 100:>7.1f}{stats["client_error_rate"] * 100:>7.1f}'
+                f'{latency["p50"]:>9.1f}{latency["p95"]:>9.1f}{latency["p99"]:>9.1f}'
+                f'{stats["queries_per_request"]["mean"]:>8.1f}'
+            )
+            if stats['error_rate']:
+                line = self.style.ERROR(line)
+            self.stdout.write(line)
@@ -1,17 +1,59 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth.models import User
+from django.contrib.auth.hashers import make_password
 from django.utils import timezone
 from datetime import timedelta
+import math
+import random
+import time
 from exams.models import (
     Problem, TestCase, ProblemCategory, Contest, ContestParticipant,
-    UserProfile, Leaderboard
+    UserProfile, Leaderboard, Submission, UserProblemProgress, CodeBlob
 )
 
 
+# Synthetic solutions used for generated submissions, by language
+SYNTHETIC_CODE = {
+    'javascript': [
+        'function solve(nums) {\n    return nums.reduce((a, b) => a + b, 0);\n}',
+        'function solve(nums) {\n    let total = 0;\n    for (const x of nums) total += x;\n    return total;\n}',
+        'function solve(nums) {\n    // Your code here\n}',
+    ],
+    'python': [
+        'def solve(nums):\n    return sum(nums)',
+        'def solve(nums):\n    total = 0\n    for x in nums:\n        total += x\n    return total',
+        'def solve(nums):\n    # Your code here\n    pass',
+    ],
+}
+
+# Distribution of verdicts for submissions that are not accepted
+FAILURE_STATUSES = [
+    ('wrong_answer', 60),
+    ('time_limit_exceeded', 15),
+    ('runtime_error', 15),
+    ('compilation_error', 10),
+]
+
+
 class Command(BaseCommand):
     help = 'Populate the database with sample problems, categories, and contests'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int,
+                            help='Generate a synthetic dataset with this many users instead of the sample data')
+        parser.add_argument('--problems', type=int, help='Problems to generate (default: users / 20)')
+        parser.add_argument('--contests', type=int, help='Contests to generate (default: users / 500)')
+        parser.add_argument('--submissions', type=int, help='Submissions to generate (default: users * 20)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for reproducible datasets')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk_create batch')
+        parser.add_argument('--history-days', type=float, default=365,
+                            help='Spread submission times over this many past days (default: 365)')
+
     def handle(self, *args, **options):
+        if options.get('scale'):
+            self.generate_scaled_dataset(options)
+            return
+        
         self.stdout.write('Creating sample data for HackerRank-style coding platform...')
         
         # Create superuser if it doesn't exist
@@ -358,4 +400,340 @@ A substring is a contiguous sequence of characters within a string.''',
                 )
                 
                 if created:
-                    self.stdout.write(f'Created leaderboard entry for {user.username} in {contest.title}') 
\ No newline at end of file
+                    self.stdout.write(f'Created leaderboard entry for {user.username} in {contest.title}')
+
+    def generate_scaled_dataset(self, options):
+        """Generate a large, reproducible synthetic dataset with bulk inserts"""
+        users_count = options['scale']
+        problems_count = options.get('problems') or max(10, users_count // 20)
+        contests_count = options.get('contests') or max(2, users_count // 500)
+        submissions_count = options.get('submissions')
+        if submissions_count is None:
+            submissions_count = users_count * 20
+        self.batch_size = options.get('batch_size') or 5000
+        self.rng = random.Random(options.get('seed', 0))
+        self.now = timezone.now()
+        self.history = timedelta(days=options.get('history_days') or 365)
+        self.prefix = f"synthetic{options.get('seed', 0)}_"
+
+        if User.objects.filter(username__startswith=self.prefix).exists():
+            raise CommandError(
+                f'A synthetic dataset for seed {options.get("seed", 0)} already exists; use a different --seed'
+            )
+
+        started = time.perf_counter()
+        self.stdout.write(
+            f'Generating {users_count} users, {problems_count} problems, {contests_count} contests '
+            f'and {submissions_count} submissions (seed {options.get("seed", 0)})...'
+        )
+
+        if User.objects.filter(username='admin').exists():
+            admin_user = User.objects.get(username='admin')
+        else:
+            admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'admin123')
+        categories = {category.name: category for category in self.create_problem_categories()}
+
+        users, skills = self.generate_users(users_count)
+        contests = self.generate_contests(contests_count, admin_user)
+        problems = self.generate_problems(problems_count, categories, contests, admin_user)
+        participants = self.generate_participants(contests, users)
+        stats = self.generate_submissions(submissions_count, users, skills, problems, contests, participants)
+        self.generate_standings(contests, participants, stats)
+        self.generate_profiles(users, skills, participants, stats)
+        self.generate_progress(stats)
+
+        Problem.objects.bulk_update(
+            [self.with_statistics(problem, stats) for problem in problems],
+            ['total_submissions', 'successful_submissions', 'acceptance_rate'],
+            batch_size=self.batch_size
+        )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Generated synthetic dataset in {elapsed:.1f}s'))
+
+    def bulk_create(self, model, objects):
+        """Insert objects in batches and report progress"""
+        model.objects.bulk_create(objects, batch_size=self.batch_size)
+        self.stdout.write(f'Created {len(objects)} {model._meta.verbose_name_plural}')
+
+    def generate_users(self, count):
+        """Create users with a latent skill drawn from a normal distribution"""
+        # Hashing once and sharing the hash keeps user creation cheap
+        password = make_password('password123')
+        self.bulk_create(User, [
+            User(username=f'{self.prefix}{i:07d}', email=f'{self.prefix}{i:07d}@example.com', password=password)
+            for i in range(count)
+        ])
+        user_ids = list(
+            User.objects.filter(username__startswith=self.prefix).order_by('username').values_list('id', flat=True)
+        )
+        skills = {user_id: min(10.0, max(0.0, self.rng.gauss(4.5, 2.0))) for user_id in user_ids}
+        return user_ids, skills
+
+    def generate_contests(self, count, admin_user):
+        """Create contests spread over the past year, plus one upcoming"""
+        now = self.now
+        contests = []
+        for i in range(count):
+            start = now - timedelta(days=self.rng.uniform(-7, 365))
+            duration = self.rng.choice([60, 90, 120, 180])
+            end = start + timedelta(minutes=duration)
+            if end < now:
+                status = 'completed'
+            elif start <= now:
+                status = 'active'
+            else:
+                status = 'upcoming'
+            contests.append(Contest(
+                title=f'{self.prefix}Contest {i + 1}',
+                description='Synthetic contest',
+                start_time=start,
+                end_time=end,
+                duration=duration,
+                max_participants=100000,
+                status=status,
+                contest_type=self.rng.choice(['timed', 'timed', 'tournament', 'practice']),
+                created_by=admin_user
+            ))
+        self.bulk_create(Contest, contests)
+        return list(Contest.objects.filter(title__startswith=self.prefix).order_by('id'))
+
+    def generate_problems(self, count, categories, contests, admin_user):
+        """Create problems with a difficulty skewed towards medium and their test cases"""
+        problems = []
+        for i in range(count):
+            difficulty = max(1, min(10, round(self.rng.triangular(1, 10, 4))))
+            if difficulty <= 3:
+                category = categories['Easy']
+            elif difficulty <= 6:
+                category = categories['Medium']
+            else:
+                category = categories['Hard']
+            problems.append(Problem(
+                title=f'{self.prefix}Problem {i + 1}',
+                description='Return the sum of the array',
+                initial_code='function solve(nums) {\n    // Your code here\n}',
+                time_limit=self.rng.choice([1, 2, 5]),
+                category=category,
+                contest=self.rng.choice(contests) if contests and self.rng.random() < 0.3 else None,
+                difficulty_score=difficulty,
+                points=category.points,
+                created_by=admin_user
+            ))
+        self.bulk_create(Problem, problems)
+        problems = list(Problem.objects.filter(title__startswith=self.prefix).order_by('id'))
+
+        test_cases = []
+        for problem in problems:
+            for order in range(1, self.rng.randint(3, 8) + 1):
+                nums = [self.rng.randint(-100, 100) for _ in range(self.rng.randint(1, 50))]
+                test_cases.append(TestCase(
+                    problem=problem,
+                    name=f'Test {order}',
+                    input_data=[nums],
+                    expected_output=sum(nums),
+                    is_hidden=order > 2,
+                    is_sample=order <= 2,
+                    order=order,
+                    points=order
+                ))
+        self.bulk_create(TestCase, test_cases)
+        return problems
+
+    def generate_participants(self, contests, user_ids):
+        """Register a long-tailed share of users for each contest"""
+        participants = {}
+        rows = []
+        for contest in contests:
+            share = min(1.0, self.rng.paretovariate(1.5) * 0.05)
+            members = self.rng.sample(user_ids, max(1, int(len(user_ids) * share)))
+            participants[contest.id] = set(members)
+            rows.extend(ContestParticipant(contest=contest, user_id=user_id) for user_id in members)
+        self.bulk_create(ContestParticipant, rows)
+        Contest.objects.bulk_update(
+            [self.with_participant_count(contest, participants) for contest in contests],
+            ['current_participants'],
+            batch_size=self.batch_size
+        )
+        return participants
+
+    def with_participant_count(self, contest, participants):
+        """Set a contest's participant count from the generated registrations"""
+        contest.current_participants = len(participants[contest.id])
+        return contest
+
+    def generate_submissions(self, count, user_ids, skills, problems, contests, participants):
+        """Stream submissions in batches while accumulating the aggregates other tables need"""
+        started_contests = {contest.id: contest for contest in contests if contest.start_time <= self.now}
+        # Heavy-tailed activity: a few users submit far more than the rest
+        activity = [self.rng.paretovariate(1.2) for _ in user_ids]
+        # Easier and earlier problems attract more attempts
+        popularity = [1.0 / (rank + 1) ** 0.8 / problem.difficulty_score for rank, problem in enumerate(problems)]
+        failure_statuses = [status for status, _ in FAILURE_STATUSES]
+        failure_weights = [weight for _, weight in FAILURE_STATUSES]
+
+        stats = {
+            'problem_total': {},
+            'problem_accepted': {},
+            'user_total': {},
+            'user_solved': {},
+            'contest_scores': {},
+            'progress': {},
+        }
+        created = 0
+        while created < count:
+            size = min(self.batch_size, count - created)
+            chosen_users = self.rng.choices(user_ids, weights=activity, k=size)
+            chosen_problems = self.rng.choices(problems, weights=popularity, k=size)
+            batch = []
+            times = []
+            for user_id, problem in zip(chosen_users, chosen_problems):
+                accept_probability = 1 / (1 + math.exp(problem.difficulty_score - skills[user_id] - 1))
+                if self.rng.random() < accept_probability:
+                    status = 'accepted'
+                    score = problem.points
+                else:
+                    status = self.rng.choices(failure_statuses, weights=failure_weights)[0]
+                    score = 0 if status == 'compilation_error' else int(problem.points * self.rng.random() * 0.8)
+                language = 'javascript' if self.rng.random() < 0.55 else 'python'
+                contest_id = None
+                if problem.contest_id in started_contests and user_id in participants[problem.contest_id]:
+                    contest_id = problem.contest_id
+                submitted_at = self.submission_time(started_contests.get(contest_id))
+                times.append(submitted_at)
+
+                batch.append(Submission(
+                    user_id=user_id,
+                    problem=problem,
+                    contest_id=contest_id,
+                    code=self.rng.choice(SYNTHETIC_CODE[language]),
+                    language=language,
+                    status=status,
+                    execution_time=round(self.rng.lognormvariate(-3, 1), 4),
+                    memory_used=self.rng.randint(20, 120) * 1024,
+                    score=score,
+                    points_earned=score
+                ))
+
+                # attempts, best score, first accepted at, last submitted at
+                progress = stats['progress'].setdefault((user_id, problem.id), [0, 0, None, submitted_at])
+                progress[0] += 1
+                progress[1] = max(progress[1], score)
+                if status == 'accepted' and (progress[2] is None or submitted_at < progress[2]):
+                    progress[2] = submitted_at
+                progress[3] = max(progress[3], submitted_at)
+                stats['problem_total'][problem.id] = stats['problem_total'].get(problem.id, 0) + 1
+                stats['user_total'][user_id] = stats['user_total'].get(user_id, 0) + 1
+                if status == 'accepted':
+                    stats['problem_accepted'][problem.id] = stats['problem_accepted'].get(problem.id, 0) + 1
+                    stats['user_solved'].setdefault(user_id, set()).add(problem.id)
+                if contest_id:
+                    best = stats['contest_scores'].setdefault(contest_id, {}).setdefault(user_id, {})
+                    best[problem.id] = max(best.get(problem.id, 0), score)
+
+            # bulk_create skips Submission.save(), which normally stores the code blob
+            CodeBlob.store_many({submission.code for submission in batch})
+            Submission.objects.bulk_create(batch, batch_size=self.batch_size)
+            self.backdate_submissions(times)
+            created += size
+            self.stdout.write(f'Created {created}/{count} submissions')
+        return stats
+
+    def submission_time(self, contest):
+        """A time within the contest for contest submissions, within the history window otherwise"""
+        if contest is not None:
+            start, end = contest.start_time, min(contest.end_time, self.now)
+        else:
+            start, end = self.now - self.history, self.now
+        return start + (end - start) * self.rng.random()
+
+    def backdate_submissions(self, times):
+        """Give the batch just inserted its generated times.
+
+        submitted_at is auto_now_add, so bulk_create stamps every row with the
+        current time; it is rewritten afterwards. The batch is the newest rows,
+        in insertion order, since nothing else writes while the generator runs.
+        """
+        ids = sorted(Submission.objects.order_by('-id').values_list('id', flat=True)[:len(times)])
+        Submission.objects.bulk_update(
+            [Submission(id=pk, submitted_at=submitted_at) for pk, submitted_at in zip(ids, times)],
+            ['submitted_at'],
+            batch_size=self.batch_size
+        )
+
+    def generate_standings(self, contests, participants, stats):
+        """Rank participants by their best score per problem and build leaderboards"""
+        leaderboards = []
+        for contest in contests:
+            scores = stats['contest_scores'].get(contest.id, {})
+            standings = []
+            for user_id in participants[contest.id]:
+                best = scores.get(user_id, {})
+                solved = sum(1 for score in best.values() if score > 0)
+                standings.append((sum(best.values()), solved, user_id))
+            standings.sort(key=lambda row: (-row[0], -row[1], row[2]))
+            for rank, (total, solved, user_id) in enumerate(standings, start=1):
+                leaderboards.append(Leaderboard(
+                    contest=contest,
+                    user_id=user_id,
+                    total_score=total,
+                    problems_solved=solved,
+                    total_time=solved * self.rng.randint(300, 1800),
+                    rank=rank
+                ))
+        self.bulk_create(Leaderboard, leaderboards)
+
+        participant_rows = ContestParticipant.objects.filter(contest__in=contests)
+        ranks = {(row.contest_id, row.user_id): row for row in leaderboards}
+        updated = []
+        for participant in participant_rows.iterator():
+            entry = ranks.get((participant.contest_id, participant.user_id))
+            if entry is not None:
+                participant.score = entry.total_score
+                participant.rank = entry.rank
+                updated.append(participant)
+        ContestParticipant.objects.bulk_update(updated, ['score', 'rank'], batch_size=self.batch_size)
+
+    def generate_profiles(self, user_ids, skills, participants, stats):
+        """Create profiles whose rating follows the users' latent skill"""
+        contests_per_user = {}
+        for members in participants.values():
+            for user_id in members:
+                contests_per_user[user_id] = contests_per_user.get(user_id, 0) + 1
+
+        profiles = []
+        for user_id in user_ids:
+            rating = int(800 + skills[user_id] * 150 + self.rng.gauss(0, 100))
+            profiles.append(UserProfile(
+                user_id=user_id,
+                bio='Synthetic user',
+                rating=rating,
+                rank=UserProfile.rank_for_rating(rating),
+                total_submissions=stats['user_total'].get(user_id, 0),
+                problems_solved=len(stats['user_solved'].get(user_id, ())),
+                contests_participated=contests_per_user.get(user_id, 0)
+            ))
+        self.bulk_create(UserProfile, profiles)
+
+    def generate_progress(self, stats):
+        """Create the per-user problem progress rows the judge would have maintained"""
+        self.bulk_create(UserProblemProgress, [
+            UserProblemProgress(
+                user_id=user_id,
+                problem_id=problem_id,
+                attempts=attempts,
+                best_score=best_score,
+                first_accepted_at=first_accepted_at,
+                last_submitted_at=last_submitted_at
+            )
+            for (user_id, problem_id), (attempts, best_score, first_accepted_at, last_submitted_at)
+            in stats['progress'].items()
+        ])
+
+    def with_statistics(self, problem, stats):
+        """Set a problem's submission statistics from the generated submissions"""
+        problem.total_submissions = stats['problem_total'].get(problem.id, 0)
+        problem.successful_submissions = stats['problem_accepted'].get(problem.id, 0)
+        if problem.total_submissions:
+            problem.acceptance_rate = problem.successful_submissions / problem.total_submissions * 100
+        return problem
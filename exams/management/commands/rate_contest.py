@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from exams import ratings
+from exams.models import Contest
+
+
+class Command(BaseCommand):
+    help = 'Update user ratings and ranks from the final leaderboard of finished contests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('contest_ids', nargs='*', type=int, help='Contests to rate')
+        parser.add_argument('--all-finished', action='store_true',
+                            help='Rate every finished contest that has not been rated yet')
+        parser.add_argument('--k', type=float, default=ratings.DEFAULT_K, help='Elo K-factor')
+        parser.add_argument('--block-size', type=int, default=1024,
+                            help='Rows of the pairwise matrix computed at once')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Compute and report the changes without saving them')
+
+    def handle(self, *args, **options):
+        if options['all_finished']:
+            contests = Contest.objects.filter(is_rated=False, end_time__lte=timezone.now()).exclude(status='cancelled')
+        elif options['contest_ids']:
+            contests = Contest.objects.filter(pk__in=options['contest_ids'])
+            missing = set(options['contest_ids']) - set(contests.values_list('pk', flat=True))
+            if missing:
+                raise CommandError(f'Unknown contests: {", ".join(map(str, sorted(missing)))}')
+        else:
+            raise CommandError('Give contest ids or --all-finished')
+
+        for contest in contests.order_by('end_time'):
+            if contest.end_time > timezone.now():
+                self.stdout.write(self.style.WARNING(f'Skipping {contest}: not finished yet'))
+                continue
+            started = time.perf_counter()
+            changes = ratings.rate_contest(
+                contest, k=options['k'], block_size=options['block_size'], dry_run=options['dry_run']
+            )
+            elapsed = time.perf_counter() - started
+            if changes is None:
+                self.stdout.write(self.style.WARNING(f'Skipping {contest}: already rated'))
+                continue
+            self.report(contest, changes, elapsed, options['dry_run'])
+
+    def report(self, contest, changes, elapsed, dry_run):
+        prefix = '[dry run] ' if dry_run else ''
+        if not changes:
+            self.stdout.write(f'{prefix}{contest}: no standings to rate')
+            return
+        deltas = [new - old for _, old, new in changes]
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}Rated {contest}: {len(changes)} participants in {elapsed:.2f}s, '
+            f'mean |change| {sum(abs(d) for d in deltas) / len(deltas):.1f}, '
+            f'max gain {max(deltas):+d}, max loss {min(deltas):+d}'
+        ))
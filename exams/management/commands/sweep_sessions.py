@@ -0,0 +1,112 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from exams import judge, metrics
+from exams.models import ExamSession
+
+
+logger = logging.getLogger('exams.sweeper')
+
+
+class Command(BaseCommand):
+    help = ('Close exam sessions whose deadline has passed, in batches, auto-submitting '
+            'their last saved code through the judge queue')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Sessions to expire per query')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep sweeping every --interval seconds until interrupted')
+        parser.add_argument('--interval', type=float, default=10.0,
+                            help='Seconds between passes with --loop')
+        parser.add_argument('--no-auto-submit', dest='auto_submit', action='store_false',
+                            help='Only mark sessions completed, do not judge their saved code')
+
+    def handle(self, *args, **options):
+        if not options['loop']:
+            self.sweep(options)
+            return
+        try:
+            while True:
+                started = time.monotonic()
+                self.sweep(options)
+                time.sleep(max(0.0, options['interval'] - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            self.stdout.write('Stopped')
+
+    def sweep(self, options):
+        """One pass over every session that is overdue as of now"""
+        now = timezone.now()
+        started = time.monotonic()
+        lag = self.lag(now)
+        metrics.sweeper_lag_seconds.set(lag)
+
+        counts = {'expired': 0, 'auto_submitted': 0, 'failed': 0}
+        while True:
+            batch = self.next_batch(now, options['batch_size'])
+            if not batch:
+                break
+            for outcome, count in self.expire(batch, now, options['auto_submit']).items():
+                counts[outcome] += count
+
+        for outcome, count in counts.items():
+            if count:
+                metrics.sessions_expired_total.inc(count, outcome=outcome)
+        # Lag left after the pass: sessions that expired while it ran
+        metrics.sweeper_lag_seconds.set(self.lag(timezone.now()))
+
+        duration = time.monotonic() - started
+        logger.info('Swept %d sessions in %.2fs, lag %.1fs', sum(counts.values()), duration, lag, extra={
+            'lag_seconds': round(lag, 3),
+            'duration_seconds': round(duration, 3),
+            **counts,
+        })
+        self.stdout.write(
+            f'Expired {counts["expired"]}, auto-submitted {counts["auto_submitted"]}, '
+            f'failed {counts["failed"]} (lag {lag:.1f}s, took {duration:.2f}s)'
+        )
+        return counts
+
+    def lag(self, now):
+        """Seconds since the deadline of the oldest session still open"""
+        oldest = (
+            ExamSession.objects
+            .filter(is_completed=False, expires_at__lte=now)
+            .order_by('expires_at')
+            .values_list('expires_at', flat=True)
+            .first()
+        )
+        return (now - oldest).total_seconds() if oldest else 0.0
+
+    def next_batch(self, now, batch_size):
+        """Oldest overdue sessions, served by the (is_completed, expires_at) index"""
+        return list(
+            ExamSession.objects
+            .filter(is_completed=False, expires_at__lte=now)
+            .order_by('expires_at')
+            .only('id', 'start_time', 'expires_at', 'time_spent', 'is_completed', 'is_submitted')[:batch_size]
+        )
+
+    def expire(self, sessions, now, auto_submit):
+        """Close a batch, then judge the saved code of those never submitted"""
+        for session in sessions:
+            session.finish(now)
+        ExamSession.objects.bulk_update(sessions, ['is_completed', 'end_time', 'time_spent'])
+
+        counts = {'expired': 0, 'auto_submitted': 0, 'failed': 0}
+        pending = [session.pk for session in sessions if not session.is_submitted]
+        saved = ExamSession.last_saved_code(pending) if auto_submit and pending else {}
+        counts['expired'] = len(sessions) - len(saved)
+
+        futures = judge.enqueue_many(saved)
+        for session_id, future in futures.items():
+            try:
+                future.result()
+                counts['auto_submitted'] += 1
+            except Exception:
+                # Already logged by the judge worker
+                counts['failed'] += 1
+        return counts
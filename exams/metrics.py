@@ -0,0 +1,234 @@
+"""
+In-process metrics registry with Prometheus text exposition.
+
+Metrics are defined at module level below and updated from the judge and
+API code paths; ``/metrics`` renders them for scraping. When
+``settings.METRICS_ENABLED`` is false every update returns after a single
+global check. Values are per process, so scrape each worker (or run a
+single worker) when serving with multiple processes.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+_enabled = getattr(settings, 'METRICS_ENABLED', False)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def enabled():
+    return _enabled
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """Base class for labelled metrics"""
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}']
+
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if not _enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Value that can go up and down"""
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        if not _enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        if not _enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        """Count the enclosed block as in progress while it runs"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        if not _enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the enclosed block in seconds"""
+        if not _enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _render_sample(self, key, value):
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+        lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+# Judge
+submissions_total = registry.register(Counter(
+    'exams_submissions_total', 'Judged submissions by language and verdict', ['language', 'verdict']))
+executions_total = registry.register(Counter(
+    'exams_executions_total', 'execute_code calls by language', ['language']))
+execution_seconds = registry.register(Histogram(
+    'exams_execution_seconds', 'Wall time of execute_code calls', ['language']))
+executor_in_flight = registry.register(Gauge(
+    'exams_executor_in_flight', 'Code executions currently running (executor queue depth)', ['language']))
+compile_seconds = registry.register(Histogram(
+    'exams_compile_seconds', 'Time in the compile step of a language backend, once per submission', ['language']))
+test_runs_total = registry.register(Counter(
+    'exams_test_runs_total', 'Test runs by language and outcome', ['language', 'outcome']))
+test_run_seconds = registry.register(Histogram(
+    'exams_test_run_seconds', 'Wall time per test run, including launching the child', ['language']))
+spawn_seconds = registry.register(Histogram(
+    'exams_subprocess_spawn_seconds', 'Time to spawn a judge child process', ['language'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)))
+timeouts_total = registry.register(Counter(
+    'exams_timeouts_total', 'Test runs killed for exceeding the time limit', ['language']))
+output_limit_total = registry.register(Counter(
+    'exams_output_limit_total', 'Test runs killed for exceeding the output limit', ['language', 'stream']))
+
+# Session sweeper
+sessions_expired_total = registry.register(Counter(
+    'exams_sessions_expired_total', 'Sessions closed by the sweeper', ['outcome']))
+sweeper_lag_seconds = registry.register(Gauge(
+    'exams_session_sweeper_lag_seconds', 'How far past its deadline the oldest open session is'))
+
+# Statistics, caches and reads
+problem_statistics_seconds = registry.register(Histogram(
+    'exams_problem_statistics_seconds', 'Time spent in Problem.update_statistics'))
+cache_requests_total = registry.register(Counter(
+    'exams_cache_requests_total', 'Cache lookups by cache and result', ['cache', 'result']))
+leaderboard_reads_total = registry.register(Counter(
+    'exams_leaderboard_reads_total', 'Contest leaderboard reads'))
+leaderboard_rows = registry.register(Histogram(
+    'exams_leaderboard_rows', 'Rows returned per leaderboard read',
+    buckets=(10, 50, 100, 500, 1000, 5000, 10000, 50000)))
+
+# HTTP
+http_requests_total = registry.register(Counter(
+    'exams_http_requests_total', 'HTTP requests by view, method and status', ['view', 'method', 'status']))
+http_request_seconds = registry.register(Histogram(
+    'exams_http_request_seconds', 'HTTP request latency by view', ['view']))
+db_queries_total = registry.register(Counter(
+    'exams_db_queries_total', 'Database queries issued by view', ['view']))
+
+
+def record_cache(cache, hit):
+    """Count a cache lookup as a hit or a miss"""
+    cache_requests_total.inc(cache=cache, result='hit' if hit else 'miss')
@@ -0,0 +1,210 @@
+import cProfile
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import metrics, perf, profiling
+
+
+logger = logging.getLogger('exams.perf')
+
+
+class PerformanceMiddleware:
+    """Record latency, DB queries and phase timings for sampled requests.
+
+    Results are returned in a ``Server-Timing`` header and logged as one
+    structured record per request on the ``exams.perf`` logger. Requests slower than
+    ``SLOW_REQUEST_MS`` or issuing more than ``MAX_QUERIES`` queries are
+    logged at WARNING with ``"slow": true`` so N+1 regressions stand out.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        config = getattr(settings, 'PERF_INSTRUMENTATION', {})
+        self.enabled = config.get('ENABLED', False)
+        self.sample_rate = config.get('SAMPLE_RATE', 1.0)
+        self.slow_request_ms = config.get('SLOW_REQUEST_MS', 500)
+        self.max_queries = config.get('MAX_QUERIES', 50)
+
+    def __call__(self, request):
+        if not self.enabled or (self.sample_rate < 1.0 and random.random() >= self.sample_rate):
+            return self.get_response(request)
+
+        timings = perf.RequestTimings()
+        token = perf.activate(timings)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings.query_wrapper))
+                response = self.get_response(request)
+        finally:
+            perf.deactivate(token)
+        total_ms = (time.perf_counter() - started) * 1000
+
+        response['Server-Timing'] = self.server_timing(total_ms, timings)
+        self.log(request, response, total_ms, timings)
+        return response
+
+    def server_timing(self, total_ms, timings):
+        """Format the timings as a Server-Timing header value"""
+        metrics = [
+            f'total;dur={total_ms:.1f}',
+            f'db;dur={timings.db_time * 1000:.1f};desc="{timings.db_queries} queries"',
+        ]
+        for name, seconds in sorted(timings.phases.items()):
+            metrics.append(f'{name};dur={seconds * 1000:.1f}')
+        return ', '.join(metrics)
+
+    def log(self, request, response, total_ms, timings):
+        """Emit one structured log line for the request"""
+        slow = total_ms > self.slow_request_ms or timings.db_queries > self.max_queries
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': getattr(getattr(request, 'resolver_match', None), 'view_name', None),
+            'status': response.status_code,
+            'total_ms': round(total_ms, 2),
+            'db_queries': timings.db_queries,
+            'db_ms': round(timings.db_time * 1000, 2),
+            'slow': slow,
+        }
+        for name, seconds in timings.phases.items():
+            record[f'{name}_ms'] = round(seconds * 1000, 2)
+        logger.log(logging.WARNING if slow else logging.INFO, '%s %s %.1fms %d queries',
+                   request.method, request.path, total_ms, timings.db_queries, extra=record)
+
+
+class MetricsMiddleware:
+    """Count requests, latency and DB queries per view for /metrics"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not metrics.enabled():
+            return self.get_response(request)
+
+        queries = [0]
+
+        def count_query(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count_query))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        resolver_match = getattr(request, 'resolver_match', None)
+        view = resolver_match.view_name if resolver_match else 'unmatched'
+        metrics.http_requests_total.inc(view=view, method=request.method, status=response.status_code)
+        metrics.http_request_seconds.observe(elapsed, view=view)
+        if queries[0]:
+            metrics.db_queries_total.inc(queries[0], view=view)
+        return response
+
+
+class ProfilingMiddleware:
+    """Run cProfile on opted-in requests and keep the slow ones.
+
+    A request is profiled when a staff user sends the ``X-Profile`` header or
+    it falls in the random ``SAMPLE_RATE`` fraction. Sampled profiles are
+    only kept when the request took longer than ``THRESHOLD_MS``; requested
+    ones are always kept and their name returned in ``X-Profile-Id``. Must be
+    installed after ``AuthenticationMiddleware``.
+
+    The staff check accepts the same credentials as the API: the session
+    user, or else the user of the request's API token.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        config = getattr(settings, 'PROFILING', {})
+        self.enabled = config.get('ENABLED', False)
+        self.sample_rate = config.get('SAMPLE_RATE', 0.0)
+        self.threshold_ms = config.get('THRESHOLD_MS', 1000)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        user = request.user
+        if 'HTTP_X_PROFILE' in request.META and not user.is_authenticated:
+            user = self.api_user(request) or user
+        requested = 'HTTP_X_PROFILE' in request.META and user.is_staff
+        if not requested and not (self.sample_rate and random.random() < self.sample_rate):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active on this thread
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        if requested or duration_ms > self.threshold_ms:
+            name = profiling.save_profile(profiler, {
+                'method': request.method,
+                'path': request.get_full_path(),
+                'view': getattr(getattr(request, 'resolver_match', None), 'view_name', None),
+                'status': response.status_code,
+                'duration_ms': round(duration_ms, 2),
+                'user': user.get_username() if user.is_authenticated else None,
+                'requested': requested,
+                'created_at': time.time(),
+            })
+            if requested:
+                response['X-Profile-Id'] = name
+        return response
+
+    def api_user(self, request):
+        """The user DRF's authenticators find for ``request``, or None.
+
+        Only session auth has run at this point; token auth runs in the view.
+        """
+        drf_request = Request(request)
+        for authenticator_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+            try:
+                result = authenticator_class().authenticate(drf_request)
+            except APIException:
+                return None
+            if result is not None:
+                return result[0]
+        return None
+
+
+class SessionRefreshMiddleware:
+    """Refresh the session cookie on page views but not on API calls.
+
+    Replaces ``SESSION_SAVE_EVERY_REQUEST``: pages still extend the session's
+    expiry on every visit, while API requests (polled during an exam) only
+    write the session row when they actually change it. Must be installed
+    after ``SessionMiddleware``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.exempt_prefixes = tuple(getattr(settings, 'SESSION_REFRESH_EXEMPT_PREFIXES', ('/api/',)))
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        session = getattr(request, 'session', None)
+        if session is not None and not request.path.startswith(self.exempt_prefixes):
+            session.modified = True
+        return response
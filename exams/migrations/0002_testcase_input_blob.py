@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def move_large_inputs(apps, schema_editor):
+    """Move existing oversized inputs into the blob store"""
+    from exams.blobstore import encode_json, store_blob
+
+    TestCase = apps.get_model('exams', 'TestCase')
+    for test_case in TestCase.objects.filter(input_blob='').iterator():
+        if test_case.input_data is None:
+            continue
+        encoded = encode_json(test_case.input_data)
+        if len(encoded) > settings.TEST_DATA_INLINE_LIMIT:
+            test_case.input_blob = store_blob(encoded)
+            test_case.input_data = None
+            test_case.save(update_fields=['input_blob', 'input_data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testcase',
+            name='input_blob',
+            field=models.CharField(blank=True, default='', help_text='SHA-256 of the stored input when it is too large to keep inline', max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='testcase',
+            name='input_data',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='testresult',
+            name='input_data',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.RunPython(move_large_inputs, migrations.RunPython.noop),
+    ]
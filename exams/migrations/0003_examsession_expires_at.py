@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:17
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def set_deadlines(apps, schema_editor):
+    """Give existing sessions the deadline ExamSession.save() would compute"""
+    ExamSession = apps.get_model('exams', 'ExamSession')
+    batch = []
+    for session in ExamSession.objects.filter(expires_at__isnull=True).select_related('contest').iterator():
+        deadline = session.start_time + timedelta(seconds=session.time_remaining)
+        if session.contest_id and session.contest.end_time < deadline:
+            deadline = session.contest.end_time
+        session.expires_at = deadline
+        batch.append(session)
+        if len(batch) >= 1000:
+            ExamSession.objects.bulk_update(batch, ['expires_at'])
+            batch = []
+    ExamSession.objects.bulk_update(batch, ['expires_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0002_testcase_input_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='examsession',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='examsession',
+            name='time_remaining',
+            field=models.IntegerField(help_text='Seconds allotted when the session started'),
+        ),
+        migrations.AlterField(
+            model_name='examsession',
+            name='time_spent',
+            field=models.IntegerField(default=0, help_text='Seconds used, set when the session ends'),
+        ),
+        migrations.AddIndex(
+            model_name='examsession',
+            index=models.Index(fields=['is_completed', 'expires_at'], name='exams_exams_is_comp_01e148_idx'),
+        ),
+        migrations.RunPython(set_deadlines, migrations.RunPython.noop),
+    ]
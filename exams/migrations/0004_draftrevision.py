@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0003_examsession_expires_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DraftRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('revision', models.PositiveIntegerField()),
+                ('base_revision', models.PositiveIntegerField(blank=True, null=True)),
+                ('kind', models.CharField(choices=[('snapshot', 'Snapshot'), ('delta', 'Delta')], max_length=10)),
+                ('code', models.TextField(blank=True)),
+                ('ops', models.JSONField(blank=True, null=True)),
+                ('language', models.CharField(default='javascript', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='drafts', to='exams.examsession')),
+            ],
+            options={
+                'ordering': ['session', 'revision'],
+                'unique_together': {('session', 'revision')},
+            },
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:21
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Q
+import django.db.models.deletion
+
+
+def backfill_progress(apps, schema_editor):
+    """Build progress rows and profile counters from existing submissions"""
+    Submission = apps.get_model('exams', 'Submission')
+    UserProblemProgress = apps.get_model('exams', 'UserProblemProgress')
+    UserProfile = apps.get_model('exams', 'UserProfile')
+    ContestParticipant = apps.get_model('exams', 'ContestParticipant')
+
+    rows = (
+        Submission.objects
+        .filter(user__isnull=False)
+        .values('user_id', 'problem_id')
+        .annotate(
+            attempts=Count('id'),
+            best_score=Max('score'),
+            first_accepted_at=Min('submitted_at', filter=Q(status='accepted')),
+            last_submitted_at=Max('submitted_at'),
+        )
+    )
+    totals = {}
+    batch = []
+    for row in rows.iterator():
+        batch.append(UserProblemProgress(**row))
+        total = totals.setdefault(row['user_id'], [0, 0])
+        total[0] += row['attempts']
+        total[1] += row['first_accepted_at'] is not None
+        if len(batch) >= 1000:
+            UserProblemProgress.objects.bulk_create(batch)
+            batch = []
+    UserProblemProgress.objects.bulk_create(batch)
+
+    contests = dict(
+        ContestParticipant.objects.values('user_id').annotate(n=Count('id')).values_list('user_id', 'n')
+    )
+    profiles = list(UserProfile.objects.all())
+    for profile in profiles:
+        profile.total_submissions, profile.problems_solved = totals.get(profile.user_id, (0, 0))
+        profile.contests_participated = contests.get(profile.user_id, 0)
+    UserProfile.objects.bulk_update(
+        profiles, ['total_submissions', 'problems_solved', 'contests_participated'], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('exams', '0004_draftrevision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserProblemProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.IntegerField(default=0)),
+                ('best_score', models.IntegerField(default=0)),
+                ('first_accepted_at', models.DateTimeField(blank=True, null=True)),
+                ('last_submitted_at', models.DateTimeField(blank=True, null=True)),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_progress', to='exams.problem')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='problem_progress', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'user problem progress',
+                'indexes': [models.Index(fields=['user', 'first_accepted_at'], name='exams_userp_user_id_d20b8a_idx')],
+                'unique_together': {('user', 'problem')},
+            },
+        ),
+        migrations.RunPython(backfill_progress, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0005_userproblemprogress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contest',
+            name='is_rated',
+            field=models.BooleanField(default=False, help_text='Ratings have been updated from the final standings'),
+        ),
+    ]
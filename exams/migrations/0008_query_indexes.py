@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0007_revokedtoken'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contest',
+            index=models.Index(fields=['status', 'start_time'], name='exams_conte_status_029703_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='discussion',
+            index=models.Index(fields=['problem', '-created_at'], name='exams_discu_problem_f08ce6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='problem',
+            index=models.Index(fields=['is_active', 'difficulty_score', 'created_at'], name='exams_probl_is_acti_8840d0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='problem',
+            index=models.Index(fields=['is_active', 'category', 'difficulty_score'], name='exams_probl_is_acti_9d4ae1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['user', '-submitted_at'], name='exams_submi_user_id_ed48c7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['contest', '-submitted_at'], name='exams_submi_contest_7b0fd1_idx'),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:28
+
+from django.db import migrations, models
+
+from exams.results import pack_bits
+
+
+def compact_existing(apps, schema_editor):
+    """Move stored result lists into the compact fields.
+
+    A list is only converted when it lines up with the problem's current test
+    cases by name; anything else is left as it is and still served verbatim.
+    """
+    Submission = apps.get_model('exams', 'Submission')
+    TestCase = apps.get_model('exams', 'TestCase')
+    TestResult = apps.get_model('exams', 'TestResult')
+
+    test_cases = {}
+    for test_case in TestCase.objects.order_by('order').only('id', 'problem_id', 'name'):
+        test_cases.setdefault(test_case.problem_id, []).append(test_case)
+
+    fields = ['passed_bitmap', 'test_case_ids', 'test_times', 'test_memory', 'test_results']
+    batch = []
+    for submission in Submission.objects.exclude(test_results={}).only('id', 'problem_id', 'test_results').iterator():
+        results = submission.test_results
+        cases = test_cases.get(submission.problem_id, [])
+        if not isinstance(results, list) or [r.get('name') for r in results] != [c.name for c in cases]:
+            continue
+        submission.passed_bitmap = pack_bits([bool(r.get('passed')) for r in results])
+        submission.test_case_ids = [c.id for c in cases]
+        submission.test_times = [r.get('execution_time') for r in results]
+        submission.test_memory = [r.get('memory_used') for r in results]
+        submission.test_results = {}
+        batch.append(submission)
+        if len(batch) >= 500:
+            _flush(Submission, TestResult, batch, fields)
+            batch = []
+    _flush(Submission, TestResult, batch, fields)
+
+
+def _flush(Submission, TestResult, batch, fields):
+    ids = [submission.id for submission in batch]
+    TestResult.objects.filter(submission_id__in=ids, is_passed=True).delete()
+    TestResult.objects.filter(submission_id__in=ids).update(input_data=None, expected_output=None)
+    Submission.objects.bulk_update(batch, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0008_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='passed_bitmap',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='test_case_ids',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='test_memory',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='test_times',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AlterField(
+            model_name='submission',
+            name='test_results',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='testresult',
+            name='expected_output',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.RunPython(compact_existing, migrations.RunPython.noop),
+    ]
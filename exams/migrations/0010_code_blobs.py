@@ -0,0 +1,73 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from exams.codestore import code_digest, compress, decompress
+
+
+def dedup_code(apps, schema_editor):
+    """Store each distinct submission source once and point submissions at it"""
+    Submission = apps.get_model('exams', 'Submission')
+    CodeBlob = apps.get_model('exams', 'CodeBlob')
+
+    stored = set()
+    batch = []
+    blobs = []
+    for submission in Submission.objects.only('id', 'code').iterator(chunk_size=2000):
+        digest = code_digest(submission.code)
+        if digest not in stored:
+            stored.add(digest)
+            blobs.append(CodeBlob(digest=digest, data=compress(submission.code), size=len(submission.code.encode('utf-8'))))
+        submission.code_blob_id = digest
+        batch.append(submission)
+        if len(batch) >= 2000:
+            CodeBlob.objects.bulk_create(blobs)
+            Submission.objects.bulk_update(batch, ['code_blob'])
+            batch, blobs = [], []
+    CodeBlob.objects.bulk_create(blobs)
+    Submission.objects.bulk_update(batch, ['code_blob'])
+
+
+def restore_code(apps, schema_editor):
+    """Copy each blob's source back into the code column of its submissions"""
+    Submission = apps.get_model('exams', 'Submission')
+    CodeBlob = apps.get_model('exams', 'CodeBlob')
+    for blob in CodeBlob.objects.iterator():
+        Submission.objects.filter(code_blob=blob).update(code=decompress(blob.data))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0009_compact_test_results'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CodeBlob',
+            fields=[
+                ('digest', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('data', models.BinaryField(help_text='zlib-compressed UTF-8 source')),
+                ('size', models.IntegerField(help_text='Uncompressed size in bytes')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='code_blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='submissions', to='exams.codeblob'),
+        ),
+        migrations.RunPython(dedup_code, restore_code),
+        # Only so that rolling back can re-add the column to a populated
+        # table; restore_code then fills it in
+        migrations.AlterField(
+            model_name='submission',
+            name='code',
+            field=models.TextField(default=''),
+        ),
+        migrations.RemoveField(
+            model_name='submission',
+            name='code',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0011_output_limit_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='status_version',
+            field=models.IntegerField(default=0),
+        ),
+    ]
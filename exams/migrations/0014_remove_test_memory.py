@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:22
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0013_remove_status_version'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='submission',
+            name='test_memory',
+        ),
+    ]
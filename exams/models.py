@@ -1,9 +1,19 @@
-from django.db import models
+from django.db import connection, models
+from django.conf import settings
+from django.db.models import F
+from django.db.models.functions import Greatest
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
+from django.utils.functional import cached_property
+from datetime import timedelta
 import json
 import uuid
 
+from . import codestore, metrics, results
+from .archive import archive_index
+from .blobstore import encode_json, store_blob, load_json_blob
+
 
 class UserProfile(models.Model):
     """Extended user profile for contest participants"""
@@ -20,16 +30,20 @@ class UserProfile(models.Model):
     def __str__(self):
         return f"{self.user.username}'s Profile"
     
+    @staticmethod
+    def rank_for_rating(rating):
+        """Map a rating onto its rank title"""
+        if rating < 1000:
+            return 'Beginner'
+        elif rating < 1500:
+            return 'Intermediate'
+        elif rating < 2000:
+            return 'Advanced'
+        return 'Expert'
+    
     def update_rating(self, new_rating):
         self.rating = new_rating
-        if self.rating < 1000:
-            self.rank = 'Beginner'
-        elif self.rating < 1500:
-            self.rank = 'Intermediate'
-        elif self.rating < 2000:
-            self.rank = 'Advanced'
-        else:
-            self.rank = 'Expert'
+        self.rank = self.rank_for_rating(self.rating)
         self.save()
 
 
@@ -60,6 +74,7 @@ class Contest(models.Model):
     contest_type = models.CharField(max_length=20, choices=CONTEST_TYPE, default='timed')
     is_public = models.BooleanField(default=True)
     registration_required = models.BooleanField(default=False)
+    is_rated = models.BooleanField(default=False, help_text='Ratings have been updated from the final standings')
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='contests_created')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -69,6 +84,9 @@ class Contest(models.Model):
     
     class Meta:
         ordering = ['-start_time']
+        indexes = [
+            models.Index(fields=['status', 'start_time']),
+        ]
 
 
 class ContestParticipant(models.Model):
@@ -138,23 +156,38 @@ class Problem(models.Model):
     def __str__(self):
         return self.title
     
+    def session_seconds(self):
+        """Seconds an exam session on this problem lasts; ``time_limit`` is in minutes"""
+        return self.time_limit * 60
+    
     def update_statistics(self):
-        """Update problem statistics"""
-        self.total_submissions = self.submissions.count()
-        self.successful_submissions = self.submissions.filter(status='accepted').count()
-        if self.total_submissions > 0:
-            self.acceptance_rate = (self.successful_submissions / self.total_submissions) * 100
-        self.save()
+        """Update problem statistics, including archived submissions"""
+        with metrics.problem_statistics_seconds.time():
+            archived_total, archived_accepted = archive_index.problem_totals(self.id)
+            self.total_submissions = self.submissions.count() + archived_total
+            self.successful_submissions = self.submissions.filter(status='accepted').count() + archived_accepted
+            if self.total_submissions > 0:
+                self.acceptance_rate = (self.successful_submissions / self.total_submissions) * 100
+            self.save()
     
     class Meta:
         ordering = ['difficulty_score', 'created_at']
+        indexes = [
+            # Serve the default ordering and difficulty ranges, with or without a category
+            models.Index(fields=['is_active', 'difficulty_score', 'created_at']),
+            models.Index(fields=['is_active', 'category', 'difficulty_score']),
+        ]
 
 
 class TestCase(models.Model):
     """Enhanced model for test cases"""
     problem = models.ForeignKey(Problem, on_delete=models.CASCADE, related_name='test_cases')
     name = models.CharField(max_length=200)
-    input_data = models.JSONField()
+    input_data = models.JSONField(null=True, blank=True)
+    input_blob = models.CharField(
+        max_length=64, blank=True, default='',
+        help_text='SHA-256 of the stored input when it is too large to keep inline'
+    )
     expected_output = models.JSONField()
     is_hidden = models.BooleanField(default=False)
     is_sample = models.BooleanField(default=False)
@@ -164,6 +197,23 @@ class TestCase(models.Model):
     def __str__(self):
         return f"{self.problem.title} - {self.name}"
     
+    def save(self, *args, **kwargs):
+        """Move large inputs out of the row into the blob store"""
+        if self.input_data is not None:
+            encoded = encode_json(self.input_data)
+            if len(encoded) > settings.TEST_DATA_INLINE_LIMIT:
+                self.input_blob = store_blob(encoded)
+                self.input_data = None
+            else:
+                self.input_blob = ''
+        super().save(*args, **kwargs)
+    
+    def get_input(self):
+        """Return the test input, loading it from the blob store if needed"""
+        if self.input_blob:
+            return load_json_blob(self.input_blob)
+        return self.input_data
+    
     class Meta:
         ordering = ['order']
 
@@ -177,8 +227,11 @@ class ExamSession(models.Model):
     
     start_time = models.DateTimeField(auto_now_add=True)
     end_time = models.DateTimeField(null=True, blank=True)
-    time_remaining = models.IntegerField()
-    time_spent = models.IntegerField(default=0)
+    # Remaining and spent time are derived from start_time and expires_at on
+    # read; these columns are only written when the session starts and ends
+    time_remaining = models.IntegerField(help_text='Seconds allotted when the session started')
+    time_spent = models.IntegerField(default=0, help_text='Seconds used, set when the session ends')
+    expires_at = models.DateTimeField(null=True, blank=True)
     
     is_completed = models.BooleanField(default=False)
     is_submitted = models.BooleanField(default=False)
@@ -187,8 +240,158 @@ class ExamSession(models.Model):
     def __str__(self):
         return f"Session {self.session_id} - {self.problem.title}"
     
+    def save(self, *args, **kwargs):
+        if self.expires_at is None:
+            self.expires_at = self.compute_deadline()
+        super().save(*args, **kwargs)
+    
+    def compute_deadline(self):
+        """start_time plus the allotted time, capped at the contest's end"""
+        start = self.start_time or timezone.now()
+        deadline = start + timedelta(seconds=self.time_remaining)
+        if self.contest_id and self.contest.end_time < deadline:
+            deadline = self.contest.end_time
+        return deadline
+    
+    def seconds_remaining(self, now=None):
+        """Seconds left before the deadline; 0 once completed or expired"""
+        if self.is_completed or self.expires_at is None:
+            return 0 if self.is_completed else self.time_remaining
+        now = now or timezone.now()
+        return max(0, int((self.expires_at - now).total_seconds()))
+    
+    def seconds_spent(self, now=None):
+        """Seconds between the start and now, the end or the deadline"""
+        if self.is_completed:
+            return self.time_spent
+        end = min(now or timezone.now(), self.expires_at or timezone.now())
+        return max(0, int((end - self.start_time).total_seconds()))
+    
+    @classmethod
+    def last_saved_code(cls, session_ids):
+        """Map session id -> (code, language) of the latest code saved for it.
+        
+        Autosaved drafts win; sessions without one fall back to their latest
+        submission.
+        """
+        from .drafts import draft_buffer
+        
+        saved = {
+            session_id: (text, language)
+            for session_id, (revision, text, language) in draft_buffer.latest(session_ids).items()
+        }
+        rows = (
+            Submission.objects
+            .filter(exam_session_id__in=[pk for pk in session_ids if pk not in saved])
+            .order_by('exam_session_id', '-submitted_at')
+            .values_list('exam_session_id', 'code_blob_id', 'language')
+        )
+        latest = {}
+        for session_id, digest, language in rows:
+            latest.setdefault(session_id, (digest, language))
+        code = CodeBlob.load_many(digest for digest, _ in latest.values())
+        for session_id, (digest, language) in latest.items():
+            saved.setdefault(session_id, (code.get(digest), language))
+        return saved
+    
+    def finish(self, now=None):
+        """Mark the session completed, recording when and how long it ran"""
+        now = now or timezone.now()
+        if self.expires_at and self.expires_at < now:
+            now = self.expires_at
+        self.time_spent = self.seconds_spent(now)
+        self.end_time = now
+        self.is_completed = True
+    
     class Meta:
         ordering = ['-start_time']
+        indexes = [
+            models.Index(fields=['is_completed', 'expires_at']),
+        ]
+
+
+class DraftRevision(models.Model):
+    """One autosaved revision of a session's code.
+
+    Revisions form a chain per session: a ``snapshot`` holds the full code,
+    a ``delta`` holds edit ops ``[start, end, text]`` to apply in order to the
+    code at ``base_revision`` (the previous row). See ``exams.drafts``.
+    """
+    KIND_CHOICES = [
+        ('snapshot', 'Snapshot'),
+        ('delta', 'Delta'),
+    ]
+    
+    session = models.ForeignKey(ExamSession, on_delete=models.CASCADE, related_name='drafts')
+    revision = models.PositiveIntegerField()
+    base_revision = models.PositiveIntegerField(null=True, blank=True)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    code = models.TextField(blank=True)
+    ops = models.JSONField(null=True, blank=True)
+    language = models.CharField(max_length=20, default='javascript')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Draft r{self.revision} ({self.kind}) - session {self.session_id}"
+    
+    class Meta:
+        ordering = ['session', 'revision']
+        unique_together = ['session', 'revision']
+
+
+class CodeBlob(models.Model):
+    """Submission source code, stored once per distinct content (see exams/codestore.py)"""
+    digest = models.CharField(max_length=64, primary_key=True)
+    data = models.BinaryField(help_text='zlib-compressed UTF-8 source')
+    size = models.IntegerField(help_text='Uncompressed size in bytes')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return self.digest[:12]
+    
+    @property
+    def text(self):
+        code = codestore.code_cache.get(self.digest)
+        if code is None:
+            code = codestore.decompress(self.data)
+            codestore.code_cache.put(self.digest, code)
+        return code
+    
+    @classmethod
+    def store_many(cls, codes):
+        """Make sure a blob exists for each source; returns their digests in order"""
+        codes = list(codes)
+        digests = [codestore.code_digest(code) for code in codes]
+        pending = dict(zip(digests, codes))
+        existing = set(cls.objects.filter(digest__in=list(pending)).values_list('digest', flat=True))
+        cls.objects.bulk_create(
+            [
+                cls(digest=digest, data=codestore.compress(code), size=len(code.encode('utf-8')))
+                for digest, code in pending.items() if digest not in existing
+            ],
+            batch_size=500,
+            # Another writer may have stored the same code since the lookup
+            ignore_conflicts=connection.features.supports_ignore_conflicts,
+        )
+        for digest, code in pending.items():
+            codestore.code_cache.put(digest, code)
+        return digests
+    
+    @classmethod
+    def load_many(cls, digests):
+        """Map digest -> source, reading only cache misses from the database"""
+        found = {}
+        missing = []
+        for digest in set(digests):
+            code = codestore.code_cache.get(digest)
+            if code is None:
+                missing.append(digest)
+            else:
+                found[digest] = code
+        if missing:
+            for blob in cls.objects.filter(digest__in=missing):
+                found[blob.digest] = blob.text
+        return found
 
 
 class Submission(models.Model):
@@ -200,6 +403,7 @@ class Submission(models.Model):
         ('wrong_answer', 'Wrong Answer'),
         ('time_limit_exceeded', 'Time Limit Exceeded'),
         ('memory_limit_exceeded', 'Memory Limit Exceeded'),
+        ('output_limit_exceeded', 'Output Limit Exceeded'),
         ('runtime_error', 'Runtime Error'),
         ('compilation_error', 'Compilation Error'),
         ('internal_error', 'Internal Error'),
@@ -210,11 +414,16 @@ class Submission(models.Model):
     contest = models.ForeignKey(Contest, on_delete=models.CASCADE, related_name='submissions', null=True, blank=True)
     exam_session = models.ForeignKey(ExamSession, on_delete=models.CASCADE, related_name='submissions', null=True, blank=True)
     
-    code = models.TextField()
+    code_blob = models.ForeignKey(CodeBlob, on_delete=models.PROTECT, related_name='submissions', null=True, blank=True)
     language = models.CharField(max_length=20, default='javascript')
     status = models.CharField(max_length=25, choices=STATUS_CHOICES, default='pending')
     
-    test_results = models.JSONField(default=dict)
+    # Only submissions graded before compact results keep the full list here
+    test_results = models.JSONField(default=dict, blank=True)
+    # Compact per-test results, see exams/results.py
+    passed_bitmap = models.BinaryField(default=b'', blank=True)
+    test_case_ids = models.JSONField(default=list, blank=True)
+    test_times = models.JSONField(default=list, blank=True)
     execution_time = models.FloatField(null=True, blank=True)
     memory_used = models.IntegerField(null=True, blank=True)
     
@@ -227,8 +436,114 @@ class Submission(models.Model):
     def __str__(self):
         return f"Submission {self.id} - {self.problem.title} by {self.user.username}"
     
+    _code = None
+    _code_changed = False
+    
+    @property
+    def code(self):
+        """Source code, read from the shared CodeBlob on first access"""
+        if self._code is None and self.code_blob_id:
+            if Submission.code_blob.is_cached(self):
+                self._code = self.code_blob.text
+            else:
+                self._code = CodeBlob.load_many([self.code_blob_id]).get(self.code_blob_id)
+        return self._code
+    
+    @code.setter
+    def code(self, value):
+        self._code = value
+        self._code_changed = True
+        self.code_blob_id = codestore.code_digest(value) if value is not None else None
+    
+    @property
+    def code_hash(self):
+        return self.code_blob_id
+    
+    def save(self, *args, store_code=True, **kwargs):
+        """Save, storing the code's blob first if it changed.
+        
+        Bulk paths store all their blobs with one ``CodeBlob.store_many`` and
+        pass ``store_code=False`` (``bulk_create`` never stores them).
+        """
+        if store_code and self._code_changed and self._code is not None:
+            CodeBlob.store_many([self._code])
+        self._code_changed = False
+        super().save(*args, **kwargs)
+    
+    @cached_property
+    def detailed_results(self):
+        """Per-test results in the judge's format, rebuilt from the compact fields"""
+        return results.expand(self)
+    
     class Meta:
         ordering = ['-submitted_at']
+        indexes = [
+            models.Index(fields=['user', '-submitted_at']),
+            models.Index(fields=['contest', '-submitted_at']),
+        ]
+
+
+class UserProblemProgress(models.Model):
+    """Best result of a user on a problem, maintained incrementally by the judge"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='problem_progress')
+    problem = models.ForeignKey(Problem, on_delete=models.CASCADE, related_name='user_progress')
+    attempts = models.IntegerField(default=0)
+    best_score = models.IntegerField(default=0)
+    first_accepted_at = models.DateTimeField(null=True, blank=True)
+    last_submitted_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.problem.title}"
+    
+    @property
+    def is_solved(self):
+        return self.first_accepted_at is not None
+    
+    @classmethod
+    def status_map(cls, user_id, problem_ids):
+        """{problem_id: 'solved' | 'attempted'} for those of ``problem_ids`` the user tried.
+        
+        One indexed query over the (user, problem) unique key, so a page of
+        problems costs one lookup however long the user's history is.
+        """
+        return {
+            problem_id: 'solved' if accepted_at else 'attempted'
+            for problem_id, accepted_at in cls.objects.filter(
+                user_id=user_id, problem_id__in=problem_ids
+            ).values_list('problem_id', 'first_accepted_at')
+        }
+    
+    @classmethod
+    def record(cls, submission):
+        """Fold a judged submission into the user's progress and profile counters.
+        
+        Uses conditional, atomic updates so concurrent submissions by the same
+        user can't double count a solve.
+        """
+        if submission.user_id is None:
+            return
+        progress, _ = cls.objects.get_or_create(user_id=submission.user_id, problem_id=submission.problem_id)
+        cls.objects.filter(pk=progress.pk).update(
+            attempts=F('attempts') + 1,
+            best_score=Greatest(F('best_score'), submission.score),
+            last_submitted_at=submission.submitted_at,
+        )
+        newly_solved = submission.status == 'accepted' and cls.objects.filter(
+            pk=progress.pk, first_accepted_at__isnull=True
+        ).update(first_accepted_at=submission.submitted_at) == 1
+        
+        UserProfile.objects.get_or_create(user_id=submission.user_id)
+        UserProfile.objects.filter(user_id=submission.user_id).update(
+            total_submissions=F('total_submissions') + 1,
+            problems_solved=F('problems_solved') + (1 if newly_solved else 0),
+        )
+    
+    class Meta:
+        verbose_name_plural = 'user problem progress'
+        unique_together = ['user', 'problem']
+        indexes = [
+            models.Index(fields=['user', 'first_accepted_at']),
+        ]
 
 
 class TestResult(models.Model):
@@ -236,8 +551,10 @@ class TestResult(models.Model):
     submission = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name='test_results_detail')
     test_case = models.ForeignKey(TestCase, on_delete=models.CASCADE)
     
-    input_data = models.JSONField()
-    expected_output = models.JSONField()
+    # Rows are only kept for failing tests; input and expected output are
+    # read from test_case (these two are only set on older rows)
+    input_data = models.JSONField(null=True, blank=True)
+    expected_output = models.JSONField(null=True, blank=True)
     actual_output = models.JSONField(null=True, blank=True)
     
     is_passed = models.BooleanField(default=False)
@@ -283,6 +600,9 @@ class Discussion(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['problem', '-created_at']),
+        ]
 
 
 class DiscussionReply(models.Model):
@@ -294,4 +614,14 @@ class DiscussionReply(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
-        ordering = ['created_at'] 
\ No newline at end of file
+        ordering = ['created_at'] 
+
+
+class RevokedToken(models.Model):
+    """API token revoked before its expiry (see ``exams.authentication``)"""
+    token_id = models.CharField(max_length=32, unique=True)
+    revoked_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return f"Revoked token {self.token_id}"
@@ -0,0 +1,153 @@
+"""
+C and C++ for the judge: compilation and the compiled-binary cache.
+
+A native submission is a whole program. It reads the test input (the JSON
+array of arguments, as for the other languages) on stdin and prints its
+answer on stdout, which the judge parses as JSON and compares with the
+expected output.
+
+Submissions are compiled once per judging, not once per test. Results of a
+compilation are cached under ``settings.JUDGE_CACHE_DIR / 'native'``, keyed
+by compiler version, flags and code hash: the binary on success, the
+compiler's diagnostics on failure, so resubmitting the same code or judging
+it again skips the compiler. Cache hits and every test launch refresh the
+file's mtime. Once the directory grows past
+``settings.JUDGE_COMPILE_CACHE_BYTES``, the least recently used entries are
+removed, except those used in the last ``EVICT_GRACE`` seconds, which
+another worker may be about to run.
+"""
+import functools
+import hashlib
+import logging
+import os
+import stat as stat_module
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+from . import metrics
+from .codestore import code_digest
+
+
+logger = logging.getLogger(__name__)
+
+COMPILERS = {
+    'c': {'compiler': 'gcc', 'suffix': '.c', 'flags': ['-O2', '-std=c17', '-pipe'], 'libs': ['-lm']},
+    'cpp': {'compiler': 'g++', 'suffix': '.cpp', 'flags': ['-O2', '-std=c++17', '-pipe'], 'libs': []},
+}
+
+COMPILE_TIMEOUT = 30
+# Longer than any single test, so a binary between two launches is kept
+EVICT_GRACE = 60
+# Diagnostics beyond this are cut; the first errors are the useful ones
+MAX_DIAGNOSTICS = 8192
+
+
+class CompilationError(Exception):
+    """The compiler rejected a submission; the message holds its diagnostics"""
+
+
+@functools.lru_cache(maxsize=None)
+def compiler_version(compiler):
+    return subprocess.run(
+        [compiler, '--version'], capture_output=True, text=True, timeout=10, check=True,
+    ).stdout.splitlines()[0]
+
+
+def cache_root():
+    return Path(settings.JUDGE_CACHE_DIR) / 'native'
+
+
+def cache_key(language, code):
+    spec = COMPILERS[language]
+    parts = [compiler_version(spec['compiler']), *spec['flags'], *spec['libs'], code_digest(code)]
+    return f'{language}-' + hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
+
+
+_evict_lock = threading.Lock()
+
+
+def compile_submission(language, code):
+    """Path of the compiled ``code``, from the cache when possible.
+
+    Raises ``CompilationError`` with the compiler's diagnostics if it does
+    not compile or compiling takes longer than ``COMPILE_TIMEOUT``;
+    ``OSError`` or ``subprocess.SubprocessError`` if the compiler itself
+    can't be run.
+    """
+    spec = COMPILERS[language]
+    root = cache_root()
+    key = cache_key(language, code)
+    binary = root / key
+    diagnostics = root / f'{key}.err'
+
+    for path in (binary, diagnostics):
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            continue
+        metrics.record_cache('native_binary', True)
+        if path is diagnostics:
+            raise CompilationError(path.read_text())
+        return binary
+
+    metrics.record_cache('native_binary', False)
+    root.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=root) as workdir:
+        source = Path(workdir) / f'solution{spec["suffix"]}'
+        source.write_text(code)
+        output = Path(workdir) / 'solution'
+        try:
+            process = subprocess.run(
+                [spec['compiler'], *spec['flags'], '-o', str(output), str(source), *spec['libs']],
+                capture_output=True, text=True, timeout=COMPILE_TIMEOUT, cwd=workdir,
+            )
+        except subprocess.TimeoutExpired:
+            # Not cached: a loaded machine may compile it in time on the next try
+            raise CompilationError(f'Compilation timed out after {COMPILE_TIMEOUT} seconds')
+        if process.returncode != 0:
+            # Temporary paths mean nothing to the author
+            message = process.stderr.replace(f'{workdir}/', '')[:MAX_DIAGNOSTICS]
+            tmp = Path(workdir) / 'diagnostics'
+            tmp.write_text(message)
+            os.replace(tmp, diagnostics)
+            raise CompilationError(message)
+        os.replace(output, binary)
+    evict()
+    return binary
+
+
+def evict():
+    """Remove least recently used entries until the cache fits its budget"""
+    limit = getattr(settings, 'JUDGE_COMPILE_CACHE_BYTES', 256 * 1024 * 1024)
+    recent = time.time() - EVICT_GRACE
+    with _evict_lock:
+        entries = []
+        for path in cache_root().iterdir():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:  # evicted or renamed by another worker
+                continue
+            if stat_module.S_ISREG(stat.st_mode):
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        if total <= limit:
+            return
+        entries.sort()
+        removed = 0
+        for mtime, size, path in entries:
+            if total <= limit or mtime > recent:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        logger.info('Evicted %d compiled submissions from the cache', removed, extra={
+            'removed': removed, 'bytes': total,
+        })
@@ -0,0 +1,153 @@
+"""
+JavaScript judge harness, optionally preloaded into a V8 startup snapshot.
+
+``HARNESS`` holds everything a test run needs besides the submission:
+result reporting on the framed result channel, timing and the comparator.
+Without a snapshot it is appended to the submission and Node parses and
+compiles the whole wrapper for every test. With ``settings.JUDGE_NODE_SNAPSHOT``
+the harness is built once into a snapshot blob (``node --build-snapshot``),
+cached under ``settings.JUDGE_CACHE_DIR`` per Node version and harness
+revision. Children then start with
+``node --snapshot-blob <blob> <code.js> <expected.json>``: the snapshot's
+main function loads the submission with ``vm`` and runs the already
+compiled harness.
+
+Node releases without snapshot support fail the build. The executor then
+falls back to the plain wrapper for the rest of the process. In snapshot
+mode submissions run as scripts rather than CommonJS modules: ``require``
+resolves built-in modules only, and ``module`` and ``__dirname`` are not
+defined.
+"""
+import hashlib
+import logging
+import os
+import subprocess
+import tempfile
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Blocking stdout/stderr so a print loop hits the output limit instead of
+# piling up in Node's async write queue
+BLOCKING_STDIO = (
+    'for (const s of [process.stdout, process.stderr]) '
+    's._handle && s._handle.setBlocking && s._handle.setBlocking(true);'
+)
+
+HARNESS = r"""
+function __judgeReport(report) {
+    // One length-prefixed frame on the result channel; stdout is left to the solution
+    const payload = Buffer.from(JSON.stringify(report));
+    const channel = Number(process.env.JUDGE_RESULT_FD);
+    require('fs').writeSync(channel, `${payload.length}\n`);
+    require('fs').writeSync(channel, payload);
+}
+
+function __judgeRun(getSolve, testInput, expectedOutput) {
+    try {
+        const solve = getSolve();
+        const startedAt = performance.now();
+        const result = solve(...testInput);
+        const elapsed = performance.now() - startedAt;
+        __judgeReport({
+            success: true,
+            result: result,
+            expected: expectedOutput,
+            passed: result === expectedOutput,
+            timing: {start: (performance.timeOrigin + startedAt) / 1000, elapsed: elapsed / 1000}
+        });
+    } catch (error) {
+        __judgeReport({
+            success: false,
+            error: error.message
+        });
+    }
+}
+"""
+
+SNAPSHOT_ENTRY = r"""
+const fs = require('fs');
+const v8 = require('v8');
+const vm = require('vm');
+""" + HARNESS + r"""
+v8.startupSnapshot.setDeserializeMainFunction(() => {
+    BLOCKING_STDIO
+    globalThis.require = require;
+    const [codePath, expectedPath] = process.argv.slice(1);
+    const expectedOutput = JSON.parse(fs.readFileSync(expectedPath, 'utf8'));
+    // Top-level declarations of the submission land in the shared global scope
+    vm.runInThisContext(fs.readFileSync(codePath, 'utf8'), {filename: codePath});
+    const testInput = JSON.parse(fs.readFileSync(0, 'utf8'));
+    __judgeRun(() => vm.runInThisContext('solve'), testInput, expectedOutput);
+});
+""".replace('BLOCKING_STDIO', BLOCKING_STDIO)
+
+
+def plain_source(code, expected_json):
+    """The self-contained wrapper run with plain ``node``"""
+    # The preamble shares line 1 so the submission keeps its line numbers
+    return f"""{BLOCKING_STDIO}
+{code}
+
+// Test execution
+const testInput = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+const expectedOutput = {expected_json};
+{HARNESS}
+__judgeRun(() => solve, testInput, expectedOutput);
+"""
+
+
+_lock = threading.Lock()
+_blob = None
+_unsupported = False
+
+
+def node_version():
+    return subprocess.run(['node', '--version'], capture_output=True, text=True, timeout=10).stdout.strip()
+
+
+def snapshot_blob():
+    """Path of the harness snapshot, built on first use; None to launch plainly"""
+    global _blob, _unsupported
+    if not getattr(settings, 'JUDGE_NODE_SNAPSHOT', False) or _unsupported:
+        return None
+    with _lock:
+        if _blob is not None and _blob.exists():
+            return _blob
+        try:
+            version = node_version()
+            digest = hashlib.sha256(f'{version}\n{SNAPSHOT_ENTRY}'.encode('utf-8')).hexdigest()[:16]
+            cache_dir = Path(settings.JUDGE_CACHE_DIR)
+            path = cache_dir / f'node-harness-{version}-{digest}.blob'
+            if not path.exists():
+                build_snapshot(path)
+        except (OSError, subprocess.SubprocessError) as e:
+            _unsupported = True
+            logger.warning('Node snapshot unavailable, using plain launches: %s', e, extra={'error': str(e)})
+            return None
+        _blob = path
+        return _blob
+
+
+def build_snapshot(path):
+    """Build the harness snapshot into ``path`` atomically"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, entry_path = tempfile.mkstemp(suffix='.js', dir=path.parent)
+    blob_path = f'{entry_path}.blob'
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(SNAPSHOT_ENTRY)
+        subprocess.run(
+            ['node', '--snapshot-blob', blob_path, '--build-snapshot', entry_path],
+            capture_output=True, text=True, timeout=60, check=True,
+        )
+        os.replace(blob_path, path)
+        logger.info('Built Node harness snapshot %s', path.name, extra={'path': str(path)})
+    finally:
+        for leftover in (entry_path, blob_path):
+            if os.path.exists(leftover):
+                os.unlink(leftover)
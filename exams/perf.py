@@ -0,0 +1,70 @@
+"""
+Per-request performance accounting.
+
+``PerformanceMiddleware`` activates a ``RequestTimings`` for each sampled
+request; code anywhere below it can attribute time to a named phase with
+``timed('phase')``. Outside of a sampled request ``timed`` is a no-op, so
+instrumented code paths cost next to nothing when sampling is off.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+
+
+_current = contextvars.ContextVar('exams_request_timings', default=None)
+
+
+class RequestTimings:
+    """Accumulates query counts and per-phase durations for one request"""
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.phases = {}
+        self._active = set()
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def query_wrapper(self, execute, sql, params, many, context):
+        """``connection.execute_wrapper`` hook that counts and times queries"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_queries += 1
+            self.db_time += time.perf_counter() - started
+
+
+def activate(timings):
+    """Make ``timings`` the current request's accumulator; returns a reset token"""
+    return _current.set(timings)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def current():
+    """Return the active ``RequestTimings`` or None"""
+    return _current.get()
+
+
+@contextmanager
+def timed(name):
+    """Attribute the enclosed block's wall time to the phase ``name``.
+
+    Re-entrant blocks with the same name (e.g. nested serializers) are only
+    counted once, at the outermost level.
+    """
+    timings = _current.get()
+    if timings is None or name in timings._active:
+        yield
+        return
+    timings._active.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings._active.discard(name)
+        timings.add(name, time.perf_counter() - started)
@@ -0,0 +1,89 @@
+"""
+Storage for request profiles captured by ``ProfilingMiddleware``.
+
+Each profile is a cProfile dump (``<name>.prof``) with a JSON sidecar
+(``<name>.json``) describing the request. The directory is capped at
+``PROFILING['MAX_PROFILES']`` entries; the oldest are removed first.
+"""
+import io
+import json
+import pstats
+import re
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+
+
+_NAME_RE = re.compile(r'^[0-9]+-[0-9a-f]{8}$')
+
+SORT_KEYS = ('cumulative', 'tottime', 'ncalls')
+
+
+def _config():
+    return getattr(settings, 'PROFILING', {})
+
+
+def profile_dir():
+    return Path(_config().get('DIR', settings.BASE_DIR / 'logs' / 'profiles'))
+
+
+def save_profile(profiler, meta):
+    """Write a finished profiler and its metadata, then rotate; returns the name"""
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f'{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}'
+    profiler.dump_stats(directory / f'{name}.prof')
+    with open(directory / f'{name}.json', 'w') as f:
+        json.dump(dict(meta, name=name), f)
+    rotate(directory)
+    return name
+
+
+def rotate(directory=None):
+    """Delete the oldest profiles beyond the configured maximum"""
+    directory = directory or profile_dir()
+    keep = _config().get('MAX_PROFILES', 200)
+    sidecars = sorted(directory.glob('*.json'))
+    for sidecar in sidecars[:max(0, len(sidecars) - keep)]:
+        sidecar.with_suffix('.prof').unlink(missing_ok=True)
+        sidecar.unlink(missing_ok=True)
+
+
+def list_profiles(limit=50):
+    """Metadata of the collected profiles, slowest first"""
+    directory = profile_dir()
+    if not directory.exists():
+        return []
+    profiles = []
+    for sidecar in directory.glob('*.json'):
+        try:
+            with open(sidecar) as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            # Rotated away or still being written
+            continue
+    profiles.sort(key=lambda meta: meta.get('duration_ms', 0), reverse=True)
+    return profiles[:limit]
+
+
+def profile_path(name):
+    """Path of a stored ``.prof`` file; None for unknown or malformed names"""
+    if not _NAME_RE.match(name or ''):
+        return None
+    path = profile_dir() / f'{name}.prof'
+    return path if path.exists() else None
+
+
+def render_stats(name, sort='cumulative', limit=60):
+    """pstats report for a stored profile as text"""
+    path = profile_path(name)
+    if path is None:
+        return None
+    if sort not in SORT_KEYS:
+        sort = 'cumulative'
+    out = io.StringIO()
+    stats = pstats.Stats(str(path), stream=out)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
@@ -0,0 +1,122 @@
+"""
+Elo ratings for finished contests.
+
+Each participant plays a virtual game against every other participant: a
+better final rank is a win, an equal rank a draw. The rating change is
+``K * (actual - expected)`` with both scores averaged over the N - 1
+opponents. The actual score follows from the ranks in O(N log N); the
+expected score needs every pair, which is computed with NumPy in row blocks
+of ``block_size`` so a 10k-participant contest never builds more than a
+``block_size x N`` matrix at once.
+"""
+import logging
+import time
+
+import numpy as np
+from django.db import transaction
+
+from .models import Contest, Leaderboard, UserProfile
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_K = 32
+DEFAULT_RATING = 1200
+
+
+def actual_scores(ranks):
+    """Average score against all opponents given final ranks (lower is better)"""
+    ranks = np.asarray(ranks, dtype=np.float64)
+    n = len(ranks)
+    ordered = np.sort(ranks)
+    left = np.searchsorted(ordered, ranks, side='left')
+    right = np.searchsorted(ordered, ranks, side='right')
+    worse = n - right
+    ties = right - left - 1
+    return (worse + 0.5 * ties) / (n - 1)
+
+
+def expected_scores(ratings, block_size=1024):
+    """Average Elo win probability against all opponents"""
+    # 10 ** (d / 400) == exp(d * ln(10) / 400); exp is much cheaper than power
+    scaled = np.asarray(ratings, dtype=np.float64) * (np.log(10.0) / 400.0)
+    n = len(scaled)
+    expected = np.empty(n)
+    for start in range(0, n, block_size):
+        block = scaled[start:start + block_size, None]
+        # P(i beats j) = 1 / (1 + 10 ** ((R_j - R_i) / 400)) for the block's rows i
+        probabilities = scaled[None, :] - block
+        np.exp(probabilities, out=probabilities)
+        probabilities += 1.0
+        np.reciprocal(probabilities, out=probabilities)
+        # Each row includes the player against themself, which is exactly 0.5
+        expected[start:start + block_size] = probabilities.sum(axis=1) - 0.5
+    return expected / (n - 1)
+
+
+def compute_deltas(ratings, ranks, k=DEFAULT_K, block_size=1024, zero_sum=True):
+    """Integer rating changes for one contest.
+
+    With ``zero_sum`` the mean change is removed so that a contest does not
+    inflate or deflate the rating pool.
+    """
+    if len(ratings) < 2:
+        return np.zeros(len(ratings), dtype=np.int64)
+    deltas = k * (actual_scores(ranks) - expected_scores(ratings, block_size))
+    if zero_sum:
+        deltas -= deltas.mean()
+    return np.rint(deltas).astype(np.int64)
+
+
+def rate_contest(contest, k=DEFAULT_K, block_size=1024, dry_run=False):
+    """Apply rating changes from a contest's final leaderboard.
+
+    Returns a list of ``(user_id, old_rating, new_rating)``, or None when the
+    contest had already been rated. A contest is rated at most once: it is
+    claimed by flipping ``is_rated`` in the same transaction as the writes.
+    """
+    started = time.perf_counter()
+    with transaction.atomic():
+        if not dry_run and not Contest.objects.filter(pk=contest.pk, is_rated=False).update(is_rated=True):
+            return None
+
+        standings = list(
+            Leaderboard.objects.filter(contest=contest).order_by('rank').values_list('user_id', 'rank')
+        )
+        if not standings:
+            return []
+        user_ids = [user_id for user_id, _ in standings]
+
+        profiles = {profile.user_id: profile for profile in UserProfile.objects.filter(user_id__in=user_ids)}
+        missing = [UserProfile(user_id=user_id, rating=DEFAULT_RATING) for user_id in user_ids if user_id not in profiles]
+        if missing and not dry_run:
+            UserProfile.objects.bulk_create(missing)
+            profiles.update(
+                (profile.user_id, profile)
+                for profile in UserProfile.objects.filter(user_id__in=[p.user_id for p in missing])
+            )
+        elif missing:
+            profiles.update((profile.user_id, profile) for profile in missing)
+
+        ratings = np.array([profiles[user_id].rating for user_id in user_ids])
+        ranks = np.array([rank for _, rank in standings])
+        deltas = compute_deltas(ratings, ranks, k=k, block_size=block_size)
+
+        changes = []
+        updated = []
+        for user_id, old_rating, delta in zip(user_ids, ratings.tolist(), deltas.tolist()):
+            profile = profiles[user_id]
+            profile.rating = old_rating + delta
+            profile.rank = UserProfile.rank_for_rating(profile.rating)
+            updated.append(profile)
+            changes.append((user_id, old_rating, profile.rating))
+        if not dry_run:
+            UserProfile.objects.bulk_update(updated, ['rating', 'rank'], batch_size=1000)
+
+    logger.info('Rated contest %s: %d participants in %.2fs', contest.pk, len(changes),
+                time.perf_counter() - started, extra={
+                    'contest_id': contest.pk,
+                    'participants': len(changes),
+                    'dry_run': dry_run,
+                })
+    return changes
@@ -0,0 +1,81 @@
+"""
+Compact storage of per-test results.
+
+A graded submission keeps one bit per test case (passed or not), the test
+case ids and the per-case run times. Only failing cases get a
+``TestResult`` row, holding what cannot be rebuilt: the actual output and
+the error. The test input and expected output are never copied; ``expand``
+reads them from the ``TestCase`` when a submission is serialized, and returns
+the same list of dicts the judge produced. A passed case's actual output is
+its expected output.
+
+Submissions graded before this scheme still carry the full list in
+``Submission.test_results`` and are returned as they are.
+"""
+
+
+def pack_bits(flags):
+    """Little-endian bitmap: bit ``i`` of byte ``i // 8`` is ``flags[i]``"""
+    data = bytearray((len(flags) + 7) // 8)
+    for i, flag in enumerate(flags):
+        if flag:
+            data[i >> 3] |= 1 << (i & 7)
+    return bytes(data)
+
+
+def unpack_bits(data, count):
+    data = bytes(data or b'').ljust((count + 7) // 8, b'\0')
+    return [bool(data[i >> 3] >> (i & 7) & 1) for i in range(count)]
+
+
+def compact(results, test_cases):
+    """Split judge results into submission fields and failing-case rows.
+
+    Returns ``(fields, failures)``: ``fields`` are set on the Submission and
+    each failure is ``(test_case, result)`` for a ``TestResult`` row.
+    """
+    fields = {
+        'passed_bitmap': pack_bits([result['passed'] for result in results]),
+        'test_case_ids': [test_case.id for test_case in test_cases[:len(results)]],
+        'test_times': [result.get('execution_time') for result in results],
+        'test_results': {},
+    }
+    failures = [(test_case, result) for test_case, result in zip(test_cases, results) if not result['passed']]
+    return fields, failures
+
+
+def expand(submission):
+    """Rebuild the judge's result list for ``submission``.
+
+    Uses ``problem.test_cases`` and ``test_results_detail``, so prefetch both
+    when serializing many submissions.
+    """
+    if submission.test_results:
+        return submission.test_results
+    ids = submission.test_case_ids or []
+    if not ids:
+        return []
+
+    test_cases = {test_case.id: test_case for test_case in submission.problem.test_cases.all()}
+    failures = {row.test_case_id: row for row in submission.test_results_detail.all()}
+    passed = unpack_bits(submission.passed_bitmap, len(ids))
+    times = submission.test_times or []
+
+    results = []
+    for i, test_case_id in enumerate(ids):
+        test_case = test_cases.get(test_case_id)
+        if test_case is None:
+            # Deleted since the submission was graded
+            continue
+        failure = failures.get(test_case_id) if not passed[i] else None
+        result = {
+            'name': test_case.name,
+            'input': test_case.input_data,
+            'expected': test_case.expected_output,
+            'actual': test_case.expected_output if passed[i] else (failure.actual_output if failure else None),
+            'passed': passed[i],
+            'error': (failure.error_message or None) if failure else None,
+            'execution_time': times[i] if i < len(times) else None,
+        }
+        results.append(result)
+    return results
@@ -1,20 +1,29 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.utils import timezone
 from .models import (
     Problem, TestCase, ExamSession, Submission, TestResult,
     UserProfile, Contest, ContestParticipant, ProblemCategory,
     Leaderboard, Discussion, DiscussionReply
 )
+from .perf import timed
 
 
-class UserSerializer(serializers.ModelSerializer):
+class TimedModelSerializer(serializers.ModelSerializer):
+    """ModelSerializer whose representation time is reported per request"""
+    def to_representation(self, instance):
+        with timed('serializer'):
+            return super().to_representation(instance)
+
+
+class UserSerializer(TimedModelSerializer):
     """Serializer for User model"""
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'date_joined']
 
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(TimedModelSerializer):
     """Serializer for UserProfile model"""
     user = UserSerializer(read_only=True)
     username = serializers.CharField(source='user.username', read_only=True)
@@ -28,25 +37,26 @@ class UserProfileSerializer(serializers.ModelSerializer):
         ]
 
 
-class ProblemCategorySerializer(serializers.ModelSerializer):
+class ProblemCategorySerializer(TimedModelSerializer):
     """Serializer for ProblemCategory model"""
     class Meta:
         model = ProblemCategory
         fields = ['id', 'name', 'color', 'points', 'description']
 
 
-class TestCaseSerializer(serializers.ModelSerializer):
+class TestCaseSerializer(TimedModelSerializer):
     """Serializer for TestCase model"""
     class Meta:
         model = TestCase
-        fields = ['id', 'name', 'input_data', 'expected_output', 'is_hidden', 'is_sample', 'order', 'points']
+        fields = ['id', 'name', 'input_data', 'input_blob', 'expected_output', 'is_hidden', 'is_sample', 'order', 'points']
 
 
-class ProblemSerializer(serializers.ModelSerializer):
+class ProblemSerializer(TimedModelSerializer):
     """Enhanced serializer for Problem model"""
-    test_cases = TestCaseSerializer(many=True, read_only=True)
+    test_cases = serializers.SerializerMethodField()
     category = ProblemCategorySerializer(read_only=True)
     created_by = UserSerializer(read_only=True)
+    user_status = serializers.SerializerMethodField()
     
     class Meta:
         model = Problem
@@ -56,11 +66,21 @@ class ProblemSerializer(serializers.ModelSerializer):
             'solution_code', 'time_limit', 'memory_limit', 'category', 'contest',
             'difficulty_score', 'points', 'is_active', 'is_featured', 'created_by',
             'total_submissions', 'successful_submissions', 'acceptance_rate',
-            'created_at', 'updated_at'
+            'test_cases', 'user_status', 'created_at', 'updated_at'
         ]
+    
+    def get_test_cases(self, obj):
+        """Sample tests only; hidden tests, their expected outputs and blob inputs stay on the server"""
+        # Filtered here rather than in a query so the viewsets' prefetch is used
+        samples = [case for case in obj.test_cases.all() if case.is_sample and not case.is_hidden]
+        return TestCaseSerializer(samples, many=True).data
+    
+    def get_user_status(self, obj):
+        """'solved', 'attempted' or None, from the status map the view put in the context"""
+        return self.context.get('user_status', {}).get(obj.id)
 
 
-class ContestSerializer(serializers.ModelSerializer):
+class ContestSerializer(TimedModelSerializer):
     """Serializer for Contest model"""
     created_by = UserSerializer(read_only=True)
     current_participants_count = serializers.SerializerMethodField()
@@ -73,14 +93,18 @@ class ContestSerializer(serializers.ModelSerializer):
             'id', 'title', 'description', 'start_time', 'end_time', 'duration',
             'max_participants', 'current_participants', 'current_participants_count',
             'status', 'status_display', 'contest_type', 'contest_type_display',
-            'is_public', 'registration_required', 'created_by', 'created_at', 'updated_at'
+            'is_public', 'registration_required', 'is_rated', 'created_by', 'created_at', 'updated_at'
         ]
+        read_only_fields = ['is_rated']
     
     def get_current_participants_count(self, obj):
+        # Annotated by ContestViewSet; other callers fall back to a query
+        if hasattr(obj, 'active_participants'):
+            return obj.active_participants
         return obj.participants.filter(is_active=True).count()
 
 
-class ContestParticipantSerializer(serializers.ModelSerializer):
+class ContestParticipantSerializer(TimedModelSerializer):
     """Serializer for ContestParticipant model"""
     user = UserSerializer(read_only=True)
     username = serializers.CharField(source='user.username', read_only=True)
@@ -90,7 +114,7 @@ class ContestParticipantSerializer(serializers.ModelSerializer):
         fields = ['id', 'contest', 'user', 'username', 'joined_at', 'score', 'rank', 'is_active']
 
 
-class ExamSessionSerializer(serializers.ModelSerializer):
+class ExamSessionSerializer(TimedModelSerializer):
     """Enhanced serializer for ExamSession model"""
     problem = ProblemSerializer(read_only=True)
     contest = ContestSerializer(read_only=True)
@@ -101,13 +125,22 @@ class ExamSessionSerializer(serializers.ModelSerializer):
         model = ExamSession
         fields = [
             'id', 'session_id', 'problem', 'contest', 'problem_id', 'contest_id',
-            'start_time', 'end_time', 'time_remaining', 'time_spent',
+            'start_time', 'end_time', 'expires_at', 'time_remaining', 'time_spent',
             'is_completed', 'is_submitted', 'score'
         ]
-        read_only_fields = ['id', 'session_id', 'start_time', 'end_time', 'is_completed', 'is_submitted', 'score']
+        read_only_fields = ['id', 'session_id', 'start_time', 'end_time', 'expires_at',
+                            'time_remaining', 'time_spent', 'is_completed', 'is_submitted', 'score']
+    
+    def to_representation(self, instance):
+        # The clock is computed on read so active sessions never need a write
+        data = super().to_representation(instance)
+        now = timezone.now()
+        data['time_remaining'] = instance.seconds_remaining(now)
+        data['time_spent'] = instance.seconds_spent(now)
+        return data
 
 
-class TestResultSerializer(serializers.ModelSerializer):
+class TestResultSerializer(TimedModelSerializer):
     """Enhanced serializer for TestResult model"""
     test_case_name = serializers.CharField(source='test_case.name', read_only=True)
     
@@ -119,9 +152,9 @@ class TestResultSerializer(serializers.ModelSerializer):
         ]
 
 
-class SubmissionSerializer(serializers.ModelSerializer):
+class SubmissionSerializer(TimedModelSerializer):
     """Enhanced serializer for Submission model"""
-    test_results = TestResultSerializer(many=True, read_only=True)
+    test_results = serializers.JSONField(source='detailed_results', read_only=True)
     exam_session = ExamSessionSerializer(read_only=True)
     problem = ProblemSerializer(read_only=True)
     user = UserSerializer(read_only=True)
@@ -130,17 +163,17 @@ class SubmissionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Submission
         fields = [
-            'id', 'user', 'problem', 'contest', 'exam_session', 'code', 'language',
+            'id', 'user', 'problem', 'contest', 'exam_session', 'code', 'code_hash', 'language',
             'status', 'status_display', 'test_results', 'execution_time', 'memory_used',
             'score', 'points_earned', 'error_message', 'submitted_at'
         ]
         read_only_fields = [
-            'id', 'status', 'test_results', 'execution_time', 'memory_used',
+            'id', 'code_hash', 'status', 'test_results', 'execution_time', 'memory_used',
             'score', 'points_earned', 'error_message', 'submitted_at'
         ]
 
 
-class LeaderboardSerializer(serializers.ModelSerializer):
+class LeaderboardSerializer(TimedModelSerializer):
     """Serializer for Leaderboard model"""
     user = UserSerializer(read_only=True)
     username = serializers.CharField(source='user.username', read_only=True)
@@ -150,7 +183,7 @@ class LeaderboardSerializer(serializers.ModelSerializer):
         fields = ['id', 'contest', 'user', 'username', 'total_score', 'problems_solved', 'total_time', 'rank', 'last_submission']
 
 
-class DiscussionSerializer(serializers.ModelSerializer):
+class DiscussionSerializer(TimedModelSerializer):
     """Serializer for Discussion model"""
     user = UserSerializer(read_only=True)
     username = serializers.CharField(source='user.username', read_only=True)
@@ -161,10 +194,12 @@ class DiscussionSerializer(serializers.ModelSerializer):
         fields = ['id', 'problem', 'user', 'username', 'title', 'content', 'is_resolved', 'replies_count', 'created_at', 'updated_at']
     
     def get_replies_count(self, obj):
+        if hasattr(obj, 'reply_count'):
+            return obj.reply_count
         return obj.replies.count()
 
 
-class DiscussionReplySerializer(serializers.ModelSerializer):
+class DiscussionReplySerializer(TimedModelSerializer):
     """Serializer for DiscussionReply model"""
     user = UserSerializer(read_only=True)
     username = serializers.CharField(source='user.username', read_only=True)
@@ -0,0 +1,1207 @@
+import io
+import json
+import logging
+import logging.handlers
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.test import APITestCase
+
+from . import codestore, judge, languages, metrics, native, node_snapshot, ratings
+from .archive import archive_index
+from .authentication import issue_token
+from .blobstore import blob_path, store_blob
+from .drafts import DraftBuffer, DraftConflict, apply_ops, load_drafts
+from .filters import names_cache_key
+from .log import JsonFormatter, QueueListenerHandler, SamplingFilter, SizedTimedRotatingFileHandler
+from .models import (
+    CodeBlob, Contest, Discussion, DraftRevision, ExamSession, Leaderboard, Problem, ProblemCategory, Submission,
+    TestCase, UserProblemProgress, UserProfile,
+)
+from .results import compact as compact_results
+from .views import CodeExecutionView
+from .zygote import Zygote, python_zygote
+
+
+def temporary_directory(test):
+    """A fresh directory that is removed when ``test`` finishes"""
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    return Path(directory.name)
+
+
+def use_settings(test, **settings):
+    """Override settings for the rest of ``test``"""
+    overridden = override_settings(**settings)
+    overridden.enable()
+    test.addCleanup(overridden.disable)
+
+
+class TestDataBlobTests(APITestCase):
+    """Large test inputs live in the blob store and reach the child on stdin"""
+
+    def setUp(self):
+        self.root = temporary_directory(self)
+        use_settings(self, TEST_DATA_ROOT=self.root, TEST_DATA_INLINE_LIMIT=100)
+        self.problem = Problem.objects.create(title='Sum', description='', initial_code='')
+
+    def test_large_inputs_are_stored_once(self):
+        numbers = list(range(1000))
+        first = TestCase.objects.create(problem=self.problem, name='big', input_data=[numbers], expected_output=0)
+        second = TestCase.objects.create(problem=self.problem, name='again', input_data=[numbers], expected_output=0)
+        small = TestCase.objects.create(problem=self.problem, name='small', input_data=[[1]], expected_output=1)
+        self.assertIsNone(first.input_data)
+        self.assertEqual(first.input_blob, second.input_blob)
+        self.assertEqual(small.input_blob, '')
+        self.assertEqual(TestCase.objects.get(pk=first.pk).get_input(), [numbers])
+        self.assertEqual(len([path for path in self.root.rglob('*') if path.is_file()]), 1)
+
+    def test_judge_streams_blob_inputs(self):
+        TestCase.objects.create(problem=self.problem, name='big', input_data=[list(range(5000))],
+                                expected_output=sum(range(5000)))
+        session = ExamSession.objects.create(session_id='blob', problem=self.problem, time_remaining=300)
+        submission = judge.grade(session, 'def solve(nums):\n    return sum(nums)\n', 'python')
+        self.assertEqual(submission.status, 'accepted')
+
+    def test_digests_are_checked(self):
+        for digest in ('../../etc/passwd', 'A' * 64, 'a' * 63, None):
+            with self.subTest(digest=digest), self.assertRaises(ValueError):
+                blob_path(digest)
+
+    def test_execute_ignores_client_blobs(self):
+        digest = store_blob(b'[[1000000]]')
+        response = self.client.post('/api/execute/', {
+            'code': 'def solve(nums):\n    return sum(nums)\n', 'language': 'python',
+            'test_cases': [{'name': 'mine', 'input': [[1, 2]], 'input_blob': digest, 'expected': 3}],
+        }, format='json')
+        self.assertTrue(response.json()['results'][0]['passed'])
+
+
+class PerformanceMiddlewareTests(APITestCase):
+    """Instrumented requests report their queries and phases"""
+
+    def setUp(self):
+        use_settings(self, PERF_INSTRUMENTATION={'ENABLED': True})
+        Problem.objects.create(title='Sum', description='', initial_code='')
+
+    def test_server_timing_and_log(self):
+        with self.assertLogs('exams.perf', 'INFO') as logs:
+            response = self.client.get('/api/problems/')
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^total;dur=[0-9.]+, db;dur=[0-9.]+;desc="3 queries"')
+        self.assertIn('serializer;dur=', timing)
+        record = logs.records[-1]
+        self.assertEqual((record.levelname, record.db_queries, record.slow), ('INFO', 3, False))
+        self.assertEqual(record.view, 'problem-list')
+
+    def test_query_heavy_requests_are_flagged(self):
+        use_settings(self, PERF_INSTRUMENTATION={'ENABLED': True, 'MAX_QUERIES': 2})
+        with self.assertLogs('exams.perf', 'INFO') as logs:
+            self.client.get('/api/problems/')
+        self.assertEqual((logs.records[-1].levelname, logs.records[-1].slow), ('WARNING', True))
+
+    def test_disabled(self):
+        use_settings(self, PERF_INSTRUMENTATION={'ENABLED': False})
+        self.assertNotIn('Server-Timing', self.client.get('/api/problems/'))
+
+
+class MetricsTests(APITestCase):
+    """The metrics registry and its /metrics rendering"""
+
+    def setUp(self):
+        patcher = mock.patch.object(metrics, '_enabled', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_counter_and_histogram_exposition(self):
+        counter = metrics.Counter('demo_total', 'Demo counter', ['kind'])
+        counter.inc(kind='a "quoted"\nvalue')
+        counter.inc(2, kind='b')
+        histogram = metrics.Histogram('demo_seconds', 'Demo histogram', buckets=(0.1, 1))
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value)
+        self.assertEqual(counter.render(), [
+            '# HELP demo_total Demo counter',
+            '# TYPE demo_total counter',
+            'demo_total{kind="a \\"quoted\\"\\nvalue"} 1',
+            'demo_total{kind="b"} 2',
+        ])
+        self.assertEqual(histogram.render()[2:], [
+            'demo_seconds_bucket{le="0.1"} 1',
+            'demo_seconds_bucket{le="1"} 2',
+            'demo_seconds_bucket{le="+Inf"} 3',
+            'demo_seconds_sum 5.55',
+            'demo_seconds_count 3',
+        ])
+
+    def test_labels_must_match(self):
+        with self.assertRaises(ValueError):
+            metrics.Counter('demo_total', 'Demo counter', ['kind']).inc(other='x')
+
+    def test_disabled_updates_are_ignored(self):
+        counter = metrics.Counter('demo_total', 'Demo counter')
+        with mock.patch.object(metrics, '_enabled', False):
+            counter.inc()
+        self.assertEqual(counter.render()[2:], [])
+
+    def test_endpoint_reports_judged_submissions(self):
+        problem = Problem.objects.create(title='One', description='', initial_code='')
+        TestCase.objects.create(problem=problem, name='one', input_data=[], expected_output=1)
+        session = ExamSession.objects.create(session_id='metrics', problem=problem, time_remaining=300)
+        before = metrics.submissions_total._values.get(('python', 'accepted'), 0)
+        judge.grade(session, 'def solve():\n    return 1\n', 'python')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn(f'exams_submissions_total{{language="python",verdict="accepted"}} {before + 1}\n', text)
+        self.assertIn('exams_test_runs_total{language="python",outcome="passed"}', text)
+
+    def test_endpoint_is_hidden_when_disabled(self):
+        with mock.patch.object(metrics, '_enabled', False):
+            self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+
+class TracingTests(APITestCase):
+    """Sampled judge traces and their export"""
+
+    def execute(self):
+        with self.assertLogs('exams.traces', 'INFO') as logs:
+            response = self.client.post('/api/execute/', {
+                'code': 'def solve(x):\n    return x\n', 'language': 'python',
+                'test_cases': [{'name': 'echo', 'input': [1], 'expected': 1}],
+            }, format='json')
+            # assertLogs fails on an empty capture; keep one record either way
+            logging.getLogger('exams.traces').info('end')
+        return response, [json.loads(record.getMessage()) for record in logs.records[:-1]]
+
+    def test_execute_is_traced(self):
+        use_settings(self, TRACING={'ENABLED': True, 'SAMPLE_RATE': 1.0})
+        response, traces = self.execute()
+        self.assertEqual(len(traces), 1)
+        trace = traces[0]
+        self.assertEqual(response['X-Trace-Id'], trace['trace_id'])
+        spans = {record['name']: record for record in trace['spans']}
+        self.assertIsNone(spans['execute']['parent'])
+        self.assertEqual(spans['execute_code']['parent'], spans['execute']['id'])
+        self.assertEqual(spans['test']['parent'], spans['execute_code']['id'])
+        self.assertEqual(spans['run']['parent'], spans['test']['id'])
+        self.assertEqual(spans['user_code']['parent'], spans['run']['id'])
+        self.assertLessEqual(spans['run']['dur_us'], spans['execute']['dur_us'])
+
+    def test_unsampled_and_disabled(self):
+        for config in ({'ENABLED': True, 'SAMPLE_RATE': 0.0}, {'ENABLED': False, 'SAMPLE_RATE': 1.0}):
+            with self.subTest(config=config):
+                use_settings(self, TRACING=config)
+                response, traces = self.execute()
+                self.assertEqual(traces, [])
+                self.assertNotIn('X-Trace-Id', response)
+
+    def test_export(self):
+        directory = temporary_directory(self)
+        trace = {'trace_id': 'a' * 32, 'name': 'submit', 'started_at': 100.0, 'spans': [
+            {'id': 2, 'parent': 1, 'name': 'compile', 'attrs': {}, 'start_us': 10.0, 'dur_us': 5.0},
+            {'id': 1, 'parent': None, 'name': 'submit', 'attrs': {'language': 'c'}, 'start_us': 0.0, 'dur_us': 50.0},
+        ]}
+        source = directory / 'traces.jsonl'
+        source.write_text(json.dumps(trace) + '\n{"trace_id": "trunc')
+        call_command('export_traces', input=str(source), output=str(directory / 'out.json'), stdout=io.StringIO())
+        events = json.loads((directory / 'out.json').read_text())['traceEvents']
+        self.assertEqual([event['ph'] for event in events], ['M', 'X', 'X'])
+        self.assertEqual(events[1]['ts'], 100.0 * 1e6 + 10.0)
+        self.assertEqual(events[2]['args'], {'language': 'c', 'trace_id': 'a' * 32, 'span_id': 1})
+
+
+class ListQueryCountTests(APITestCase):
+    """The list endpoints run a fixed number of queries whatever the page size"""
+
+    PAGE_SIZES = (5, 25)
+    ROWS = 30
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', password='secret')
+        categories = [
+            ProblemCategory.objects.create(name=name)
+            for name in ('Easy', 'Medium', 'Hard')
+        ]
+        now = timezone.now()
+        for i in range(cls.ROWS):
+            Contest.objects.create(
+                title=f'Contest {i}', description='', created_by=cls.user,
+                start_time=now + timedelta(days=i), end_time=now + timedelta(days=i, hours=2), duration=120,
+            )
+        for i in range(cls.ROWS):
+            problem = Problem.objects.create(
+                title=f'Problem {i}', description='', initial_code='', created_by=cls.user,
+                category=categories[i % 2], difficulty_score=i % 10 + 1, points=10 * (i % 5),
+            )
+            TestCase.objects.create(problem=problem, name='sample', input_data=[1], expected_output=1, is_sample=True)
+            TestCase.objects.create(problem=problem, name='hidden', input_data=[2], expected_output=2, is_hidden=True)
+            submission = Submission(user=cls.user, problem=problem, status='accepted', score=100 * (i % 2))
+            submission.code = f'function solve() {{ return {i}; }}'
+            submission.save()
+            Discussion.objects.create(problem=problem, user=cls.user, title=f'Question {i}', content='')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def assertListQueries(self, url, expected):
+        for page_size in self.PAGE_SIZES:
+            with self.subTest(url=url, page_size=page_size), \
+                    mock.patch.object(PageNumberPagination, 'page_size', page_size):
+                cache.clear()
+                with self.assertNumQueries(expected):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200, response.data)
+                self.assertEqual(len(response.data['results']), min(page_size, response.data['count']))
+
+    def test_unfiltered_lists(self):
+        self.assertListQueries('/api/problems/', 4)
+        self.assertListQueries('/api/contests/', 2)
+        self.assertListQueries('/api/submissions/', 4)
+        self.assertListQueries('/api/discussions/', 2)
+
+    def test_range_filters(self):
+        self.assertListQueries('/api/problems/?difficulty=2..9&points=10..', 4)
+        self.assertListQueries('/api/submissions/?score=0..100', 4)
+
+    def test_related_name_filters(self):
+        # One more than unfiltered: the name map, cleared before each request
+        self.assertListQueries('/api/problems/?category=easy,medium', 5)
+        self.assertListQueries('/api/problems/?category=medium&difficulty=1..10', 5)
+
+    def test_name_map_is_dropped_when_the_table_changes(self):
+        self.client.get('/api/problems/?category=easy')
+        self.assertIsNotNone(cache.get(names_cache_key(ProblemCategory)))
+        category = ProblemCategory.objects.create(name='Expert')
+        self.assertIsNone(cache.get(names_cache_key(ProblemCategory)))
+        Problem.objects.create(title='Hardest', description='', initial_code='', category=category)
+        response = self.client.get('/api/problems/?category=expert')
+        self.assertEqual(response.data['count'], 1)
+        category.delete()
+        self.assertEqual(self.client.get('/api/problems/?category=expert').data['count'], 0)
+
+
+class FilterTests(APITestCase):
+    """Query-string filters match lists and ranges and reject bad values with a 400"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.easy, cls.hard = (ProblemCategory.objects.create(name=name) for name in ('Easy', 'Hard'))
+        for i in range(10):
+            Problem.objects.create(
+                title=f'Problem {i}', description='', initial_code='', category=(cls.easy, cls.hard)[i % 2],
+                difficulty_score=i + 1, points=10 * i, is_featured=i < 3,
+            )
+
+    def titles(self, query):
+        with mock.patch.object(PageNumberPagination, 'page_size', 100):
+            response = self.client.get(f'/api/problems/?{query}')
+        self.assertEqual(response.status_code, 200, response.data)
+        return [problem['title'] for problem in response.data['results']]
+
+    def numbers(self, query):
+        return sorted(int(title.split()[1]) for title in self.titles(query))
+
+    def test_lists_and_ranges(self):
+        self.assertEqual(self.numbers('difficulty=3,5,5'), [2, 4])
+        self.assertEqual(self.numbers('difficulty=3..5'), [2, 3, 4])
+        self.assertEqual(self.numbers('points=70..'), [7, 8, 9])
+        self.assertEqual(self.numbers('points=..10'), [0, 1])
+        self.assertEqual(self.numbers('featured=yes&difficulty=2..'), [1, 2])
+        self.assertEqual(self.numbers('difficulty=  '), list(range(10)))
+
+    def test_category_by_name_or_id(self):
+        self.assertEqual(self.numbers('category=HARD'), [1, 3, 5, 7, 9])
+        self.assertEqual(self.numbers(f'category={self.easy.pk}&difficulty=..4'), [0, 2])
+        self.assertEqual(self.numbers(f'category=hard,{self.easy.pk}'), list(range(10)))
+        self.assertEqual(self.numbers('category=unknown'), [])
+
+    def test_ordering_breaks_ties_on_pk(self):
+        self.assertEqual(self.titles('ordering=-points')[:2], ['Problem 9', 'Problem 8'])
+        Problem.objects.update(points=0)
+        self.assertEqual(self.titles('ordering=points'), [f'Problem {i}' for i in range(10)])
+        self.assertEqual(self.titles('ordering=-points'), [f'Problem {i}' for i in reversed(range(10))])
+
+    def test_bad_values_are_400(self):
+        for query, param in [
+            ('difficulty=hard', 'difficulty'),
+            ('difficulty=11', 'difficulty'),
+            ('difficulty=6..3', 'difficulty'),
+            ('points=..', 'points'),
+            ('featured=maybe', 'featured'),
+            ('ordering=rating', 'ordering'),
+            ('difficulty=' + ','.join(['1'] * 51), 'difficulty'),
+        ]:
+            with self.subTest(query=query):
+                response = self.client.get(f'/api/problems/?{query}')
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(list(response.data), [param])
+
+        response = self.client.get('/api/submissions/?status=passed&score=-1&ordering=score')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'status', 'score'})
+
+
+class ScaledDatasetTests(APITestCase):
+    """populate_problems --scale spreads activity over time"""
+
+    def test_submission_times_follow_the_history_window(self):
+        call_command('populate_problems', scale=40, submissions=400, history_days=30, stdout=io.StringIO())
+        now = timezone.now()
+        times = Submission.objects.values_list('submitted_at', flat=True)
+        self.assertEqual(len(times), 400)
+        self.assertGreaterEqual(min(times), now - timedelta(days=366))  # contest submissions may be older
+        self.assertLess(min(times), now - timedelta(days=7))
+        for progress in UserProblemProgress.objects.all():
+            submissions = Submission.objects.filter(user=progress.user_id, problem=progress.problem_id)
+            accepted = submissions.filter(status='accepted').order_by('submitted_at').first()
+            self.assertEqual(progress.attempts, submissions.count())
+            self.assertEqual(progress.last_submitted_at, submissions.order_by('-submitted_at')[0].submitted_at)
+            self.assertEqual(progress.first_accepted_at, accepted and accepted.submitted_at)
+        for submission in Submission.objects.exclude(contest=None).select_related('contest'):
+            self.assertTrue(submission.contest.start_time <= submission.submitted_at <= submission.contest.end_time)
+
+
+class ProblemTestCaseTests(APITestCase):
+    """Problems only expose their sample test cases"""
+
+    def setUp(self):
+        self.problem = Problem.objects.create(title='Sum', description='', initial_code='')
+        TestCase.objects.create(problem=self.problem, name='sample', input_data=[1, 2], expected_output=3,
+                                is_sample=True, order=0)
+        TestCase.objects.create(problem=self.problem, name='plain', input_data=[2, 3], expected_output=5, order=1)
+        TestCase.objects.create(problem=self.problem, name='hidden', input_data=[40, 2], expected_output=424242,
+                                is_hidden=True, order=2)
+        TestCase.objects.create(problem=self.problem, name='hidden sample', input_data=[7, 7], expected_output=14,
+                                is_sample=True, is_hidden=True, order=3)
+
+    def assertOnlySample(self, problem):
+        self.assertEqual([case['name'] for case in problem['test_cases']], ['sample'])
+        self.assertEqual(problem['test_cases'][0]['expected_output'], 3)
+
+    def test_list_and_detail(self):
+        response = self.client.get('/api/problems/')
+        self.assertOnlySample(response.data['results'][0])
+        self.assertNotIn(b'424242', response.content)
+        self.assertOnlySample(self.client.get(f'/api/problems/{self.problem.pk}/').data)
+
+    def test_start_exam(self):
+        response = self.client.post(f'/api/problems/{self.problem.pk}/start_exam/')
+        self.assertOnlySample(response.data['problem'])
+
+
+class ProblemStatusTests(APITestCase):
+    """The problem list carries the user's status from one lookup over the page"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('dave')
+        self.problems = [
+            Problem.objects.create(title=f'Problem {i}', description='', initial_code='') for i in range(30)
+        ]
+
+    def submit(self, problem, status):
+        UserProblemProgress.record(Submission.objects.create(user=self.user, problem=problem, status=status))
+
+    def statuses(self):
+        with mock.patch.object(PageNumberPagination, 'page_size', 100):
+            response = self.client.get('/api/problems/')
+        return {problem['id']: problem['user_status'] for problem in response.data['results'] if problem['user_status']}
+
+    def test_status_follows_recorded_progress(self):
+        first, second = self.problems[:2]
+        self.client.force_authenticate(self.user)
+        self.submit(first, 'wrong_answer')
+        self.assertEqual(self.statuses(), {first.pk: 'attempted'})
+        self.submit(first, 'accepted')
+        self.submit(second, 'wrong_answer')
+        self.assertEqual(self.statuses(), {first.pk: 'solved', second.pk: 'attempted'})
+
+    def test_one_extra_query_for_a_page(self):
+        for problem in self.problems:
+            self.submit(problem, 'accepted')
+        with CaptureQueriesContext(connection) as anonymous:
+            self.client.get('/api/problems/')
+        self.client.force_authenticate(self.user)
+        with self.assertNumQueries(len(anonymous) + 1):
+            response = self.client.get('/api/problems/')
+        self.assertTrue(all(problem['user_status'] == 'solved' for problem in response.data['results']))
+
+    def test_lookup_is_limited_to_the_page(self):
+        for problem in self.problems:
+            self.submit(problem, 'wrong_answer')
+        page = [problem.pk for problem in self.problems[:3]]
+        self.assertEqual(
+            UserProblemProgress.status_map(self.user.pk, page), dict.fromkeys(page, 'attempted')
+        )
+
+    def test_record_counts_one_solve(self):
+        problem = self.problems[0]
+        for status, score in [('wrong_answer', 3), ('accepted', 10), ('accepted', 10), ('wrong_answer', 5)]:
+            Submission.objects.create(user=self.user, problem=problem, status=status, score=score)
+        first_accepted = Submission.objects.filter(status='accepted').order_by('pk').first()
+        for submission in Submission.objects.order_by('pk'):
+            UserProblemProgress.record(submission)
+
+        progress = UserProblemProgress.objects.get(user=self.user, problem=problem)
+        self.assertEqual((progress.attempts, progress.best_score), (4, 10))
+        self.assertEqual(progress.first_accepted_at, first_accepted.submitted_at)
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual((profile.total_submissions, profile.problems_solved), (4, 1))
+        UserProblemProgress.record(Submission.objects.create(problem=problem, status='accepted'))
+        self.assertEqual(UserProblemProgress.objects.count(), 1)
+
+
+class SignedTokenTests(APITestCase):
+    """Revocation and deactivation apply to the next request"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('bob', password='secret')
+        self.token, _ = issue_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+
+    def test_revoked_token_is_rejected(self):
+        self.assertEqual(self.client.get('/api/submissions/').status_code, 200)
+        self.assertEqual(self.client.post('/api/auth/token/revoke/').status_code, 204)
+        self.assertEqual(self.client.get('/api/submissions/').status_code, 401)
+
+    def test_undecodable_headers(self):
+        # Latin-1 on the wire, so neither part decodes as UTF-8
+        self.client.credentials(HTTP_AUTHORIZATION='\xff\xfe abc')
+        self.assertEqual(self.client.get('/api/submissions/').status_code, 200)  # not a token: anonymous
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token \xff{self.token}')
+        self.assertEqual(self.client.get('/api/submissions/').status_code, 401)
+
+    def test_deactivated_user_is_rejected(self):
+        self.assertEqual(self.client.get('/api/submissions/').status_code, 200)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.client.get('/api/submissions/').status_code, 401)
+
+
+class CodeBlobTests(APITestCase):
+    """Submission code is stored once per distinct source and read back through the cache"""
+
+    def setUp(self):
+        codestore.code_cache.clear()
+        self.addCleanup(codestore.code_cache.clear)
+        self.problem = Problem.objects.create(title='Sum', description='', initial_code='')
+
+    def submit(self, code):
+        submission = Submission(problem=self.problem, language='python')
+        submission.code = code
+        submission.save()
+        return submission
+
+    def test_identical_code_shares_a_blob(self):
+        first = self.submit('def solve():\n    return 1\n')
+        second = self.submit('def solve():\n    return 1\n')
+        other = self.submit('def solve():\n    return 2\n')
+        self.assertEqual(first.code_hash, second.code_hash)
+        self.assertNotEqual(first.code_hash, other.code_hash)
+        self.assertEqual(CodeBlob.objects.count(), 2)
+        self.assertEqual(CodeBlob.objects.get(pk=first.code_hash).size, len(first.code))
+
+    def test_store_many_skips_existing_blobs(self):
+        codes = ['a = 1', 'b = 2', 'a = 1']
+        digests = CodeBlob.store_many(codes)
+        self.assertEqual(digests, [codestore.code_digest(code) for code in codes])
+        with self.assertNumQueries(1):
+            CodeBlob.store_many(['a = 1'])
+        self.assertEqual(CodeBlob.objects.count(), 2)
+
+    def test_reads_go_through_the_cache(self):
+        pk = self.submit('print("cached")').pk
+        codestore.code_cache.clear()
+        with self.assertNumQueries(2):
+            self.assertEqual(Submission.objects.get(pk=pk).code, 'print("cached")')
+        with self.assertNumQueries(1):
+            self.assertEqual(Submission.objects.get(pk=pk).code, 'print("cached")')
+        self.assertEqual(CodeBlob.load_many([codestore.code_digest('print("cached")')]),
+                         {codestore.code_digest('print("cached")'): 'print("cached")'})
+
+    def test_lru_evicts_the_oldest(self):
+        lru = codestore.LRUCache(2)
+        lru.put('a', 1)
+        lru.put('b', 2)
+        lru.get('a')
+        lru.put('c', 3)
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (1, None, 3))
+
+
+class ArchiveTests(APITestCase):
+    """Old submissions move to archive segments and stay readable from the profile"""
+
+    def setUp(self):
+        self.root = temporary_directory(self)
+        use_settings(self, SUBMISSION_ARCHIVE_ROOT=self.root)
+        self.user = User.objects.create_user('heidi')
+        self.profile = UserProfile.objects.create(user=self.user)
+        self.problem = Problem.objects.create(title='Sum', description='', initial_code='')
+        test_case = TestCase.objects.create(problem=self.problem, name='Test 1', input_data=[1], expected_output=1)
+        graded, _ = compact_results([{'passed': True, 'actual': 1, 'execution_time': 0.01}], [test_case])
+        now = timezone.now()
+        self.old = []
+        for i in range(5):
+            submission = Submission(user=self.user, problem=self.problem, language='python',
+                                    status='accepted' if i % 2 else 'wrong_answer', score=100 * (i % 2), **graded)
+            submission.code = f'def solve(x):\n    return {i}\n'
+            submission.save()
+            Submission.objects.filter(pk=submission.pk).update(submitted_at=now - timedelta(days=60 - i))
+            self.old.append(submission.pk)
+        self.pending = Submission.objects.create(user=self.user, problem=self.problem, status='pending')
+        Submission.objects.filter(pk=self.pending.pk).update(submitted_at=now - timedelta(days=90))
+        self.recent = Submission.objects.create(user=self.user, problem=self.problem, status='accepted')
+
+    def archive(self, *args):
+        output = io.StringIO()
+        call_command('archive_submissions', '--older-than', '30', *args, stdout=output)
+        return output.getvalue()
+
+    def history(self, **params):
+        return self.client.get(f'/api/profiles/{self.profile.pk}/submissions/', {'archived': 'true', **params})
+
+    def test_dry_run(self):
+        self.assertIn('5 submissions', self.archive('--dry-run'))
+        self.assertEqual(Submission.objects.count(), 7)
+        self.assertEqual(list(self.root.iterdir()), [])
+
+    def test_round_trip(self):
+        self.archive('--batch-size', '2', '--segment-rows', '4')
+        self.assertEqual(set(Submission.objects.values_list('pk', flat=True)), {self.pending.pk, self.recent.pk})
+        self.assertEqual(CodeBlob.objects.count(), 0)
+        self.assertEqual(len(list(self.root.glob('*.jsonl.gz'))), 2)
+        self.assertEqual(archive_index.problem_totals(self.problem.pk), (5, 2))
+
+        [row] = archive_index.user_submissions(self.user.pk, limit=1)
+        self.assertEqual(row['id'], self.old[-1])
+        self.assertEqual(row['code'], 'def solve(x):\n    return 4\n')
+        self.assertEqual(row['test_results'][0]['expected'], 1)
+        self.assertTrue(row['archived'])
+
+    def test_history_pages(self):
+        self.archive('--batch-size', '2', '--segment-rows', '4')
+        newest_first = self.old[::-1]
+        pages = [self.history(page=page, page_size=2).data for page in (1, 2, 3, 4)]
+        self.assertEqual({page['count'] for page in pages}, {5})
+        self.assertEqual([[row['id'] for row in page['results']] for page in pages],
+                         [newest_first[:2], newest_first[2:4], newest_first[4:], []])
+        self.assertEqual([row['id'] for row in self.history(page_size=10).data['results']], newest_first)
+        self.assertEqual(self.history(page='last').status_code, 400)
+
+
+class OutputLimitTests(APITestCase):
+    """A child that writes past JUDGE_OUTPUT_LIMIT is killed and judged output_limit_exceeded"""
+
+    TESTS = [{'name': 'Test 1', 'input': [3], 'expected': 3}]
+
+    def setUp(self):
+        use_settings(self, JUDGE_OUTPUT_LIMIT=1000)
+
+    def execute(self, code, language='python'):
+        [result] = CodeExecutionView().execute_code(code, language, self.TESTS)
+        return result
+
+    def test_output_within_the_limit(self):
+        result = self.execute('def solve(x):\n    print("x" * 500)\n    return x\n')
+        self.assertTrue(result['passed'], result)
+
+    def test_flooding_a_stream(self):
+        for language, code in [
+            ('python', 'def solve(x):\n    while True:\n        print("x" * 100)\n'),
+            ('python', 'import sys\ndef solve(x):\n    sys.stderr.write("x" * 5000)\n    return x\n'),
+            ('javascript', 'function solve(x) {\n    for (;;) console.log("x".repeat(100));\n}\n'),
+        ]:
+            with self.subTest(language=language, code=code):
+                result = self.execute(code, language)
+                self.assertEqual(result.get('verdict'), 'output_limit_exceeded', result)
+                self.assertFalse(result['passed'])
+                self.assertIn('over 1000 bytes', result['error'])
+
+    def test_submission_status(self):
+        problem = Problem.objects.create(title='Echo', description='', initial_code='')
+        TestCase.objects.create(problem=problem, name='Test 1', input_data=[3], expected_output=3)
+        session = ExamSession.objects.create(session_id='flood', problem=problem, time_remaining=300)
+        submission = judge.grade(session, 'def solve(x):\n    print("x" * 5000)\n    return x\n', 'python')
+        self.assertEqual(submission.status, 'output_limit_exceeded')
+
+
+class NodeSnapshotTests(APITestCase):
+    """JavaScript runs from a cached harness snapshot and falls back to plain launches"""
+
+    TESTS = [{'name': 'Test 1', 'input': [2, 3], 'expected': 5}, {'name': 'Test 2', 'input': [2, 2], 'expected': 5}]
+    CODE = 'const path = require("path");\nfunction solve(a, b) {\n    return a + b;\n}\n'
+
+    def setUp(self):
+        self.directory = temporary_directory(self)
+        use_settings(self, JUDGE_NODE_SNAPSHOT=True, JUDGE_CACHE_DIR=self.directory)
+        # Each test builds (or fails to build) its own snapshot
+        for patcher in (mock.patch.object(node_snapshot, '_blob', None),
+                        mock.patch.object(node_snapshot, '_unsupported', False)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def outcomes(self):
+        return [(result['passed'], result['actual'], result.get('error'))
+                for result in CodeExecutionView().execute_code(self.CODE, 'javascript', self.TESTS)]
+
+    def test_snapshot_matches_plain_launches(self):
+        with self.settings(JUDGE_NODE_SNAPSHOT=False):
+            plain = self.outcomes()
+        self.assertEqual(plain, [(True, 5, None), (False, 4, None)])
+
+        with mock.patch.object(node_snapshot, 'build_snapshot', wraps=node_snapshot.build_snapshot) as build:
+            self.assertEqual(self.outcomes(), plain)
+            self.assertEqual(self.outcomes(), plain)
+        self.assertEqual(build.call_count, 1)
+        [blob] = self.directory.glob('node-harness-*.blob')
+        self.assertEqual(node_snapshot.snapshot_blob(), blob)
+
+    def test_failed_build_falls_back(self):
+        error = subprocess.CalledProcessError(9, ['node'])
+        with mock.patch.object(node_snapshot, 'build_snapshot', side_effect=error) as build:
+            self.assertEqual(self.outcomes(), [(True, 5, None), (False, 4, None)])
+            self.assertIsNone(node_snapshot.snapshot_blob())
+        self.assertEqual(build.call_count, 1)
+
+
+class PythonZygoteTests(APITestCase):
+    """Tests forked from the zygote are judged exactly like plain interpreter launches"""
+
+    TESTS = [{'name': 'Test 1', 'input': [2], 'expected': 1}, {'name': 'Test 2', 'input': [5], 'expected': 2}]
+    PROGRAMS = [
+        # Module state must not carry over from one test to the next
+        'calls = []\ndef solve(x):\n    calls.append(x)\n    return len(calls)\n',
+        'def solve(x):\n    return x // 2\n',
+        'def solve(x):\n    raise ValueError(f"bad {x}")\n',
+        'import sys\ndef solve(x):\n    sys.exit(3)\n',
+        'def solve(x):\n    return [0] * (10 ** 9)\n',
+        'def solve(x)\n    return x\n',
+    ]
+
+    def setUp(self):
+        use_settings(self, JUDGE_TIME_LIMIT=1, JUDGE_MEMORY_LIMIT=256 * 1024 * 1024)
+
+    def outcomes(self, code, zygote):
+        with self.settings(JUDGE_PYTHON_ZYGOTE=zygote):
+            results = CodeExecutionView().execute_code(code, 'python', self.TESTS)
+        return [(result['passed'], result['actual'], bool(result.get('error'))) for result in results]
+
+    def test_same_results_as_plain_launches(self):
+        for code in self.PROGRAMS:
+            with self.subTest(code=code):
+                self.assertEqual(self.outcomes(code, zygote=True), self.outcomes(code, zygote=False))
+        self.assertEqual(self.outcomes(self.PROGRAMS[0], zygote=True), [(True, 1, False), (False, 1, False)])
+        self.assertIsNotNone(python_zygote._process)
+
+    def test_timeout(self):
+        code = 'def solve(x):\n    while True:\n        pass\n'
+        with self.settings(JUDGE_PYTHON_ZYGOTE=True):
+            [result, _] = CodeExecutionView().execute_code(code, 'python', self.TESTS)
+        self.assertEqual(result['error'], 'Execution timeout')
+
+    def test_dead_zygote_is_restarted(self):
+        python_zygote.warm_up()
+        python_zygote._process.kill()
+        python_zygote._process.wait()
+        self.assertEqual(self.outcomes(self.PROGRAMS[1], zygote=True), [(True, 1, False), (True, 2, False)])
+        self.assertIsNone(python_zygote._process.poll())
+
+    def test_unsupported_platform_launches_plainly(self):
+        zygote = Zygote()
+        zygote._unsupported = True
+        with self.settings(JUDGE_PYTHON_ZYGOTE=True):
+            self.assertIsNone(zygote.spawn({}, subprocess.PIPE, 0))
+
+
+class NativeTests(APITestCase):
+    """C and C++ submissions are compiled once, cached, and judged on their stdout"""
+
+    TESTS = [{'name': 'Test 1', 'input': [2, 3], 'expected': 5}, {'name': 'Test 2', 'input': [4, 4], 'expected': 9}]
+    C_SUM = '#include <stdio.h>\nint main(void) {\n    int a, b;\n    scanf("[%d, %d]", &a, &b);\n' \
+            '    printf("%d\\n", a + b);\n    return 0;\n}\n'
+    CPP_SUM = '#include <iostream>\nint main() {\n    char c;\n    int a, b;\n' \
+              '    std::cin >> c >> a >> c >> b;\n    std::cout << a + b << std::endl;\n}\n'
+
+    def setUp(self):
+        self.directory = temporary_directory(self)
+        use_settings(self, JUDGE_CACHE_DIR=self.directory)
+
+    def execute(self, code, language):
+        return CodeExecutionView().execute_code(code, language, self.TESTS)
+
+    def test_programs_are_judged_on_stdout(self):
+        for language, code in [('c', self.C_SUM), ('cpp', self.CPP_SUM)]:
+            with self.subTest(language=language):
+                results = self.execute(code, language)
+                self.assertEqual([(result['passed'], result['actual']) for result in results], [(True, 5), (False, 8)])
+                self.assertIsNotNone(results[0]['execution_time'])
+
+    def test_compilation_error(self):
+        results = self.execute('int main(void) { return missing; }\n', 'c')
+        self.assertEqual({result['verdict'] for result in results}, {'compilation_error'})
+        self.assertIn('solution.c:1:25: error', results[0]['error'])
+        self.assertNotIn(str(self.directory), results[0]['error'])
+
+    def test_compilations_are_cached(self):
+        with mock.patch('exams.native.subprocess.run', wraps=subprocess.run) as run:
+            native.compile_submission('c', self.C_SUM)
+            compiles = run.call_count
+            self.assertEqual(native.compile_submission('c', self.C_SUM), native.compile_submission('c', self.C_SUM))
+            for _ in range(2):
+                with self.assertRaises(native.CompilationError):
+                    native.compile_submission('c', 'int main(void) { return missing; }\n')
+        # One compiler run for each distinct source
+        self.assertEqual(run.call_count, compiles + 1)
+
+    def test_eviction_keeps_recent_entries(self):
+        binary = native.compile_submission('c', self.C_SUM)
+        old = native.cache_root() / 'c-old'
+        old.write_bytes(b'x' * 1000)
+        os.utime(old, (0, 0))
+        with self.settings(JUDGE_COMPILE_CACHE_BYTES=binary.stat().st_size):
+            native.evict()
+        self.assertFalse(old.exists())
+        self.assertTrue(binary.exists())
+
+
+class LanguageRegistryTests(APITestCase):
+    """Languages are registered backends whose limits and pools can be tuned per language"""
+
+    def test_registered_languages(self):
+        self.assertEqual(set(languages.languages()), {'javascript', 'python', 'c', 'cpp'})
+        self.assertIsInstance(languages.get_backend('cpp'), languages.NativeBackend)
+        self.assertIsNone(languages.get_backend('cobol'))
+
+    def test_register_adds_a_backend(self):
+        with mock.patch.dict(languages._backends):
+            @languages.register
+            class EchoBackend(languages.LanguageBackend):
+                name = 'echo'
+
+            self.assertIn('echo', languages.languages())
+            self.assertIsInstance(languages.get_backend('echo'), EchoBackend)
+        self.assertIsNone(languages.get_backend('echo'))
+
+    def test_unsupported_language(self):
+        response = self.client.post('/api/execute/', {'code': 'x', 'language': 'cobol', 'test_cases': []},
+                                    format='json')
+        self.assertEqual((response.status_code, response.json()['error']), (400, 'Unsupported language: cobol'))
+
+        problem = Problem.objects.create(title='Sum', description='', initial_code='')
+        TestCase.objects.create(problem=problem, name='Test 1', input_data=[1], expected_output=1)
+        session = ExamSession.objects.create(session_id='cobol', problem=problem, time_remaining=300)
+        submission = judge.grade(session, 'DISPLAY 1.', 'cobol')
+        self.assertEqual(submission.status, 'compilation_error')
+        self.assertEqual(submission.detailed_results[0]['error'], 'Unsupported language: cobol')
+
+    def test_limits_and_overrides(self):
+        javascript, python = languages.get_backend('javascript'), languages.get_backend('python')
+        with self.settings(JUDGE_TIME_LIMIT=2, JUDGE_MEMORY_LIMIT=1000, JUDGE_LANGUAGES={}):
+            self.assertEqual(javascript.limits(), {'timeout': 2, 'memory_limit': 4000})
+            self.assertEqual(python.limits(), {'timeout': 2, 'memory_limit': 1000})
+        with self.settings(JUDGE_TIME_LIMIT=2, JUDGE_MEMORY_LIMIT=1000,
+                           JUDGE_LANGUAGES={'python': {'time_multiplier': 3, 'workers': 2}}):
+            self.assertEqual(python.limits(), {'timeout': 6, 'memory_limit': 1000})
+            self.assertEqual(python.option('workers'), 2)
+            self.assertIsNone(javascript.option('workers'))
+            launch = python.launch('def solve():\n    return 1\n', {'expected': 1})
+            launch.cleanup()
+            self.assertEqual((launch.timeout, launch.zygote_job['timeout'], launch.zygote_job['memory_limit']),
+                             (6, 6, 1000))
+
+    def test_judge_pool_per_language(self):
+        with mock.patch.object(judge, '_pools', {}), mock.patch.object(languages, 'warm_up'), \
+                self.settings(JUDGE_WORKERS=3, JUDGE_LANGUAGES={'c': {'workers': 1}}):
+            pools = {language: judge._pool_executor(language) for language in ('c', 'cpp', 'cobol', 'fortran')}
+            try:
+                self.assertIs(pools['c'], judge._pool_executor('c'))
+                self.assertIsNot(pools['c'], pools['cpp'])
+                self.assertIs(pools['cobol'], pools['fortran'])
+                self.assertEqual([pools[language]._max_workers for language in ('c', 'cpp', 'cobol')], [1, 3, 3])
+            finally:
+                for pool in judge._pools.values():
+                    pool.shutdown()
+
+
+class CompactResultTests(APITestCase):
+    """Graded results are stored compactly and read back as the judge produced them"""
+
+    def test_round_trip(self):
+        problem = Problem.objects.create(title='Double', description='', initial_code='')
+        for order, (value, expected) in enumerate([(1, 2), (2, 4), (3, 7)]):
+            TestCase.objects.create(problem=problem, name=f'Test {order}', input_data=[value],
+                                    expected_output=expected, order=order)
+        session = ExamSession.objects.create(session_id='compact', problem=problem, time_remaining=300)
+        graded = judge.grade(session, 'def solve(x):\n    return 2 * x\n', 'python')
+        self.assertEqual(graded.status, 'wrong_answer')
+
+        submission = Submission.objects.get(pk=graded.pk)
+        self.assertEqual(submission.test_results, {})
+        self.assertEqual(submission.test_results_detail.count(), 1)
+        results = submission.detailed_results
+        self.assertEqual([result['passed'] for result in results], [True, True, False])
+        self.assertEqual([result['actual'] for result in results], [2, 4, 6])
+        self.assertEqual(results[2]['expected'], 7)
+        self.assertTrue(all(result['execution_time'] is not None for result in results))
+        self.assertEqual(
+            [{key: value for key, value in result.items() if key != 'execution_time'} for result in results],
+            [{key: value for key, value in result.items() if key != 'execution_time'} for result in
+             graded.detailed_results],
+        )
+
+
+class ProfilingTests(APITestCase):
+    """Staff can request a profile with X-Profile, signed in with a session or a token"""
+
+    def setUp(self):
+        self.directory = temporary_directory(self)
+        use_settings(self, PROFILING={'ENABLED': True, 'SAMPLE_RATE': 0.0, 'DIR': self.directory})
+        self.staff = User.objects.create_user('erin', is_staff=True)
+        self.user = User.objects.create_user('frank')
+
+    def profile(self, **headers):
+        return self.client.get('/api/problems/', HTTP_X_PROFILE='1', **headers)
+
+    def test_staff_token(self):
+        response = self.profile(HTTP_AUTHORIZATION=f'Token {issue_token(self.staff)[0]}')
+        self.assertTrue((self.directory / f'{response["X-Profile-Id"]}.prof').exists())
+
+    def test_staff_session(self):
+        self.client.force_login(self.staff)
+        self.assertIn('X-Profile-Id', self.profile())
+
+    def test_others_are_not_profiled(self):
+        self.assertNotIn('X-Profile-Id', self.profile(HTTP_AUTHORIZATION=f'Token {issue_token(self.user)[0]}'))
+        self.assertNotIn('X-Profile-Id', self.profile(HTTP_AUTHORIZATION='Token forged'))
+        self.assertNotIn('X-Profile-Id', self.profile())
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+
+class ExamSessionDeadlineTests(APITestCase):
+    """The server sets a session's deadline and rejects submissions after it"""
+
+    def setUp(self):
+        self.problem = Problem.objects.create(title='Sum', description='', initial_code='', time_limit=5)
+
+    def test_time_comes_from_the_problem(self):
+        response = self.client.post('/api/sessions/', {
+            'problem_id': self.problem.pk, 'time_remaining': 10 ** 6,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        session = ExamSession.objects.get(pk=response.data['id'])
+        self.assertEqual(session.time_remaining, 300)
+        self.assertLessEqual(session.expires_at, timezone.now() + timedelta(seconds=300))
+
+    def test_contest_end_caps_the_deadline(self):
+        user = User.objects.create_user('carol')
+        now = timezone.now()
+        contest = Contest.objects.create(
+            title='Cup', description='', created_by=user, duration=60,
+            start_time=now - timedelta(hours=1), end_time=now + timedelta(minutes=1),
+        )
+        response = self.client.post('/api/sessions/', {
+            'problem_id': self.problem.pk, 'contest_id': contest.pk,
+        }, format='json')
+        self.assertEqual(ExamSession.objects.get(pk=response.data['id']).expires_at, contest.end_time)
+
+    def submit(self, session):
+        return self.client.post(f'/api/sessions/{session.pk}/submit/', {
+            'code': 'def solve():\n    return 1\n', 'language': 'python',
+        }, format='json')
+
+    def test_late_submit_is_forbidden(self):
+        session = ExamSession.objects.create(session_id='late', problem=self.problem, time_remaining=300)
+        ExamSession.objects.filter(pk=session.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.submit(session).status_code, 403)
+        self.assertFalse(Submission.objects.filter(exam_session=session).exists())
+
+    def test_completed_session_conflicts(self):
+        session = ExamSession.objects.create(session_id='done', problem=self.problem, time_remaining=300)
+        ExamSession.objects.filter(pk=session.pk).update(is_completed=True)
+        self.assertEqual(self.submit(session).status_code, 409)
+        self.assertFalse(Submission.objects.filter(exam_session=session).exists())
+
+
+class ClaimTests(APITestCase):
+    """Only one submit can claim a session"""
+
+    def setUp(self):
+        problem = Problem.objects.create(title='Sum', description='', initial_code='')
+        self.session = ExamSession.objects.create(session_id='claim', problem=problem, time_remaining=300)
+
+    def test_second_claim_of_a_stale_copy_loses(self):
+        stale = ExamSession.objects.get(pk=self.session.pk)
+        judge.claim(self.session)
+        self.assertTrue(ExamSession.objects.get(pk=self.session.pk).is_completed)
+        with self.assertRaises(judge.SessionClosed) as raised:
+            judge.claim(stale)
+        self.assertEqual(raised.exception.reason, 'completed')
+
+    def test_expired_session(self):
+        with self.assertRaises(judge.SessionClosed) as raised:
+            judge.claim(self.session, now=self.session.expires_at + timedelta(seconds=1))
+        self.assertEqual(raised.exception.reason, 'expired')
+        self.assertFalse(ExamSession.objects.get(pk=self.session.pk).is_completed)
+
+    def test_failed_grade_releases_the_claim(self):
+        with mock.patch.object(judge, '_grade', side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            judge.grade(self.session, 'def solve():\n    return 1\n', 'python')
+        self.assertFalse(ExamSession.objects.get(pk=self.session.pk).is_completed)
+
+
+class SweepSessionsTests(TransactionTestCase):
+    """Overdue sessions are closed and their saved code is judged"""
+
+    def setUp(self):
+        self.problem = Problem.objects.create(title='One', description='', initial_code='')
+        TestCase.objects.create(problem=self.problem, name='Test 1', input_data=[], expected_output=1)
+        self.user = User.objects.create_user('grace')
+
+    def session(self, session_id, overdue=True):
+        session = ExamSession.objects.create(session_id=session_id, problem=self.problem, user=self.user,
+                                             time_remaining=300)
+        if overdue:
+            ExamSession.objects.filter(pk=session.pk).update(expires_at=timezone.now() - timedelta(seconds=5))
+        return session
+
+    def test_sweep(self):
+        saved = self.session('saved')
+        Submission.objects.create(user=self.user, problem=self.problem, exam_session=saved,
+                                  code='def solve():\n    return 1\n', language='python')
+        empty = self.session('empty')
+        running = self.session('running', overdue=False)
+
+        output = io.StringIO()
+        call_command('sweep_sessions', '--batch-size', '1', stdout=output)
+        self.assertIn('Expired 1, auto-submitted 1, failed 0', output.getvalue())
+
+        sessions = ExamSession.objects.in_bulk([saved.pk, empty.pk, running.pk])
+        self.assertTrue(sessions[saved.pk].is_completed and sessions[saved.pk].is_submitted)
+        self.assertTrue(sessions[empty.pk].is_completed)
+        self.assertFalse(sessions[empty.pk].is_submitted)
+        self.assertFalse(sessions[running.pk].is_completed)
+        self.assertEqual(
+            list(Submission.objects.filter(exam_session=saved).order_by('submitted_at').values_list('status', flat=True)),
+            ['pending', 'accepted'],
+        )
+
+    def test_no_auto_submit(self):
+        saved = self.session('saved')
+        Submission.objects.create(user=self.user, problem=self.problem, exam_session=saved,
+                                  code='def solve():\n    return 1\n', language='python')
+        call_command('sweep_sessions', '--no-auto-submit', stdout=io.StringIO())
+        self.assertTrue(ExamSession.objects.get(pk=saved.pk).is_completed)
+        self.assertEqual(Submission.objects.filter(exam_session=saved).count(), 1)
+
+
+class DraftTests(APITestCase):
+    """Autosaves are buffered, flushed as delta/snapshot chains and rebuilt from them"""
+
+    def setUp(self):
+        use_settings(self, DRAFT_AUTOSAVE={'FLUSH_INTERVAL': 5, 'SNAPSHOT_EVERY': 3})
+        patcher = mock.patch.object(DraftBuffer, '_ensure_flusher')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        problem = Problem.objects.create(title='Sum', description='', initial_code='')
+        self.session = ExamSession.objects.create(session_id='draft', problem=problem, time_remaining=300)
+        self.buffer = DraftBuffer()
+
+    def test_apply_ops(self):
+        self.assertEqual(apply_ops('hello world', [[0, 5, 'goodbye'], [7, 7, ' cruel']]), 'goodbye cruel world')
+        for ops in [[[0, 1]], [[3, 1, 'x']], [[0, 99, 'x']], 'x']:
+            with self.assertRaises(ValueError):
+                apply_ops('hello', ops)
+
+    def test_chain_round_trip(self):
+        pk = self.session.pk
+        # Long enough that a delta's ops stay smaller than the code
+        texts = ['a = 1\n' + '# ...\n' * 10]
+        self.buffer.save(pk, code=texts[0], language='python')
+        self.buffer.flush()
+        for revision, ops in enumerate([[[4, 5, '2']], [[6, 6, 'b = 3\n']], [[0, 1, 'c']]], start=1):
+            self.assertEqual(self.buffer.save(pk, base_revision=revision, ops=ops), revision + 1)
+            texts.append(apply_ops(texts[-1], ops))
+            self.buffer.flush()
+
+        rows = list(DraftRevision.objects.filter(session=self.session).values_list('revision', 'kind', 'base_revision'))
+        self.assertEqual(rows, [(1, 'snapshot', None), (2, 'delta', 1), (3, 'delta', 2), (4, 'snapshot', None)])
+        self.assertEqual(load_drafts([pk])[pk], (4, texts[-1], 'python', 0, False))
+        DraftRevision.objects.filter(session=self.session, revision=4).delete()
+        self.assertEqual(load_drafts([pk])[pk], (3, texts[2], 'python', 2, False))
+        self.assertEqual(DraftBuffer().latest([pk]), {pk: (3, texts[2], 'python')})
+
+    def test_broken_chain_falls_back(self):
+        DraftRevision.objects.bulk_create([
+            DraftRevision(session=self.session, revision=1, kind='snapshot', code='abc', language='python'),
+            DraftRevision(session=self.session, revision=2, base_revision=1, kind='delta', ops=[[3, 3, 'd']],
+                          language='python'),
+            DraftRevision(session=self.session, revision=4, base_revision=3, kind='delta', ops=[[0, 0, 'x']],
+                          language='python'),
+        ])
+        self.assertEqual(load_drafts([self.session.pk])[self.session.pk], (5, 'abcd', 'python', 0, True))
+
+        # The client holds revision 4, so its ops conflict and it resends the code
+        with self.assertRaises(DraftConflict):
+            self.buffer.save(self.session.pk, base_revision=4, ops=[[0, 0, 'y']])
+        self.assertEqual(self.buffer.save(self.session.pk, code='abcde'), 6)
+        self.buffer.flush()
+        self.assertEqual(DraftRevision.objects.get(session=self.session, revision=6).kind, 'snapshot')
+
+    def test_autosave_endpoint(self):
+        url = f'/api/sessions/{self.session.pk}/autosave/'
+        with mock.patch('exams.views.draft_buffer', self.buffer):
+            self.assertEqual(self.client.get(url).data, {'revision': 0, 'code': None, 'language': None})
+            response = self.client.post(url, {'code': 'x = 1', 'language': 'python'}, format='json')
+            self.assertEqual(response.data, {'revision': 1})
+            response = self.client.post(url, {'base_revision': 0, 'ops': [[0, 1, 'y']]}, format='json')
+            self.assertEqual((response.status_code, response.data['revision']), (409, 1))
+            response = self.client.post(url, {'base_revision': 1, 'ops': [[0, 9, 'y']]}, format='json')
+            self.assertEqual(response.status_code, 400)
+            self.client.post(url, {'base_revision': 1, 'ops': [[0, 1, 'y']]}, format='json')
+            self.assertEqual(self.client.get(url).data, {'revision': 2, 'code': 'y = 1', 'language': 'python'})
+
+
+class RatingTests(APITestCase):
+    """Elo changes from final standings, applied once per contest"""
+
+    def test_actual_scores_split_ties(self):
+        self.assertEqual(ratings.actual_scores([1, 2, 2, 4]).tolist(), [1.0, 0.5, 0.5, 0.0])
+
+    def test_blocked_expected_scores_match_pairwise(self):
+        values = [1200, 1500, 900, 2100, 1350]
+        pairwise = [
+            sum(1 / (1 + 10 ** ((other - mine) / 400)) for j, other in enumerate(values) if j != i) / 4
+            for i, mine in enumerate(values)
+        ]
+        for block_size in (1, 2, 1024):
+            self.assertTrue(np.allclose(ratings.expected_scores(values, block_size), pairwise))
+
+    def test_deltas_are_zero_sum(self):
+        self.assertEqual(ratings.compute_deltas([1200, 1200], [1, 2]).tolist(), [16, -16])
+        deltas = ratings.compute_deltas([1800, 1200, 1500], [2, 1, 3])
+        self.assertEqual(deltas[1], deltas.max())
+        self.assertLessEqual(abs(deltas.sum()), 1)
+        self.assertEqual(ratings.compute_deltas([1500], [1]).tolist(), [0])
+
+    def contest(self, users, **times):
+        now = timezone.now()
+        contest = Contest.objects.create(
+            title='Cup', description='', created_by=users[0], duration=60,
+            start_time=times.get('start_time', now - timedelta(hours=2)),
+            end_time=times.get('end_time', now - timedelta(hours=1)),
+        )
+        for rank, user in enumerate(users, start=1):
+            Leaderboard.objects.create(contest=contest, user=user, rank=rank)
+        return contest
+
+    def test_rate_contest_once(self):
+        users = [User.objects.create_user(name) for name in ('ann', 'ben', 'cid')]
+        UserProfile.objects.create(user=users[2], rating=1600)
+        contest = self.contest(users)
+
+        preview = ratings.rate_contest(contest, dry_run=True)
+        self.assertFalse(UserProfile.objects.filter(user=users[0]).exists())
+        changes = ratings.rate_contest(contest)
+        self.assertEqual(changes, preview)
+        self.assertEqual([old for _, old, _ in changes], [1200, 1200, 1600])
+        self.assertGreater(changes[0][2], 1200)
+        self.assertLess(changes[2][2], 1600)
+        profiles = {profile.user_id: profile for profile in UserProfile.objects.filter(user__in=users)}
+        self.assertEqual([profiles[user_id].rating for user_id, _, _ in changes], [new for _, _, new in changes])
+        self.assertEqual(profiles[users[2].pk].rank, UserProfile.rank_for_rating(changes[2][2]))
+
+        self.assertTrue(Contest.objects.get(pk=contest.pk).is_rated)
+        self.assertIsNone(ratings.rate_contest(contest))
+
+    def test_command(self):
+        users = [User.objects.create_user(name) for name in ('dee', 'eve')]
+        finished = self.contest(users)
+        running = self.contest(users, end_time=timezone.now() + timedelta(hours=1))
+        with self.assertRaisesMessage(CommandError, 'Unknown contests: 999'):
+            call_command('rate_contest', str(finished.pk), '999')
+
+        output = io.StringIO()
+        call_command('rate_contest', '--all-finished', stdout=output)
+        self.assertIn('Rated Cup: 2 participants', output.getvalue())
+        call_command('rate_contest', str(finished.pk), str(running.pk), stdout=output)
+        self.assertIn('already rated', output.getvalue())
+        self.assertIn('not finished yet', output.getvalue())
+        self.assertFalse(Contest.objects.get(pk=running.pk).is_rated)
+
+
+class LoggingPipelineTests(SimpleTestCase):
+    """Records go through the queue to JSON lines, sampled per logger"""
+
+    def record(self, name='exams.judge', level=logging.INFO, **extra):
+        return logging.makeLogRecord({'name': name, 'levelno': level, 'levelname': logging.getLevelName(level),
+                                      'msg': 'judged %s', 'args': (12,), **extra})
+
+    def test_json_lines_carry_extra_fields(self):
+        line = json.loads(JsonFormatter().format(self.record(submission_id=12, verdict='accepted')))
+        self.assertEqual(line['message'], 'judged 12')
+        self.assertEqual((line['level'], line['logger']), ('INFO', 'exams.judge'))
+        self.assertEqual((line['submission_id'], line['verdict']), (12, 'accepted'))
+        self.assertNotIn('args', line)
+
+    def test_sampling_keeps_warnings(self):
+        sampler = SamplingFilter({'exams': 1.0, 'exams.perf': 0.0})
+        self.assertTrue(sampler.filter(self.record('exams.judge')))
+        self.assertFalse(sampler.filter(self.record('exams.perf')))
+        self.assertTrue(sampler.filter(self.record('exams.perf', logging.WARNING)))
+        self.assertTrue(sampler.filter(self.record('django.request')))
+
+    def test_queue_hands_rendered_records_to_the_listener(self):
+        target = logging.handlers.BufferingHandler(100)
+        handler = QueueListenerHandler([target])
+        try:
+            try:
+                raise ValueError('boom')
+            except ValueError:
+                handler.handle(self.record(exc_info=sys.exc_info()))
+        finally:
+            handler.stop()
+        [record] = target.buffer
+        self.assertEqual((record.getMessage(), record.args, record.exc_info), ('judged 12', None, None))
+        self.assertIn('ValueError: boom', record.exc_text)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = QueueListenerHandler([logging.NullHandler()], maxsize=1)
+        handler.listener.stop()  # nothing drains the queue
+        for _ in range(3):
+            handler.handle(self.record())
+        self.assertEqual(handler.dropped, 2)
+
+
+class RotatingLogTests(SimpleTestCase):
+    """Size rollovers count toward backupCount and the newest ones are kept"""
+
+    def test_backup_count_covers_size_rollovers(self):
+        with tempfile.TemporaryDirectory() as directory:
+            handler = SizedTimedRotatingFileHandler(
+                os.path.join(directory, 'app.log'), when='midnight', backupCount=3, maxBytes=100, delay=True,
+            )
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            try:
+                for i in range(20):
+                    handler.emit(logging.makeLogRecord({'msg': f'{i:02d}' + 'x' * 60}))
+            finally:
+                handler.close()
+            names = sorted(name for name in os.listdir(directory) if name != 'app.log')
+            self.assertEqual(len(names), 3)
+            kept = [Path(directory, name).read_text()[:2] for name in names]
+            self.assertEqual(kept, ['16', '17', '18'])
@@ -0,0 +1,134 @@
+"""
+Lightweight span-based tracing for the judge path.
+
+``start_trace`` opens a trace for one unit of work (a submission or an
+execute request) and ``span`` records nested, timed phases inside it. When
+no trace is active ``span`` does nothing beyond a context-variable lookup.
+Tracing is off by default, and when on only ``TRACING['SAMPLE_RATE']`` of
+the units of work are traced. Finished traces are logged as one JSON object
+per line on the ``exams.traces`` logger, whose queue handler writes them to
+``settings.TRACING['FILE']`` off the request thread, rotating it by day and
+size. ``manage.py export_traces`` turns them into a Chrome trace-event file
+that Perfetto, chrome://tracing or speedscope can show as a flame chart.
+"""
+import contextvars
+import json
+import logging
+import random
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+trace_logger = logging.getLogger('exams.traces')
+
+_current_trace = contextvars.ContextVar('exams_trace', default=None)
+_current_span = contextvars.ContextVar('exams_span', default=None)
+
+
+def _config():
+    return getattr(settings, 'TRACING', {})
+
+
+class Trace:
+    """A tree of spans belonging to one unit of work"""
+
+    def __init__(self, name):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.wall_start = time.time()
+        self.perf_start = time.perf_counter()
+        self.spans = []
+        self._next_id = 0
+
+    def new_span_id(self):
+        self._next_id += 1
+        return self._next_id
+
+    def offset(self, perf_time):
+        """Microseconds between the trace start and a perf_counter reading"""
+        return (perf_time - self.perf_start) * 1e6
+
+    def wall_offset(self, wall_time):
+        """Microseconds between the trace start and a wall-clock timestamp"""
+        return (wall_time - self.wall_start) * 1e6
+
+    def as_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'name': self.name,
+            'started_at': self.wall_start,
+            'spans': self.spans,
+        }
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def current_trace_id():
+    trace = _current_trace.get()
+    return trace.trace_id if trace else None
+
+
+@contextmanager
+def start_trace(name, **attrs):
+    """Start a trace with a root span; yields the Trace, or None when disabled or not sampled"""
+    config = _config()
+    if not config.get('ENABLED', False) or random.random() >= config.get('SAMPLE_RATE', 1.0):
+        yield None
+        return
+    trace = Trace(name)
+    trace_token = _current_trace.set(trace)
+    try:
+        with span(name, **attrs):
+            yield trace
+    finally:
+        _current_trace.reset(trace_token)
+        _write(trace)
+
+
+@contextmanager
+def span(name, **attrs):
+    """Record the enclosed block as a child of the current span"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    record = {
+        'id': trace.new_span_id(),
+        'parent': _current_span.get(),
+        'name': name,
+        'attrs': attrs,
+    }
+    span_token = _current_span.set(record['id'])
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        ended = time.perf_counter()
+        _current_span.reset(span_token)
+        record['start_us'] = round(trace.offset(started), 1)
+        record['dur_us'] = round((ended - started) * 1e6, 1)
+        trace.spans.append(record)
+
+
+def record_span(name, wall_start, duration, parent=None, **attrs):
+    """Add an already measured span, e.g. timing reported by a child process"""
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    trace.spans.append({
+        'id': trace.new_span_id(),
+        'parent': parent if parent is not None else _current_span.get(),
+        'name': name,
+        'attrs': attrs,
+        'start_us': round(trace.wall_offset(wall_start), 1),
+        'dur_us': round(duration * 1e6, 1),
+    })
+
+
+def _write(trace):
+    trace_logger.info(json.dumps(trace.as_dict(), default=str))
@@ -15,6 +15,9 @@ router.register(r'discussions', views.DiscussionViewSet)
 urlpatterns = [
     path('', include(router.urls)),
     path('execute/', views.CodeExecutionView.as_view(), name='code_execute'),
+    # Token authentication
+    path('auth/token/', views.AuthTokenView.as_view(), name='auth_token'),
+    path('auth/token/revoke/', views.RevokeTokenView.as_view(), name='auth_token_revoke'),
     # Contest-specific endpoints
     path('contests/<int:contest_id>/register/', views.ContestViewSet.as_view({'post': 'register'}), name='contest_register'),
     path('contests/<int:contest_id>/leaderboard/', views.ContestViewSet.as_view({'get': 'leaderboard'}), name='contest_leaderboard'),
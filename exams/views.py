@@ -1,5 +1,5 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse, Http404, FileResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views import View
@@ -9,20 +9,34 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework.authentication import SessionAuthentication, BasicAuthentication
+from rest_framework.views import APIView
+from django.contrib.auth import authenticate
 import json
+import logging
 import time
 import uuid
+import selectors
 import subprocess
-import tempfile
 import os
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from django.conf import settings
 from django.utils import timezone
+from django.db.models import Count, F, Q
 from .models import (
     Problem, TestCase, ExamSession, Submission, TestResult,
-    UserProfile, Contest, ContestParticipant, ProblemCategory,
+    UserProfile, UserProblemProgress, Contest, ContestParticipant, ProblemCategory,
     Leaderboard, Discussion, DiscussionReply
 )
+from . import judge, languages, metrics, profiling
+from .archive import archive_index
+from .authentication import SignedTokenAuthentication, issue_token, revoke_token
+from .blobstore import open_blob
+from .drafts import draft_buffer, DraftConflict
+from .filters import BooleanFilter, ChoiceFilter, Filter, NumberFilter, RelatedFilter
+from .perf import timed
+from .tracing import start_trace, span, record_span
+from .zygote import python_zygote
 from .serializers import (
     ProblemSerializer, TestCaseSerializer, ExamSessionSerializer,
     SubmissionSerializer, TestResultSerializer, CodeExecutionSerializer,
@@ -32,6 +46,25 @@ from .serializers import (
 )
 
 
+logger = logging.getLogger(__name__)
+
+
+class OutputLimitExceeded(Exception):
+    """A judge child wrote more than JUDGE_OUTPUT_LIMIT bytes to one stream"""
+    def __init__(self, stream, limit):
+        super().__init__(f'Output limit exceeded ({stream} over {limit} bytes)')
+        self.stream = stream
+
+
+class ChildResult:
+    """Exit status, bounded output and decoded result report of a judge child"""
+    def __init__(self, returncode, stdout, stderr, report):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.report = report
+
+
 class CodeExecutionView(View):
     """Enhanced view for executing code and running tests"""
     
@@ -44,267 +77,304 @@ class CodeExecutionView(View):
             data = json.loads(request.body)
             code = data.get('code', '')
             language = data.get('language', 'javascript')
-            test_cases = data.get('test_cases', [])
+            # Blob-backed inputs only come from TestCase rows, never from clients
+            test_cases = [
+                {key: value for key, value in test_case.items() if key != 'input_blob'}
+                for test_case in data.get('test_cases', [])
+                if isinstance(test_case, dict)
+            ]
             
             if not code:
                 return JsonResponse({'error': 'Code is required'}, status=400)
+            if languages.get_backend(language) is None:
+                return JsonResponse({'error': f'Unsupported language: {language}'}, status=400)
             
             # Execute code and run tests
-            results = self.execute_code(code, language, test_cases)
+            with start_trace('execute', language=language) as trace:
+                results = self.execute_code(code, language, test_cases)
             
-            return JsonResponse({
+            response = JsonResponse({
                 'success': True,
                 'results': results,
                 'execution_time': 0.1,  # Placeholder
-                'memory_used': 0  # Placeholder
+                'memory_used': 0,  # Placeholder
+                'trace_id': trace.trace_id if trace else None
             })
+            if trace:
+                response['X-Trace-Id'] = trace.trace_id
+            return response
             
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
     
     def execute_code(self, code, language, test_cases):
         """Execute code and run test cases"""
-        results = []
-        
-        if language == 'javascript':
-            results = self.execute_javascript(code, test_cases)
-        elif language == 'python':
-            results = self.execute_python(code, test_cases)
-        else:
-            # Default to JavaScript
-            results = self.execute_javascript(code, test_cases)
-        
-        return results
+        backend = languages.get_backend(language)
+        if backend is None:
+            # Nothing can run it, e.g. an auto-submitted draft in an unknown language
+            return [
+                self.failed_result(test_case, f'Unsupported language: {language}', verdict='compilation_error')
+                for test_case in test_cases
+            ]
+        
+        metrics.executions_total.inc(language=language)
+        with timed('executor'), span('execute_code', language=language), \
+                metrics.executor_in_flight.track_inprogress(language=language), \
+                metrics.execution_seconds.time(language=language):
+            try:
+                with span('compile', language=language), metrics.compile_seconds.time(language=language):
+                    prepared = backend.prepare(code)
+            except languages.CompilationError as e:
+                return [self.failed_result(test_case, str(e), verdict='compilation_error') for test_case in test_cases]
+            except (OSError, subprocess.SubprocessError) as e:
+                logger.error('Preparing %s failed: %s', language, e, extra={'language': language, 'error': str(e)})
+                return [self.failed_result(test_case, f'Runtime unavailable: {e}') for test_case in test_cases]
+            
+            try:
+                return [self.run_test(backend, prepared, test_case) for test_case in test_cases]
+            finally:
+                backend.cleanup(prepared)
     
-    def execute_javascript(self, code, test_cases):
-        """Execute JavaScript code using Node.js"""
-        results = []
-        
-        for test_case in test_cases:
+    def run_test(self, backend, prepared, test_case):
+        """Run one test case in a fresh child and turn it into a result entry"""
+        launch = None
+        test_started = time.perf_counter()
+        with span('test', test=test_case.get('name', 'Test')):
             try:
-                # Create a temporary file with the code
-                with tempfile.NamedTemporaryFile(mode='w', suffix='.js', delete=False) as f:
-                    # Wrap the code in a function and add test execution
-                    wrapped_code = f"""
-{code}
-
-// Test execution
-const testInput = {json.dumps(test_case.get('input', []))};
-const expectedOutput = {json.dumps(test_case.get('expected', None))};
-
-try {{
-    const result = solve(...testInput);
-    console.log(JSON.stringify({{
-        success: true,
-        result: result,
-        expected: expectedOutput,
-        passed: result === expectedOutput
-    }}));
-}} catch (error) {{
-    console.log(JSON.stringify({{
-        success: false,
-        error: error.message
-    }}));
-}}
-"""
-                    f.write(wrapped_code)
-                    temp_file = f.name
+                with span('write_source'):
+                    launch = backend.launch(prepared, test_case)
                 
-                # Execute the code
-                result = subprocess.run(
-                    ['node', temp_file],
-                    capture_output=True,
-                    text=True,
-                    timeout=10
-                )
+                # Execute the code with the test input on stdin
+                with self.open_test_input(test_case) as stdin, span('run') as run_span:
+                    started_at = time.time()
+                    result = self.run_child(launch, backend.name, **stdin)
+                    elapsed = time.time() - started_at
                 
-                # Parse the output
-                if result.returncode == 0:
-                    try:
-                        output = json.loads(result.stdout.strip())
-                        results.append({
-                            'name': test_case.get('name', 'Test'),
-                            'input': test_case.get('input', []),
-                            'expected': test_case.get('expected', None),
-                            'actual': output.get('result'),
-                            'passed': output.get('passed', False),
-                            'error': output.get('error')
-                        })
-                    except json.JSONDecodeError:
-                        results.append({
-                            'name': test_case.get('name', 'Test'),
-                            'input': test_case.get('input', []),
-                            'expected': test_case.get('expected', None),
-                            'actual': result.stdout.strip(),
-                            'passed': False,
-                            'error': 'Invalid output format'
-                        })
-                else:
-                    results.append({
-                        'name': test_case.get('name', 'Test'),
-                        'input': test_case.get('input', []),
-                        'expected': test_case.get('expected', None),
-                        'actual': None,
-                        'passed': False,
-                        'error': result.stderr.strip()
-                    })
-                
-                # Clean up
-                os.unlink(temp_file)
+                # Only the result channel is decoded; stdout belongs to the solution,
+                # unless the program prints its answer
+                with span('parse_output'):
+                    if not backend.reports_result:
+                        result.report = backend.report(result.stdout, test_case, started_at, elapsed)
+                    entry = self.collect_result(test_case, result, run_span)
+                outcome = 'passed' if entry['passed'] else 'error' if entry.get('error') else 'failed'
                 
             except subprocess.TimeoutExpired:
-                results.append({
-                    'name': test_case.get('name', 'Test'),
-                    'input': test_case.get('input', []),
-                    'expected': test_case.get('expected', None),
-                    'actual': None,
-                    'passed': False,
-                    'error': 'Execution timeout'
-                })
+                entry, outcome = self.failed_result(test_case, 'Execution timeout'), 'timeout'
+            except OutputLimitExceeded as e:
+                entry = self.failed_result(test_case, str(e), verdict='output_limit_exceeded')
+                outcome = 'output_limit'
             except Exception as e:
-                results.append({
-                    'name': test_case.get('name', 'Test'),
-                    'input': test_case.get('input', []),
-                    'expected': test_case.get('expected', None),
-                    'actual': None,
-                    'passed': False,
-                    'error': str(e)
-                })
-        
-        return results
+                entry, outcome = self.failed_result(test_case, str(e)), 'error'
+            finally:
+                if launch:
+                    launch.cleanup()
+        
+        metrics.test_runs_total.inc(language=backend.name, outcome=outcome)
+        metrics.test_run_seconds.observe(time.perf_counter() - test_started, language=backend.name)
+        return entry
     
-    def execute_python(self, code, test_cases):
-        """Execute Python code"""
-        results = []
-        
-        for test_case in test_cases:
+    def run_child(self, launch, language, input=None, stdin=None):
+        """Run a judge child, streaming its output under a byte cap per stream.
+        
+        The harness reports its result as one length-prefixed frame on a
+        separate pipe (``JUDGE_RESULT_FD`` in its environment); stdout and
+        stderr are read incrementally and only kept up to the cap. A child
+        that runs too long or writes too much is killed, raising
+        ``subprocess.TimeoutExpired`` or ``OutputLimitExceeded``.
+        
+        The launch's CPU and memory limits are set in the child before exec.
+        With a ``zygote_job`` the child is forked by the Python zygote when
+        it is enabled, and the command is only launched as a fallback.
+        """
+        result_read, result_write = os.pipe()
+        started = time.perf_counter()
+        stdin = subprocess.PIPE if input is not None else stdin
+        try:
+            with span('spawn', zygote=launch.zygote_job is not None):
+                process = None
+                if launch.zygote_job:
+                    process = python_zygote.spawn(launch.zygote_job, stdin, result_write)
+                if process is None:
+                    process = subprocess.Popen(
+                        launch.command,
+                        stdin=stdin,
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.PIPE,
+                        pass_fds=(result_write,),
+                        env={**os.environ, 'JUDGE_RESULT_FD': str(result_write)},
+                        preexec_fn=launch.apply_limits,
+                    )
+        except BaseException:
+            os.close(result_read)
+            raise
+        finally:
+            os.close(result_write)
+        metrics.spawn_seconds.observe(time.perf_counter() - started, language=language)
+        
+        with process, open(result_read, 'rb') as result_channel:
             try:
-                # Create a temporary file with the code
-                with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-                    # Wrap the code in a function and add test execution
-                    wrapped_code = f"""
-{code}
-
-# Test execution
-import json
-test_input = {json.dumps(test_case.get('input', []))}
-expected_output = {json.dumps(test_case.get('expected', None))}
-
-try:
-    result = solve(*test_input)
-    print(json.dumps({{
-        "success": True,
-        "result": result,
-        "expected": expected_output,
-        "passed": result == expected_output
-    }}))
-except Exception as error:
-    print(json.dumps({{
-        "success": False,
-        "error": str(error)
-    }}))
-"""
-                    f.write(wrapped_code)
-                    temp_file = f.name
-                
-                # Execute the code
-                result = subprocess.run(
-                    ['python', temp_file],
-                    capture_output=True,
-                    text=True,
-                    timeout=10
-                )
-                
-                # Parse the output
-                if result.returncode == 0:
-                    try:
-                        output = json.loads(result.stdout.strip())
-                        results.append({
-                            'name': test_case.get('name', 'Test'),
-                            'input': test_case.get('input', []),
-                            'expected': test_case.get('expected', None),
-                            'actual': output.get('result'),
-                            'passed': output.get('passed', False),
-                            'error': output.get('error')
-                        })
-                    except json.JSONDecodeError:
-                        results.append({
-                            'name': test_case.get('name', 'Test'),
-                            'input': test_case.get('input', []),
-                            'expected': test_case.get('expected', None),
-                            'actual': result.stdout.strip(),
-                            'passed': False,
-                            'error': 'Invalid output format'
-                        })
-                else:
-                    results.append({
-                        'name': test_case.get('name', 'Test'),
-                        'input': test_case.get('input', []),
-                        'expected': test_case.get('expected', None),
-                        'actual': None,
-                        'passed': False,
-                        'error': result.stderr.strip()
-                    })
-                
-                # Clean up
-                os.unlink(temp_file)
-                
+                stdout, stderr, report = self.stream_child(process, result_channel, input, launch.timeout)
             except subprocess.TimeoutExpired:
-                results.append({
-                    'name': test_case.get('name', 'Test'),
-                    'input': test_case.get('input', []),
-                    'expected': test_case.get('expected', None),
-                    'actual': None,
-                    'passed': False,
-                    'error': 'Execution timeout'
-                })
-            except Exception as e:
-                results.append({
-                    'name': test_case.get('name', 'Test'),
-                    'input': test_case.get('input', []),
-                    'expected': test_case.get('expected', None),
-                    'actual': None,
-                    'passed': False,
-                    'error': str(e)
-                })
-        
-        return results
+                process.kill()
+                process.wait()
+                metrics.timeouts_total.inc(language=language)
+                raise
+            except OutputLimitExceeded as e:
+                process.kill()
+                process.wait()
+                metrics.output_limit_total.inc(language=language, stream=e.stream)
+                raise
+        return ChildResult(process.returncode, stdout, stderr, report)
+    
+    def stream_child(self, process, result_channel, input, timeout):
+        """Pump stdin and read stdout, stderr and the result channel until EOF"""
+        limit = settings.JUDGE_OUTPUT_LIMIT
+        deadline = time.monotonic() + timeout
+        buffers = {
+            process.stdout: ('stdout', bytearray()),
+            process.stderr: ('stderr', bytearray()),
+            result_channel: ('result', bytearray()),
+        }
+        with selectors.DefaultSelector() as selector:
+            for stream in buffers:
+                selector.register(stream, selectors.EVENT_READ)
+            pending = memoryview(input.encode('utf-8')) if input is not None else None
+            if pending is not None:
+                os.set_blocking(process.stdin.fileno(), False)
+                selector.register(process.stdin, selectors.EVENT_WRITE)
+            
+            while selector.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(process.args, timeout)
+                for key, _ in selector.select(remaining):
+                    stream = key.fileobj
+                    if stream is process.stdin:
+                        try:
+                            pending = pending[os.write(stream.fileno(), pending[:65536]):]
+                        except BrokenPipeError:
+                            pending = pending[:0]
+                        if not pending:
+                            selector.unregister(stream)
+                            stream.close()
+                        continue
+                    chunk = os.read(stream.fileno(), 65536)
+                    if not chunk:
+                        selector.unregister(stream)
+                        continue
+                    name, buffer = buffers[stream]
+                    if len(buffer) + len(chunk) > limit:
+                        raise OutputLimitExceeded(name, limit)
+                    buffer += chunk
+        
+        process.wait(timeout=max(0, deadline - time.monotonic()))
+        stdout, stderr, report = (buffer for _, buffer in buffers.values())
+        return (
+            stdout.decode('utf-8', errors='replace'),
+            stderr.decode('utf-8', errors='replace'),
+            self.decode_report(report),
+        )
+    
+    def decode_report(self, frame):
+        """Parse the harness's ``<length>\n<json>`` frame; None if absent or malformed"""
+        header, _, payload = bytes(frame).partition(b'\n')
+        if not header.isdigit() or int(header) != len(payload):
+            return None
+        try:
+            return json.loads(payload)
+        except ValueError:
+            return None
+    
+    def collect_result(self, test_case, result, run_span):
+        """Turn a finished child into a test result entry"""
+        entry = {
+            'name': test_case.get('name', 'Test'),
+            'input': test_case.get('input', []),
+            'expected': test_case.get('expected', None),
+            'actual': None,
+            'passed': False,
+        }
+        if result.returncode != 0:
+            entry['error'] = result.stderr.strip() or f'Exited with status {result.returncode}'
+        elif result.report is None:
+            entry['error'] = 'Invalid output format'
+        else:
+            entry.update({
+                'actual': result.report.get('result'),
+                'passed': result.report.get('passed', False),
+                'error': result.report.get('error'),
+                'execution_time': self.record_timing(result.report, run_span),
+            })
+        return entry
+    
+    def failed_result(self, test_case, error, **extra):
+        return {
+            'name': test_case.get('name', 'Test'),
+            'input': test_case.get('input', []),
+            'expected': test_case.get('expected', None),
+            'actual': None,
+            'passed': False,
+            'error': error,
+            **extra,
+        }
+    
+    def record_timing(self, output, run_span):
+        """Turn the harness's own timing of solve() into a span and a duration"""
+        timing = output.get('timing')
+        if not timing:
+            return None
+        if run_span is not None:
+            record_span('user_code', timing['start'], timing['elapsed'], parent=run_span['id'])
+        return timing['elapsed']
+    
+    @contextmanager
+    def open_test_input(self, test_case):
+        """Yield subprocess arguments that feed the test input on stdin.
+        
+        Blob-backed inputs are passed as an open file so the child reads
+        them straight from disk; inline inputs are piped in.
+        """
+        if test_case.get('input_blob'):
+            with open_blob(test_case['input_blob']) as f:
+                yield {'stdin': f}
+        else:
+            yield {'input': json.dumps(test_case.get('input', []))}
 
 
 class ProblemViewSet(viewsets.ReadOnlyModelViewSet):
     """Enhanced ViewSet for problems"""
-    queryset = Problem.objects.filter(is_active=True)
+    queryset = Problem.objects.filter(is_active=True).select_related(
+        'category', 'created_by'
+    ).prefetch_related('test_cases')
     serializer_class = ProblemSerializer
     permission_classes = [AllowAny]
+    filter_fields = {
+        'category': RelatedFilter('category_id', ProblemCategory),
+        'difficulty': NumberFilter('difficulty_score', 1, 10),
+        'contest': NumberFilter('contest_id', 1),
+        'points': NumberFilter('points', 0),
+        'featured': BooleanFilter('is_featured'),
+    }
+    ordering_fields = {
+        'difficulty': 'difficulty_score',
+        'points': 'points',
+        'acceptance': 'acceptance_rate',
+        'created': 'created_at',
+        'title': 'title',
+    }
     
-    def list(self, request, *args, **kwargs):
-        """Override list method to add filtering and error handling"""
-        try:
-            # Add filtering options
-            category = request.query_params.get('category')
-            difficulty = request.query_params.get('difficulty')
-            contest = request.query_params.get('contest')
-            
-            queryset = self.queryset
-            
-            if category:
-                queryset = queryset.filter(category__name=category)
-            if difficulty:
-                queryset = queryset.filter(difficulty_score=difficulty)
-            if contest:
-                queryset = queryset.filter(contest_id=contest)
-            
-            # Update the queryset
-            self.queryset = queryset
-            
-            return super().list(request, *args, **kwargs)
-            
-        except Exception as e:
-            print(f"Error in ProblemViewSet.list: {e}")
-            return Response(
-                {'error': 'Failed to fetch problems', 'detail': str(e)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+    def get_serializer(self, *args, **kwargs):
+        """Add the user's solved/attempted status for the problems being serialized.
+        
+        Called after pagination, so the lookup covers the current page only.
+        """
+        if args and self.request.user.is_authenticated:
+            problems = args[0] if kwargs.get('many') else [args[0]]
+            kwargs['context'] = {
+                **self.get_serializer_context(),
+                'user_status': UserProblemProgress.status_map(self.request.user.id, [p.pk for p in problems]),
+            }
+        return super().get_serializer(*args, **kwargs)
     
     @action(detail=True, methods=['post'])
     def start_exam(self, request, pk=None):
@@ -318,21 +388,34 @@ class ProblemViewSet(viewsets.ReadOnlyModelViewSet):
         exam_session = ExamSession.objects.create(
             session_id=session_id,
             problem=problem,
-            time_remaining=problem.time_limit * 60  # Convert to seconds
+            time_remaining=problem.session_seconds()
         )
         
         return Response({
             'session_id': session_id,
             'problem': ProblemSerializer(problem).data,
-            'time_remaining': problem.time_limit * 60
+            'time_remaining': exam_session.time_remaining
         })
 
 
 class ContestViewSet(viewsets.ModelViewSet):
     """ViewSet for contests"""
-    queryset = Contest.objects.all()
+    queryset = Contest.objects.select_related('created_by').annotate(
+        active_participants=Count('participants', filter=Q(participants__is_active=True))
+    ).order_by('-start_time')  # Meta.ordering is not applied to aggregate queries
     serializer_class = ContestSerializer
     permission_classes = [AllowAny]
+    filter_fields = {
+        'status': ChoiceFilter('status', Contest.CONTEST_STATUS),
+        'type': ChoiceFilter('contest_type', Contest.CONTEST_TYPE),
+        'public': BooleanFilter('is_public'),
+        'rated': BooleanFilter('is_rated'),
+    }
+    ordering_fields = {
+        'start': 'start_time',
+        'end': 'end_time',
+        'created': 'created_at',
+    }
     
     @action(detail=True, methods=['post'])
     def register(self, request, pk=None):
@@ -361,6 +444,9 @@ class ContestViewSet(viewsets.ModelViewSet):
         contest.current_participants += 1
         contest.save()
         
+        UserProfile.objects.get_or_create(user=user)
+        UserProfile.objects.filter(user=user).update(contests_participated=F('contests_participated') + 1)
+        
         return Response({
             'message': 'Successfully registered for contest',
             'participant': ContestParticipantSerializer(participant).data
@@ -371,8 +457,11 @@ class ContestViewSet(viewsets.ModelViewSet):
         """Get contest leaderboard"""
         contest = self.get_object()
         leaderboard = Leaderboard.objects.filter(contest=contest).order_by('rank')
+        data = LeaderboardSerializer(leaderboard, many=True).data
         
-        return Response(LeaderboardSerializer(leaderboard, many=True).data)
+        metrics.leaderboard_reads_total.inc()
+        metrics.leaderboard_rows.observe(len(data))
+        return Response(data)
     
     @action(detail=True, methods=['get'])
     def problems(self, request, pk=None):
@@ -393,29 +482,74 @@ class ExamSessionViewSet(viewsets.ModelViewSet):
         """Create a new exam session"""
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
+            problem = Problem.objects.filter(pk=serializer.validated_data['problem_id'], is_active=True).first()
+            if problem is None:
+                return Response({'problem_id': ['Unknown problem.']}, status=status.HTTP_400_BAD_REQUEST)
+            
             # Generate session ID
             session_id = str(uuid.uuid4())
             
-            # Create session
+            # Create session; the time comes from the problem (and the
+            # contest's end, see compute_deadline), never from the client
             exam_session = ExamSession.objects.create(
                 session_id=session_id,
-                problem_id=serializer.validated_data['problem_id'],
+                problem=problem,
                 contest_id=serializer.validated_data.get('contest_id'),
-                time_remaining=serializer.validated_data.get('time_remaining', 300)
+                time_remaining=problem.session_seconds()
             )
             
             return Response(ExamSessionSerializer(exam_session).data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=True, methods=['get', 'post'])
+    def autosave(self, request, pk=None):
+        """Autosave the session's code draft, or fetch it to restore the editor"""
+        exam_session = self.get_object()
+        
+        if request.method == 'GET':
+            draft = draft_buffer.latest([exam_session.pk]).get(exam_session.pk)
+            revision, code, language = draft if draft else (0, None, None)
+            return Response({'revision': revision, 'code': code, 'language': language})
+        
+        if exam_session.is_completed or exam_session.seconds_remaining() == 0:
+            return Response({'error': 'Session has ended'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            revision = draft_buffer.save(
+                exam_session.pk,
+                base_revision=request.data.get('base_revision'),
+                ops=request.data.get('ops'),
+                code=request.data.get('code'),
+                language=request.data.get('language'),
+            )
+        except DraftConflict as e:
+            return Response(
+                {'error': 'Draft has changed; resend the full code', 'revision': e.revision},
+                status=status.HTTP_409_CONFLICT
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({'revision': revision})
+    
     @action(detail=True, methods=['post'])
     def submit(self, request, pk=None):
         """Submit code for evaluation"""
+        with start_trace('submit', session=pk) as trace:
+            response = self._submit(request, pk)
+        
+        if trace:
+            response['X-Trace-Id'] = trace.trace_id
+            if isinstance(response.data, dict):
+                response.data['trace_id'] = trace.trace_id
+        return response
+    
+    def _submit(self, request, pk):
+        """Judge a submission; each phase is recorded as a trace span"""
         try:
             exam_session = self.get_object()
-            print(f"Submit action called for session ID: {pk}")
-            print(f"Exam session found: {exam_session}")
         except Exception as e:
-            print(f"Error getting exam session: {e}")
+            logger.warning('Submit for unknown session %s', pk, extra={'session_id': pk, 'error': str(e)})
             return Response({'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
         
         # Get submission data
@@ -424,100 +558,48 @@ class ExamSessionViewSet(viewsets.ModelViewSet):
         
         if not code:
             return Response({'error': 'Code is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if languages.get_backend(language) is None:
+            return Response({'error': f'Unsupported language: {language}'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Create submission
-        submission = Submission.objects.create(
-            user=request.user if request.user.is_authenticated else None,
-            problem=exam_session.problem,
-            contest=exam_session.contest,
-            exam_session=exam_session,
-            code=code,
-            language=language
-        )
-        
-        # Execute code against test cases
-        test_cases = exam_session.problem.test_cases.all()
-        test_data = []
-        
-        for test_case in test_cases:
-            test_data.append({
-                'name': test_case.name,
-                'input': test_case.input_data,
-                'expected': test_case.expected_output
-            })
-        
-        # Execute code
-        code_executor = CodeExecutionView()
-        results = code_executor.execute_code(code, language, test_data)
-        
-        # Calculate score and update submission
-        total_points = 0
-        passed_tests = 0
-        
-        for i, result in enumerate(results):
-            test_case = test_cases[i]
-            points_earned = test_case.points if result['passed'] else 0
-            total_points += points_earned
-            
-            if result['passed']:
-                passed_tests += 1
-            
-            # Create detailed test results
-            TestResult.objects.create(
-                submission=submission,
-                test_case=test_case,
-                input_data=result['input'],
-                expected_output=result['expected'],
-                actual_output=result['actual'],
-                is_passed=result['passed'],
-                error_message=result.get('error', ''),
-                points_earned=points_earned
+        try:
+            submission = judge.grade(
+                exam_session, code, language,
+                user=request.user if request.user.is_authenticated else None,
             )
-        
-        # Determine submission status
-        if passed_tests == len(test_cases):
-            submission.status = 'accepted'
-        else:
-            submission.status = 'wrong_answer'
-        
-        # Update submission
-        submission.score = total_points
-        submission.points_earned = total_points
-        submission.test_results = results
-        submission.status = submission.status
-        submission.save()
-        
-        # Update problem statistics
-        exam_session.problem.update_statistics()
-        
-        # Mark session as submitted
-        exam_session.is_submitted = True
-        exam_session.score = total_points
-        exam_session.save()
-        
-        print(f"Submission successful: {submission.id}")
+        except judge.SessionClosed as e:
+            if e.reason == 'expired':
+                return Response({'error': str(e)}, status=status.HTTP_403_FORBIDDEN)
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
         return Response(SubmissionSerializer(submission).data)
 
 
 class SubmissionViewSet(viewsets.ReadOnlyModelViewSet):
     """Enhanced ViewSet for submissions"""
-    queryset = Submission.objects.all()
+    queryset = Submission.objects.select_related(
+        'user', 'code_blob', 'contest__created_by', 'problem__category', 'problem__created_by',
+        'exam_session__problem__category', 'exam_session__problem__created_by',
+        'exam_session__contest__created_by',
+    ).prefetch_related('problem__test_cases', 'exam_session__problem__test_cases', 'test_results_detail')
     serializer_class = SubmissionSerializer
     permission_classes = [AllowAny]
+    filter_fields = {
+        'contest': NumberFilter('contest_id', 1),
+        'problem': NumberFilter('problem_id', 1),
+        'status': ChoiceFilter('status', Submission.STATUS_CHOICES),
+        'language': Filter('language'),
+        'score': NumberFilter('score', 0, 100),
+    }
+    ordering_fields = {
+        'submitted': 'submitted_at',
+        'score': 'score',
+        'time': 'execution_time',
+    }
     
     def get_queryset(self):
-        """Filter submissions based on user and contest"""
+        """Authenticated users only see their own submissions"""
         queryset = super().get_queryset()
-        
-        # Filter by user if authenticated
         if self.request.user.is_authenticated:
             queryset = queryset.filter(user=self.request.user)
-        
-        # Filter by contest if specified
-        contest_id = self.request.query_params.get('contest')
-        if contest_id:
-            queryset = queryset.filter(contest_id=contest_id)
-        
         return queryset
 
 
@@ -529,26 +611,97 @@ class UserProfileViewSet(viewsets.ReadOnlyModelViewSet):
     
     @action(detail=True, methods=['get'])
     def submissions(self, request, pk=None):
-        """Get user's submission history"""
+        """Get user's submission history; ``?archived=true`` pages through archived submissions"""
         profile = self.get_object()
-        submissions = profile.user.submissions.all().order_by('-submitted_at')
+        if request.query_params.get('archived', '').lower() in ('1', 'true', 'yes'):
+            return self.archived_submissions(request, profile)
+        submissions = profile.user.submissions.select_related('code_blob').order_by('-submitted_at')
         
         return Response(SubmissionSerializer(submissions, many=True).data)
+    
+    def archived_submissions(self, request, profile):
+        try:
+            page = max(1, int(request.query_params.get('page', 1)))
+            page_size = min(100, max(1, int(request.query_params.get('page_size', 20))))
+        except ValueError:
+            return Response({'error': 'page and page_size must be numbers'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        results = archive_index.user_submissions(profile.user_id, offset=(page - 1) * page_size, limit=page_size)
+        return Response({
+            'count': archive_index.count_for_user(profile.user_id),
+            'page': page,
+            'results': results,
+        })
 
 
 class DiscussionViewSet(viewsets.ModelViewSet):
     """ViewSet for problem discussions"""
-    queryset = Discussion.objects.all()
+    queryset = Discussion.objects.select_related('user').annotate(
+        reply_count=Count('replies')
+    ).order_by('-created_at')
     serializer_class = DiscussionSerializer
     permission_classes = [AllowAny]
+    filter_fields = {
+        'problem': NumberFilter('problem_id', 1),
+        'resolved': BooleanFilter('is_resolved'),
+    }
+    ordering_fields = {
+        'created': 'created_at',
+        'updated': 'updated_at',
+    }
+
+
+class AuthTokenView(APIView):
+    """Exchange a username and password for a signed API token"""
+    authentication_classes = []
+    permission_classes = [AllowAny]
     
-    def get_queryset(self):
-        """Filter discussions by problem"""
-        queryset = super().get_queryset()
-        problem_id = self.request.query_params.get('problem')
-        if problem_id:
-            queryset = queryset.filter(problem_id=problem_id)
-        return queryset
+    def post(self, request):
+        user = authenticate(request, username=request.data.get('username'), password=request.data.get('password'))
+        if user is None or not user.is_active:
+            return Response({'error': 'Invalid credentials'}, status=status.HTTP_400_BAD_REQUEST)
+        token, expires_at = issue_token(user)
+        return Response({'token': token, 'expires_at': expires_at})
+
+
+class RevokeTokenView(APIView):
+    """Revoke the token this request was authenticated with"""
+    authentication_classes = [SignedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        revoke_token(request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def metrics_view(request):
+    """Expose judge and API metrics in Prometheus text format"""
+    if not metrics.enabled():
+        raise Http404('Metrics are disabled')
+    return HttpResponse(metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def profiles_view(request):
+    """Admin page listing the slowest captured request profiles"""
+    name = request.GET.get('name')
+    if name and 'download' in request.GET:
+        path = profiling.profile_path(name)
+        if path is None:
+            raise Http404('Profile not found')
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name)
+    
+    context = {
+        'title': 'Request profiles',
+        'profiles': profiling.list_profiles(),
+        'sort_keys': profiling.SORT_KEYS,
+    }
+    if name:
+        sort = request.GET.get('sort', 'cumulative')
+        report = profiling.render_stats(name, sort=sort)
+        if report is None:
+            raise Http404('Profile not found')
+        context.update({'selected': name, 'sort': sort, 'report': report})
+    return render(request, 'admin/profiles.html', context)
 
 
 def frontend_view(request):
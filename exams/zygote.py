@@ -0,0 +1,233 @@
+"""
+Client side of the Python judge's fork server (``exams/zygote_server.py``).
+
+With ``settings.JUDGE_PYTHON_ZYGOTE`` the judge starts one zygote per
+process, on first use, and sends it each test run instead of launching a
+new interpreter. ``ZygoteProcess`` has the parts of the ``subprocess.Popen``
+interface that ``CodeExecutionView.run_child`` uses, so output streaming,
+limits and timeouts work the same for both launch modes. A job carries the
+source, the expected output, the timeout and the memory limit; the runner
+applies them as ``RLIMIT_CPU`` and ``RLIMIT_AS`` after the fork.
+
+If the zygote cannot be started (no ``fork`` or ``socket.send_fds`` on this
+platform, or a broken interpreter), it is not retried and Python tests run
+as plain ``python`` launches for the rest of the process. A zygote that dies
+is restarted on the next test.
+"""
+import json
+import logging
+import os
+import signal
+import socket
+import subprocess
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+SERVER = Path(__file__).with_name('zygote_server.py')
+
+
+def interpreter():
+    """Command prefix for Python judge children and the zygote"""
+    if getattr(settings, 'JUDGE_PYTHON_ISOLATED', False):
+        # Skip site processing and ignore PYTHON* variables and the user site
+        return ['python', '-I', '-S']
+    return ['python']
+
+
+def plain_source(code, expected_json):
+    """The self-contained wrapper run with plain ``python``"""
+    return f"""
+{code}
+
+# Test execution
+import json
+import os as _judge_os
+import sys
+import time as _judge_time
+test_input = json.load(sys.stdin)
+expected_output = json.loads({expected_json!r})
+
+def _judge_report(report):
+    # One length-prefixed frame on the result channel; stdout is left to the solution
+    payload = json.dumps(report).encode('utf-8')
+    with _judge_os.fdopen(int(_judge_os.environ['JUDGE_RESULT_FD']), 'wb') as channel:
+        channel.write(b'%d\\n' % len(payload) + payload)
+
+try:
+    _judge_started_at = _judge_time.time()
+    _judge_start = _judge_time.perf_counter()
+    result = solve(*test_input)
+    _judge_elapsed = _judge_time.perf_counter() - _judge_start
+    _judge_report({{
+        "success": True,
+        "result": result,
+        "expected": expected_output,
+        "passed": result == expected_output,
+        "timing": {{"start": _judge_started_at, "elapsed": _judge_elapsed}}
+    }})
+except Exception as error:
+    _judge_report({{
+        "success": False,
+        "error": str(error)
+    }})
+"""
+
+
+class Zygote:
+    """A running fork server and the control socket used to hand it jobs"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._control = None
+        self._process = None
+        self._unsupported = not (hasattr(os, 'fork') and hasattr(socket, 'send_fds'))
+
+    def enabled(self):
+        return getattr(settings, 'JUDGE_PYTHON_ZYGOTE', False) and not self._unsupported
+
+    def spawn(self, job, stdin, result_fd):
+        """Fork a test run for ``job``; None if the caller should launch it plainly"""
+        if not self.enabled():
+            return None
+        try:
+            return ZygoteProcess(self, job, stdin, result_fd)
+        except OSError as e:
+            self._unsupported = True
+            logger.warning('Python judge zygote unavailable, using plain launches: %s', e, extra={'error': str(e)})
+            return None
+
+    def send(self, fds):
+        """Hand one job's descriptors to the zygote, starting it if needed"""
+        with self._lock:
+            if self._process is not None and self._process.poll() is not None:
+                logger.warning('Python judge zygote exited with %s, restarting', self._process.returncode)
+                self._control.close()
+                self._process = None
+            if self._process is None:
+                self.start()
+            socket.send_fds(self._control, [b'job'], fds)
+
+    def start(self):
+        ours, theirs = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        try:
+            self._process = subprocess.Popen(
+                interpreter() + [str(SERVER), str(theirs.fileno())],
+                pass_fds=(theirs.fileno(),),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                start_new_session=True,
+            )
+        except BaseException:
+            ours.close()
+            raise
+        finally:
+            theirs.close()
+        self._control = ours
+        logger.info('Started Python judge zygote (pid %d)', self._process.pid, extra={'pid': self._process.pid})
+
+    def warm_up(self):
+        """Start the zygote ahead of the first test"""
+        if self.enabled():
+            with self._lock:
+                if self._process is None:
+                    self.start()
+
+    def stop(self):
+        with self._lock:
+            if self._process is not None:
+                self._control.close()
+                self._process.wait()
+                self._process = None
+
+
+class ZygoteProcess:
+    """One test run forked by the zygote, driven like a ``subprocess.Popen``"""
+
+    def __init__(self, zygote, job, stdin, result_fd):
+        self.args = ['python', '<zygote>']
+        self.returncode = None
+        self.pid = None
+        self._replies = bytearray()
+        # Pipes are created here, as Popen would; the zygote gets the child's ends
+        self.stdin = None
+        if stdin == subprocess.PIPE:
+            read, write = os.pipe()
+            self.stdin = open(write, 'wb', buffering=0)
+            child_fds = [read]
+        else:
+            child_fds = [os.dup(stdin.fileno())]
+        stdout_read, stdout_write = os.pipe()
+        stderr_read, stderr_write = os.pipe()
+        self.stdout = open(stdout_read, 'rb', buffering=0)
+        self.stderr = open(stderr_read, 'rb', buffering=0)
+        child_fds += [stdout_write, stderr_write]
+        self._conn, theirs = socket.socketpair()
+        try:
+            zygote.send([theirs.fileno(), *child_fds, result_fd])
+            payload = json.dumps(job).encode('utf-8')
+            self._conn.sendall(b'%d\n' % len(payload) + payload)
+            self.pid = int(self._read_reply(b'pid'))
+        except BaseException:
+            self._close()
+            raise
+        finally:
+            theirs.close()
+            for fd in child_fds:
+                os.close(fd)
+
+    def _read_reply(self, kind):
+        while b'\n' not in self._replies:
+            chunk = self._conn.recv(4096)
+            if not chunk:
+                raise OSError('The Python judge zygote closed the job socket')
+            self._replies += chunk
+        line, _, rest = bytes(self._replies).partition(b'\n')
+        self._replies[:] = rest
+        name, _, value = line.partition(b' ')
+        if name != kind:
+            raise OSError(f'Unexpected reply from the Python judge zygote: {line!r}')
+        return value
+
+    def wait(self, timeout=None):
+        if self.returncode is None:
+            self._conn.settimeout(timeout)
+            try:
+                self.returncode = int(self._read_reply(b'exit'))
+            except socket.timeout:
+                raise subprocess.TimeoutExpired(self.args, timeout)
+            finally:
+                self._conn.settimeout(None)
+        return self.returncode
+
+    def poll(self):
+        return self.returncode
+
+    def kill(self):
+        if self.pid and self.returncode is None:
+            try:
+                os.kill(self.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    def _close(self):
+        for stream in (self.stdin, self.stdout, self.stderr, self._conn):
+            if stream is not None:
+                stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            if self.pid:
+                self.wait()
+        finally:
+            self._close()
+
+
+python_zygote = Zygote()
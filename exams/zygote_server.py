@@ -0,0 +1,202 @@
+"""
+Fork server for the Python judge; runs standalone, without Django.
+
+Started once by ``exams.zygote`` (optionally as ``python -I -S``), it
+imports the harness and common stdlib modules and then waits on its control
+socket. Each message carries the file descriptors of one job: a job socket
+plus the child's stdin, stdout, stderr and result channel. For every job
+the zygote forks a supervisor, which reads the job from the job socket,
+forks the runner, reports the runner's pid, waits for it and reports its
+exit status. The runner applies the resource limits, moves the descriptors
+into place and runs the submission and the harness, so a test costs two
+forks instead of an interpreter start.
+
+Wire format on the job socket: the judge sends ``<length>\\n<json>`` with
+``code``, ``expected``, ``timeout`` and ``memory_limit``; the supervisor
+answers ``pid <pid>\\n`` and then ``exit <returncode>\\n``, where a negative
+return code is the signal that killed the runner, as with ``subprocess``.
+"""
+import fcntl
+import json
+import linecache
+import os
+import random
+import signal
+import socket
+import sys
+import time
+import traceback
+
+# Preloaded so solutions don't pay for importing them
+import bisect  # noqa: F401
+import collections  # noqa: F401
+import functools  # noqa: F401
+import heapq  # noqa: F401
+import itertools  # noqa: F401
+import math  # noqa: F401
+import re  # noqa: F401
+import string  # noqa: F401
+import typing  # noqa: F401
+
+try:
+    import resource
+except ImportError:  # the judge never starts a zygote without fork
+    resource = None
+
+
+RESULT_FD = 3
+FDS_PER_JOB = 5
+SOURCE_NAME = 'solution.py'
+
+
+def judge_report(report):
+    # One length-prefixed frame on the result channel; stdout is left to the solution
+    payload = json.dumps(report).encode('utf-8')
+    with os.fdopen(RESULT_FD, 'wb') as channel:
+        channel.write(b'%d\n' % len(payload) + payload)
+
+
+def run_solution(job):
+    """The test harness: the same steps and report as the plain Python wrapper"""
+    # Registered so tracebacks can quote the submission's lines
+    linecache.cache[SOURCE_NAME] = (len(job['code']), None, job['code'].splitlines(True), SOURCE_NAME)
+    namespace = {'__name__': '__main__', '__builtins__': __builtins__}
+    exec(compile(job['code'], SOURCE_NAME, 'exec'), namespace)
+
+    test_input = json.load(sys.stdin)
+    expected_output = job['expected']
+    try:
+        if 'solve' not in namespace:
+            raise NameError("name 'solve' is not defined")
+        started_at = time.time()
+        start = time.perf_counter()
+        result = namespace['solve'](*test_input)
+        elapsed = time.perf_counter() - start
+        judge_report({
+            'success': True,
+            'result': result,
+            'expected': expected_output,
+            'passed': result == expected_output,
+            'timing': {'start': started_at, 'elapsed': elapsed},
+        })
+    except Exception as error:
+        judge_report({'success': False, 'error': str(error)})
+
+
+def exit_status(error):
+    """Exit code the interpreter would use for an uncaught exception"""
+    if not isinstance(error, SystemExit):
+        # Start the traceback at the submission, as a plain run would
+        tb = error.__traceback__
+        while tb is not None and tb.tb_frame.f_code.co_filename != SOURCE_NAME:
+            tb = tb.tb_next
+        traceback.print_exception(type(error), error, tb)
+        return 1
+    if error.code is None:
+        return 0
+    if isinstance(error.code, int):
+        return error.code
+    print(error.code, file=sys.stderr)
+    return 1
+
+
+def runner(job, fds):
+    """Body of the forked child; never returns"""
+    status = 1
+    try:
+        os.close(fds[0])
+        # Move the descriptors clear of 0-3 first; a received one may be fd 3
+        moved = [fcntl.fcntl(fd, fcntl.F_DUPFD, 10) for fd in fds[1:]]
+        for fd in fds[1:]:
+            os.close(fd)
+        if resource is not None:
+            cpu = int(job['timeout']) + 1
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+            if job.get('memory_limit'):
+                resource.setrlimit(resource.RLIMIT_AS, (job['memory_limit'], job['memory_limit']))
+        # Wall-clock backstop in case the judge that owns this job went away
+        signal.alarm(int(job['timeout']) + 5)
+        for fd, target in zip(moved, (0, 1, 2, RESULT_FD)):
+            os.dup2(fd, target)
+            os.close(fd)
+        os.environ['JUDGE_RESULT_FD'] = str(RESULT_FD)
+        sys.stdin = open(0, 'r', closefd=False)
+        sys.stdout = open(1, 'w', closefd=False)
+        sys.stderr = open(2, 'w', buffering=1, closefd=False)
+        # Forked children would otherwise share the zygote's random state
+        random.seed()
+        status = 0
+        try:
+            run_solution(job)
+        except BaseException as error:
+            status = exit_status(error)
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except Exception:
+                pass
+    finally:
+        os._exit(status)
+
+
+def read_job(conn):
+    header = b''
+    while not header.endswith(b'\n'):
+        chunk = conn.recv(1)
+        if not chunk:
+            raise EOFError('job socket closed')
+        header += chunk
+    length = int(header)
+    data = bytearray()
+    while len(data) < length:
+        chunk = conn.recv(min(65536, length - len(data)))
+        if not chunk:
+            raise EOFError('job socket closed')
+        data += chunk
+    return json.loads(data)
+
+
+def supervise(control, fds):
+    """Body of the per-job supervisor; never returns"""
+    try:
+        control.close()
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        conn = socket.socket(fileno=fds[0])
+        job = read_job(conn)
+        pid = os.fork()
+        if pid == 0:
+            runner(job, fds)
+        for fd in fds[1:]:
+            os.close(fd)
+        conn.sendall(b'pid %d\n' % pid)
+        _, status = os.waitpid(pid, 0)
+        conn.sendall(b'exit %d\n' % os.waitstatus_to_exitcode(status))
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        os._exit(0)
+
+
+def serve(control):
+    # Supervisors are reaped by the kernel; they report to the judge directly
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    while True:
+        try:
+            message, fds, _, _ = socket.recv_fds(control, 16, FDS_PER_JOB)
+        except InterruptedError:
+            continue
+        if not message:
+            # The judge process closed its end: shut down with it
+            return
+        if len(fds) != FDS_PER_JOB:
+            for fd in fds:
+                os.close(fd)
+            continue
+        if os.fork() == 0:
+            supervise(control, fds)
+        for fd in fds:
+            os.close(fd)
+
+
+if __name__ == '__main__':
+    serve(socket.socket(fileno=int(sys.argv[1])))